@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from feed_generator import generate_feed
+from run_benchmarks import start_feed_server
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Modules that must not be loaded just by importing main, only when they are needed.
+# googleapiclient.errors is small and needed for the except clauses, so it is allowed
+HEAVY_MODULES = ("googleapiclient.discovery", "googleapiclient.http", "google_auth_oauthlib", "google.auth", "google_auth_httplib2", "httplib2", "requests", "icalendar")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+# Runs a sync the way a cron job does, in a fresh interpreter
+SYNC_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+main.sync(sys.argv[1], state_dir=sys.argv[2], interactive=False, day_range=60)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+"""
+Runs 'script' in a new Python process with 'src' on the path and returns its JSON output.
+"""
+def run_fresh(script, *args):
+    output = subprocess.run(
+        [sys.executable, "-c", script, *args],
+        cwd=SRC_DIR, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+"""
+Returns the heavy modules that were loaded, out of a list of module names.
+"""
+def loaded_heavy_modules(modules):
+    return sorted({name for name in HEAVY_MODULES for module in modules if module == name or module.startswith(name + ".")})
+
+"""
+Runs 'function' 'repeat' times and returns the best result by 'seconds'.
+"""
+def best_of(function, repeat):
+    return min((function() for _ in range(repeat)), key=lambda result: result["seconds"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold start of a sync run.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs to take the best of (default: 5)")
+    args = parser.parse_args()
+
+    imported = best_of(lambda: run_fresh(IMPORT_SCRIPT), args.repeat)
+    print(f"import main:           {imported['seconds'] * 1000:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(loaded_heavy_modules(imported['modules'])) or 'none'}")
+
+    with tempfile.TemporaryDirectory() as feed_dir, tempfile.TemporaryDirectory() as state_dir:
+        with open(os.path.join(feed_dir, "feed.ics"), "w", newline="") as file:
+            file.write(generate_feed(1000))
+        server = start_feed_server(feed_dir)
+        feed_url = f"http://127.0.0.1:{server.server_port}/feed.ics"
+
+        # Mark the feed as synced, as if a previous run had succeeded
+        sys.path.insert(0, SRC_DIR)
+        import icalendar_handler
+        cache_dir = os.path.join(state_dir, icalendar_handler.FEED_CACHE_DIR)
+        icalendar_handler.get_ical_content(feed_url, 60, cache_dir=cache_dir, streaming=True)
+        icalendar_handler.mark_feed_synced(feed_url, cache_dir)
+
+        unchanged = best_of(lambda: run_fresh(SYNC_SCRIPT, feed_url, state_dir), args.repeat)
+        server.shutdown()
+
+    print(f"sync, feed unchanged:  {unchanged['seconds'] * 1000:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(loaded_heavy_modules(unchanged['modules'])) or 'none'}")
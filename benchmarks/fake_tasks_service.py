@@ -0,0 +1,218 @@
+from collections import Counter
+import datetime
+import itertools
+import threading
+import httplib2
+from googleapiclient.errors import HttpError
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+"""
+In-memory stand-in for the Google Tasks v1 service object returned by 'build()'.
+
+It supports the calls made by 'tasks_api_handler' (tasklists list/insert/get and
+tasks list/insert/get/update/patch/delete/move/clear, plus batch requests), keeps its
+state in memory and records every call, so a full sync can be run and measured
+without network access or quota.
+
+Attributes:
+- calls (Counter): The number of calls per method, e.g. calls['tasks.insert'].
+- http_requests (int): The number of HTTP round trips the calls would have cost
+    (a batch request counts once).
+"""
+class FakeTasksService:
+    def __init__(self, task_list_names=("School",)):
+        self.calls = Counter()
+        self.http_requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.task_lists = {}
+        self.tasks_by_list = {}
+        for name in task_list_names:
+            self._insert_task_list({'title': name})
+
+    def tasklists(self):
+        return _Resource(self, 'tasklists')
+
+    def tasks(self):
+        return _Resource(self, 'tasks')
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def count_http_request(self):
+        with self._lock:
+            self.http_requests += 1
+
+    """
+    Runs one API method against the in-memory state and returns its response.
+
+    Args:
+    - method (str): The method name, e.g. 'tasks.insert'.
+    - params (dict): The method parameters, including 'body' for methods that take one.
+
+    Raises:
+    - HttpError: With status 404 if a task list or task does not exist, or 400 for bad parameters.
+    """
+    def dispatch(self, method, params):
+        with self._lock:
+            self.calls[method] += 1
+            handler = getattr(self, '_' + method.replace('.', '_'), None)
+            if handler is None:
+                raise _http_error(400, f"Unsupported method {method}")
+            return handler(**params)
+
+    def _now(self):
+        return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    def _new_id(self):
+        return f"fake{next(self._ids):08d}"
+
+    # Task lists
+
+    def _insert_task_list(self, body):
+        task_list = {'kind': 'tasks#taskList', 'id': self._new_id(), 'title': body.get('title'), 'updated': self._now()}
+        self.task_lists[task_list['id']] = task_list
+        self.tasks_by_list[task_list['id']] = {}
+        return dict(task_list)
+
+    def _tasklists_list(self, maxResults=DEFAULT_PAGE_SIZE, pageToken=None):
+        return _page(list(self.task_lists.values()), maxResults, pageToken, 'tasks#taskLists')
+
+    def _tasklists_insert(self, body):
+        return self._insert_task_list(body)
+
+    def _tasklists_get(self, tasklist):
+        return dict(self._get_task_list(tasklist))
+
+    def _get_task_list(self, tasklist):
+        if tasklist not in self.task_lists:
+            raise _http_error(404, "Task list not found.")
+        return self.task_lists[tasklist]
+
+    # Tasks
+
+    def _tasks_list(self, tasklist, maxResults=DEFAULT_PAGE_SIZE, pageToken=None, showCompleted=True,
+                    showHidden=False, showDeleted=False, updatedMin=None, **kwargs):
+        self._get_task_list(tasklist)
+        items = [
+            task for task in self.tasks_by_list[tasklist].values()
+            if (showDeleted or not task.get('deleted'))
+            and (showHidden or not task.get('hidden'))
+            and (showCompleted or task.get('status') != 'completed')
+            and (updatedMin is None or task['updated'] >= updatedMin)
+        ]
+        return _page(items, maxResults, pageToken, 'tasks#tasks')
+
+    def _tasks_insert(self, tasklist, body, **kwargs):
+        self._get_task_list(tasklist)
+        task = {key: value for key, value in body.items() if value is not None}
+        task.update({'kind': 'tasks#task', 'id': self._new_id(), 'status': task.get('status', 'needsAction'), 'updated': self._now()})
+        if task.get('due'):
+            # Google Tasks only keeps the date of a due date
+            task['due'] = task['due'][:10] + 'T00:00:00.000Z'
+        self.tasks_by_list[tasklist][task['id']] = task
+        return dict(task)
+
+    def _tasks_get(self, tasklist, task):
+        return dict(self._get_task(tasklist, task))
+
+    def _tasks_update(self, tasklist, task, body):
+        stored = self._get_task(tasklist, task)
+        stored.clear()
+        stored.update(body)
+        return self._touch(stored, task)
+
+    def _tasks_patch(self, tasklist, task, body):
+        stored = self._get_task(tasklist, task)
+        stored.update(body)
+        return self._touch(stored, task)
+
+    def _tasks_delete(self, tasklist, task):
+        stored = self._get_task(tasklist, task)
+        stored['deleted'] = True
+        stored['updated'] = self._now()
+        return ''
+
+    def _tasks_move(self, tasklist, task, destinationTasklist=None, parent=None, previous=None):
+        stored = self._get_task(tasklist, task)
+        if destinationTasklist and destinationTasklist != tasklist:
+            self._get_task_list(destinationTasklist)
+            self.tasks_by_list[destinationTasklist][task] = self.tasks_by_list[tasklist].pop(task)
+        stored['updated'] = self._now()
+        return dict(stored)
+
+    def _tasks_clear(self, tasklist):
+        self._get_task_list(tasklist)
+        for task in self.tasks_by_list[tasklist].values():
+            if task.get('status') == 'completed':
+                task['hidden'] = True
+                task['updated'] = self._now()
+        return ''
+
+    def _get_task(self, tasklist, task):
+        self._get_task_list(tasklist)
+        stored = self.tasks_by_list[tasklist].get(task)
+        if stored is None or stored.get('deleted'):
+            raise _http_error(404, "Task not found.")
+        return stored
+
+    def _touch(self, stored, task_id):
+        stored.update({'kind': 'tasks#task', 'id': task_id, 'updated': self._now()})
+        if stored.get('due'):
+            stored['due'] = stored['due'][:10] + 'T00:00:00.000Z'
+        return dict(stored)
+
+class _Resource:
+    def __init__(self, service, name):
+        self._service = service
+        self._name = name
+
+    def __getattr__(self, method):
+        return lambda **params: _FakeRequest(self._service, f"{self._name}.{method}", params)
+
+class _FakeRequest:
+    def __init__(self, service, method, params):
+        self.service = service
+        self.methodId = f"tasks.{method}"
+        self.method = method
+        self.params = {key: value for key, value in params.items() if value is not None}
+
+    def execute(self, http=None, num_retries=0):
+        self.service.count_http_request()
+        return self.service.dispatch(self.method, self.params)
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self._requests))
+        if any(existing_id == request_id for existing_id, _, _ in self._requests):
+            raise KeyError(f"A request with this ID already exists: {request_id}")
+        self._requests.append((request_id, request, callback))
+
+    def execute(self, http=None):
+        self._service.count_http_request()
+        for request_id, request, callback in self._requests:
+            try:
+                response, error = self._service.dispatch(request.method, request.params), None
+            except HttpError as e:
+                response, error = None, e
+            for handler in (callback, self._callback):
+                if handler:
+                    handler(request_id, response, error)
+
+def _page(items, max_results, page_token, kind):
+    size = max(1, min(int(max_results or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    start = int(page_token or 0)
+    response = {'kind': kind, 'items': [dict(item) for item in items[start:start + size]]}
+    if start + size < len(items):
+        response['nextPageToken'] = str(start + size)
+    return response
+
+def _http_error(status, message):
+    return HttpError(httplib2.Response({'status': status}), message.encode('utf-8'))
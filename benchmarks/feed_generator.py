@@ -0,0 +1,100 @@
+import argparse
+import datetime
+import random
+
+# Words used to build assignment titles and descriptions
+WORDS = (
+    "homework quiz lab project essay reading discussion exam review chapter module "
+    "worksheet problem set report draft final midterm presentation reflection response "
+    "analysis design implementation proof exercise case study journal portfolio"
+).split()
+
+"""
+Generates a Canvas-like iCalendar feed.
+
+The feed mimics what Canvas exports: assignments are all-day events without a DTEND,
+course events have a DTSTART and DTEND, every summary ends with the course code in
+brackets, and descriptions are long HTML blobs folded at 75 characters.
+
+Args:
+- event_count (int): The number of VEVENTs in the feed.
+- course_count (int): The number of courses the events are spread across.
+- past_days (int): How many days before 'today' the oldest event may be.
+- future_days (int): How many days after 'today' the newest event may be.
+- assignment_ratio (float): The share of events that are assignments.
+- description_words (int): The approximate length of each description in words.
+- seed (int): The random seed, so the same arguments always give the same feed.
+- today (date): The reference day. Defaults to today.
+
+Returns:
+- str: The iCalendar text.
+"""
+def generate_feed(event_count, course_count=6, past_days=365, future_days=120, assignment_ratio=0.7,
+                  description_words=120, seed=0, today=None):
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    courses = [f"{rng.choice(['COP', 'MAC', 'PHY', 'ENC', 'CHM', 'STA'])}{3000 + index * 17}" for index in range(course_count)]
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Instructure//Canvas Feed Generator//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:Benchmark Student Calendar",
+    ]
+    for index in range(event_count):
+        course = rng.choice(courses)
+        day = today + datetime.timedelta(days=rng.randint(-past_days, future_days))
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        description = _generate_description(rng, description_words)
+
+        lines.append("BEGIN:VEVENT")
+        lines.append(f"DTSTAMP:{today.strftime('%Y%m%d')}T000000Z")
+        if rng.random() < assignment_ratio:
+            lines.append(f"UID:event-assignment-{100000 + index}")
+            lines.append(f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}")
+        else:
+            hour = rng.randint(13, 22)
+            lines.append(f"UID:event-calendar-event-{100000 + index}")
+            lines.append(f"DTSTART:{day.strftime('%Y%m%d')}T{hour:02d}0000Z")
+            lines.append(f"DTEND:{day.strftime('%Y%m%d')}T{hour + 1:02d}0000Z")
+        lines.append(f"SUMMARY:{_escape_text(f'{title} [{course}]')}")
+        lines.append(f"DESCRIPTION:{_escape_text(description)}")
+        lines.append(f"URL;VALUE=URI:https://canvas.example.edu/calendar?include_contexts=course_{course}&event={index}")
+        lines.append(f"X-ALT-DESC;FMTTYPE=text/html:{_escape_text(description)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+def _generate_description(rng, word_count):
+    paragraphs = []
+    remaining = word_count
+    while remaining > 0:
+        length = min(remaining, rng.randint(20, 60))
+        paragraphs.append("<p>" + " ".join(rng.choice(WORDS) for _ in range(length)) + ".</p>")
+        remaining -= length
+    return "".join(paragraphs) + "\n<a href=\"https://canvas.example.edu/files/123\">Rubric, instructions; notes</a>"
+
+def _escape_text(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _fold(line, limit=75):
+    if len(line) <= limit:
+        return line
+    parts = [line[:limit]]
+    for start in range(limit, len(line), limit - 1):
+        parts.append(" " + line[start:start + limit - 1])
+    return "\r\n".join(parts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Canvas iCalendar feed.")
+    parser.add_argument("output", help="file to write the feed to")
+    parser.add_argument("--events", type=int, default=1000, help="number of events (default: 1000)")
+    parser.add_argument("--courses", type=int, default=6, help="number of courses (default: 6)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    with open(args.output, "w", newline="") as file:
+        file.write(generate_feed(args.events, args.courses, seed=args.seed))
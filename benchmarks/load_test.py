@@ -0,0 +1,91 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import executor_handler
+import main
+from fake_tasks_service import FakeTasksService
+from feed_generator import generate_feed
+from run_benchmarks import start_feed_server
+from tasks_api_server import TasksApiServer
+
+DAY_RANGE = 60
+
+"""
+Runs one sync against the stand-in server and returns its timing, results and the
+requests it took, as seen by the client and by the server.
+"""
+def run_sync(server, feed_url, state_dir, force=False):
+    calls_before = sum(server.service.calls.values())
+    http_before = server.service.http_requests
+    errors_before = sum(server.injected_errors.values())
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = main.sync(feed_url, state_dir=state_dir, interactive=False, day_range=DAY_RANGE, force=force)
+    seconds = time.perf_counter() - started
+
+    with open(os.path.join(state_dir, main.RUN_REPORT_FILE), "r") as file:
+        counters = json.load(file)["counters"]
+    calls = sum(server.service.calls.values()) - calls_before
+    return {
+        "seconds": seconds,
+        "results": results,
+        "client_requests": sum(counter["value"] for counter in counters if counter["name"] == "tasks_api_requests_total"),
+        "http_requests": server.service.http_requests - http_before,
+        "api_calls": calls,
+        "injected_errors": sum(server.injected_errors.values()) - errors_before,
+        "calls_per_second": calls / seconds if seconds else 0.0,
+    }
+
+def print_run(name, run):
+    results = run["results"]
+    print(f"{name}: {run['seconds']:.2f}s, {results.get('created', 0)} created, {results.get('updated', 0)} updated, "
+          f"{results.get('failed', 0)} failed")
+    print(f"  {run['api_calls']} API calls in {run['http_requests']} HTTP requests ({run['calls_per_second']:.0f} calls/s), "
+          f"{run['client_requests']} requests sent by the executor, {run['injected_errors']} injected errors")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a full sync against the local Tasks API stand-in server.")
+    parser.add_argument("--events", type=int, default=2000, help="number of events in the generated feed (default: 2000)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every HTTP request (default: 0.05)")
+    parser.add_argument("--call-latency", type=float, default=0.0, help="seconds added to every API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of API calls that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=429, help="status of the injected errors (default: 429)")
+    parser.add_argument("--page-size", type=int, help="largest page returned by list calls")
+    parser.add_argument("--backoff-base", type=float, default=executor_handler.BACKOFF_BASE,
+                        help=f"base of the retry backoff in seconds (default: {executor_handler.BACKOFF_BASE})")
+    parser.add_argument("--unthrottled", action="store_true", help="lift the client-side rate limit")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the feed and the injected errors (default: 0)")
+    args = parser.parse_args()
+
+    executor_handler.BACKOFF_BASE = args.backoff_base
+    if args.unthrottled:
+        executor_handler.BUCKET = executor_handler.TokenBucket(rate=1e9, capacity=1e9)
+
+    server = TasksApiServer(FakeTasksService(), latency=args.latency, call_latency=args.call_latency,
+                            error_rate=args.error_rate, error_status=args.error_status,
+                            page_size=args.page_size, seed=args.seed).start()
+    os.environ[main.API_ENDPOINT_VARIABLE] = server.endpoint
+
+    with tempfile.TemporaryDirectory() as feed_dir, tempfile.TemporaryDirectory() as state_dir:
+        with open(os.path.join(feed_dir, "feed.ics"), "w", newline="") as file:
+            file.write(generate_feed(args.events, seed=args.seed))
+        feed_server = start_feed_server(feed_dir)
+        feed_url = f"http://127.0.0.1:{feed_server.server_port}/feed.ics"
+
+        print(f"Syncing {args.events} events against {server.endpoint}")
+        print_run("first sync", run_sync(server, feed_url, state_dir))
+        print_run("forced resync", run_sync(server, feed_url, state_dir, force=True))
+
+        feed_server.shutdown()
+    server.shutdown()
+    executor_handler.shutdown()
@@ -0,0 +1,242 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import http.server
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import executor_handler
+import icalendar_handler
+import main
+import tasks_api_handler
+from fake_tasks_service import FakeTasksService
+from feed_generator import generate_feed
+from diff_handler import diff_tasks
+from fingerprint_handler import get_assignment_key, record_fingerprint
+from task_mirror_handler import get_mirrored_tasks, open_task_mirror, upsert_mirrored_tasks
+
+SIZES = (100, 1000, 10000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# A benchmark is reported as a regression when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.2
+# Wide enough that a good share of the generated events falls inside the window
+DAY_RANGE = 60
+# Peak memory is reported per this many events in the feed
+MEMORY_EVENTS = 10000
+
+"""
+Runs 'function' 'repeat' times and returns the best wall-clock time in seconds.
+"""
+def time_best(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_parse(feed, size, results):
+    results[f"parse_tree[{size}]"] = {
+        "seconds": time_best(lambda: list(icalendar_handler._parse_ical_content(feed, DAY_RANGE))),
+    }
+    results[f"parse_streaming[{size}]"] = {
+        "seconds": time_best(lambda: list(icalendar_handler.iter_ical_assignments(io.StringIO(feed), DAY_RANGE))),
+    }
+
+"""
+Measures the memory the parse of a downloaded feed allocates with tracemalloc: the
+peak while parsing, scaled to MEMORY_EVENTS events, and what the parsed assignments
+keep once it is done. The feed body itself is allocated before tracing starts, as it
+is by the download.
+"""
+def bench_memory(feed, size, results):
+    for name, parse in (
+        ("streaming", lambda: list(icalendar_handler.iter_ical_assignments(icalendar_handler._iter_lines(feed), DAY_RANGE))),
+        ("tree", lambda: list(icalendar_handler._parse_ical_content(feed, DAY_RANGE))),
+    ):
+        tracemalloc.start()
+        started = time.perf_counter()
+        assignments = parse()
+        seconds = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"memory_{name}[{size}]"] = {
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "peak_bytes_per_10k_events": round(peak * MEMORY_EVENTS / size),
+            "retained_bytes": retained,
+            "assignments": len(assignments),
+        }
+        del assignments
+
+"""
+Expands 'size' open-ended weekly rules that started ten years ago. Only the weeks of
+the window are walked, so the time should not depend on the age of the rules.
+"""
+def bench_recurrence(size, results):
+    today = datetime.date.today()
+    dtstart = today.replace(year=today.year - 10)
+    window_end = today + datetime.timedelta(days=DAY_RANGE)
+    expand = lambda: [list(icalendar_handler.iter_occurrences(dtstart, today, window_end, "FREQ=WEEKLY;BYDAY=MO,WE,FR")) for _ in range(size)]
+    results[f"expand_recurrence[{size}]"] = {"seconds": time_best(expand)}
+
+def bench_diff(feed, size, results):
+    assignments = list(icalendar_handler.iter_ical_assignments(io.StringIO(feed), DAY_RANGE))
+    tasks_api_handler.TASKLISTID = "benchmark"
+    mirror = open_task_mirror(":memory:")
+
+    # Half of the assignments were synced before, and a tenth of those have a new due date
+    index = {}
+    tasks = []
+    for number, assignment in enumerate(assignments[::2]):
+        task = {"id": f"task{number}", "title": assignment.name, "due": f"{assignment.date}T00:00:00.000Z"}
+        if number % 10 == 0:
+            task["due"] = "2000-01-01T00:00:00.000Z"
+        tasks.append(task)
+        record_fingerprint(index, get_assignment_key(assignment), task["id"], task["due"], task["title"])
+    upsert_mirrored_tasks(mirror, tasks)
+    feed_uids = {assignment.uid for assignment in assignments}
+
+    results[f"diff[{size}]"] = {
+        "seconds": time_best(lambda: diff_tasks(assignments, index, get_mirrored_tasks(mirror), feed_uids)),
+        "assignments": len(assignments),
+    }
+    mirror.close()
+
+def bench_full_sync(feed_url, size, results):
+    service = FakeTasksService()
+    main.initialize_task_list = functools.partial(_install_service, service)
+
+    with tempfile.TemporaryDirectory() as state_dir, contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        first = main.sync(feed_url, state_dir=state_dir, day_range=DAY_RANGE)
+        first_seconds = time.perf_counter() - started
+        first_requests = service.http_requests
+        first_calls = dict(service.calls)
+
+        # A second run with nothing changed measures the steady state
+        started = time.perf_counter()
+        main.sync(feed_url, state_dir=state_dir, day_range=DAY_RANGE)
+        second_seconds = time.perf_counter() - started
+
+    results[f"full_sync[{size}]"] = {
+        "seconds": first_seconds,
+        "http_requests": first_requests,
+        "calls": first_calls,
+        "created": first["created"],
+    }
+    results[f"noop_sync[{size}]"] = {
+        "seconds": second_seconds,
+        "http_requests": service.http_requests - first_requests,
+    }
+
+def _install_service(service, *args, **kwargs):
+    tasks_api_handler.SERVICE = service
+    # Forget the list IDs of the previous fake service, as signing in again does
+    tasks_api_handler.TASKLIST_IDS = None
+    tasks_api_handler.TASKLIST_IDS_REFRESHED = False
+    executor_handler.set_http_factory(None)
+
+"""
+Serves the generated feeds over HTTP on localhost, so the full sync benchmark goes
+through the same download path as a real run.
+"""
+def start_feed_server(directory):
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+"""
+Compares results with a baseline run and returns the benchmarks that got slower.
+"""
+def compare(results, baseline):
+    regressions = []
+    print(f"\n{'benchmark':<24}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("seconds"):
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        flag = "  REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+        print(f"{name:<24}{previous['seconds']:>12.4f}{result['seconds']:>12.4f}{ratio:>8.2f}{flag}")
+        if ratio > REGRESSION_THRESHOLD:
+            regressions.append(name)
+        for key in ("http_requests",):
+            if key in previous and result.get(key, 0) > previous[key]:
+                print(f"{'':<24}{key} went from {previous[key]} to {result[key]}  REGRESSION")
+                regressions.append(f"{name}.{key}")
+        for key in ("peak_bytes",):
+            if previous.get(key) and result.get(key, 0) > previous[key] * REGRESSION_THRESHOLD:
+                print(f"{'':<24}{key} went from {previous[key]} to {result[key]}  REGRESSION")
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark feed parsing, diffing and full syncs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="feed sizes in events (default: 100 1000 10000)")
+    parser.add_argument("--output", help="file to save the results to (default: results/<timestamp>.json)")
+    parser.add_argument("--compare", help="results file of a previous run to compare against")
+    args = parser.parse_args()
+
+    # Measure the code, not the Tasks API quota
+    executor_handler.BUCKET = executor_handler.TokenBucket(rate=1e9, capacity=1e9)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as feed_dir, tempfile.TemporaryDirectory() as cache_dir:
+        # Syncs keep the task list cache in their state directory; anything resolved
+        # outside of one must not leave a cache in the working directory either
+        tasks_api_handler.set_task_list_cache(os.path.join(cache_dir, tasks_api_handler.TASKLIST_CACHE_FILE))
+        server = start_feed_server(feed_dir)
+        for size in args.sizes:
+            feed = generate_feed(size, seed=size)
+            with open(os.path.join(feed_dir, f"feed{size}.ics"), "w", newline="") as file:
+                file.write(feed)
+
+            print(f"Benchmarking {size} events...")
+            bench_parse(feed, size, results)
+            bench_memory(feed, size, results)
+            bench_recurrence(size, results)
+            bench_diff(feed, size, results)
+            bench_full_sync(f"http://127.0.0.1:{server.server_port}/feed{size}.ics", size, results)
+        server.shutdown()
+    executor_handler.shutdown()
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"\n{'benchmark':<24}{'seconds':>12}{'requests':>10}{'peak MB/10k events':>20}")
+    for name, result in results.items():
+        peak = f"{result['peak_bytes_per_10k_events'] / 2 ** 20:.1f}" if "peak_bytes_per_10k_events" in result else ""
+        print(f"{name:<24}{result['seconds']:>12.4f}{result.get('http_requests', ''):>10}{peak:>20}")
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(results, json.load(file))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            raise SystemExit(1)
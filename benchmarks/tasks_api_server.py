@@ -0,0 +1,233 @@
+import argparse
+import email
+import email.policy
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from googleapiclient.errors import HttpError
+
+from fake_tasks_service import FakeTasksService
+
+# Query parameters every Google API accepts, which do not change the response here
+IGNORED_PARAMETERS = {"alt", "fields", "prettyPrint", "quotaUser", "key"}
+INTEGER_PARAMETERS = {"maxResults"}
+BOOLEAN_PARAMETERS = {"showCompleted", "showHidden", "showDeleted", "showAssigned"}
+
+# (HTTP method, path pattern, API method) of the Tasks v1 endpoints the sync uses
+ROUTES = [
+    ("GET", r"tasks/v1/users/@me/lists", "tasklists.list"),
+    ("POST", r"tasks/v1/users/@me/lists", "tasklists.insert"),
+    ("GET", r"tasks/v1/users/@me/lists/(?P<tasklist>[^/]+)", "tasklists.get"),
+    ("POST", r"tasks/v1/lists/(?P<tasklist>[^/]+)/clear", "tasks.clear"),
+    ("GET", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks", "tasks.list"),
+    ("POST", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks", "tasks.insert"),
+    ("GET", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks/(?P<task>[^/]+)", "tasks.get"),
+    ("PUT", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks/(?P<task>[^/]+)", "tasks.update"),
+    ("PATCH", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks/(?P<task>[^/]+)", "tasks.patch"),
+    ("DELETE", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks/(?P<task>[^/]+)", "tasks.delete"),
+    ("POST", r"tasks/v1/lists/(?P<tasklist>[^/]+)/tasks/(?P<task>[^/]+)/move", "tasks.move"),
+]
+ROUTES = [(verb, re.compile(pattern + "$"), method) for verb, pattern, method in ROUTES]
+
+ERROR_REASONS = {
+    403: ("rateLimitExceeded", "Rate Limit Exceeded"),
+    429: ("rateLimitExceeded", "Rate Limit Exceeded"),
+    500: ("backendError", "Backend Error"),
+    503: ("backendError", "Service Unavailable"),
+}
+
+"""
+Local HTTP stand-in for the Google Tasks v1 REST API.
+
+Serves the endpoints 'tasks_api_handler' uses (tasklists list/insert/get, tasks
+list/insert/get/update/patch/delete/move/clear and batch requests) from a FakeTasksService,
+so a sync can be load-tested over real HTTP without touching Google or its quota.
+Point the client at it with the TASKS_API_ENDPOINT environment variable or the
+'api_endpoint' argument of 'initialize_task_list()'; no sign in is needed.
+
+Faults can be injected to measure throughput and retry behavior:
+- latency: seconds added to every HTTP request.
+- call_latency: seconds added to every API call, also to each call inside a batch.
+- error_rate: the share of API calls answered with 'error_status' (e.g. 429 or 503)
+    instead of being run. Calls inside a batch fail one by one, as they do on Google.
+- page_size: the largest page list calls return, whatever maxResults asks for.
+
+Attributes:
+- service (FakeTasksService): The in-memory state, with its call counts.
+- endpoint (str): The base URL to point the client at.
+- injected_errors (Counter): The number of injected errors per API method.
+"""
+class TasksApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service=None, host="127.0.0.1", port=0, latency=0.0, call_latency=0.0,
+                 error_rate=0.0, error_status=429, page_size=None, seed=None):
+        super().__init__((host, port), _TasksApiHandler)
+        self.service = service or FakeTasksService()
+        self.endpoint = f"http://{host}:{self.server_port}/"
+        self.latency = latency
+        self.call_latency = call_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.page_size = page_size
+        self.injected_errors = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    """
+    Starts serving on a daemon thread and returns the server.
+    """
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    """
+    Runs one API call with fault injection and returns its status and JSON response.
+    """
+    def call(self, method, params):
+        if self.call_latency:
+            time.sleep(self.call_latency)
+        with self._lock:
+            inject = self.error_rate and self._random.random() < self.error_rate
+            if inject:
+                self.injected_errors[method] += 1
+        if inject:
+            return self.error_status, _error_body(self.error_status, "Injected error.")
+
+        if self.page_size and method.endswith(".list"):
+            params["maxResults"] = min(int(params.get("maxResults") or self.page_size), self.page_size)
+        try:
+            response = self.service.dispatch(method, params)
+        except HttpError as e:
+            return e.resp.status, _error_body(e.resp.status, e.content.decode("utf-8"))
+        except TypeError as e:
+            # Parameters the method does not take
+            return 400, _error_body(400, str(e))
+        return (204, None) if response == "" else (200, response)
+
+    """
+    Routes a request to an API method and returns its status and JSON response.
+    """
+    def handle_request(self, verb, target, body):
+        url = urlsplit(target)
+        path = unquote(url.path).lstrip("/")
+        for route_verb, pattern, method in ROUTES:
+            match = pattern.match(path)
+            if match and route_verb == verb:
+                params = dict(match.groupdict())
+                for name, value in parse_qsl(url.query):
+                    if name not in IGNORED_PARAMETERS:
+                        params[name] = _convert_parameter(name, value)
+                if body:
+                    params["body"] = json.loads(body)
+                return self.call(method, params)
+        return 404, _error_body(404, f"No route for {verb} /{path}.")
+
+class _TasksApiHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections alive between requests, as Google does
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.service.count_http_request()
+
+        if self.command == "POST" and urlsplit(self.path).path.rstrip("/") in ("/batch", "/batch/tasks/v1"):
+            content_type, content = self._handle_batch(body)
+            self._respond(200, content_type, content)
+            return
+        status, response = self.server.handle_request(self.command, self.path, body.decode("utf-8"))
+        self._respond(status, "application/json; charset=UTF-8", b"" if response is None else json.dumps(response).encode("utf-8"))
+
+    def _handle_batch(self, body):
+        message = email.message_from_bytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("ascii") + b"\r\n\r\n" + body,
+            policy=email.policy.HTTP,
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.iter_parts():
+            request_line, _, rest = part.get_payload().replace("\r\n", "\n").partition("\n")
+            verb, target, _ = request_line.split(" ", 2)
+            _, _, part_body = rest.partition("\n\n")
+            status, response = self.server.handle_request(verb, target, part_body.strip())
+            content = "" if response is None else json.dumps(response)
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(content.encode('utf-8'))}\r\n\r\n"
+                f"{content}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(parts).encode("utf-8")
+
+    def _respond(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+def _convert_parameter(name, value):
+    if name in INTEGER_PARAMETERS:
+        return int(value)
+    if name in BOOLEAN_PARAMETERS:
+        return value.lower() == "true"
+    return value
+
+def _error_body(status, message):
+    reason, default_message = ERROR_REASONS.get(status, ("invalid" if status < 500 else "backendError", message))
+    return {"error": {"code": status, "message": message or default_message, "errors": [{"reason": reason, "message": message}]}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an in-memory stand-in for the Google Tasks v1 API.")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every HTTP request")
+    parser.add_argument("--call-latency", type=float, default=0.0, help="seconds added to every API call, also inside batches")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of API calls that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=429, help="status of the injected errors (default: 429)")
+    parser.add_argument("--page-size", type=int, help="largest page returned by list calls")
+    parser.add_argument("--task-lists", nargs="+", default=["School"], help="task lists to start with (default: School)")
+    args = parser.parse_args()
+
+    server = TasksApiServer(FakeTasksService(args.task_lists), port=args.port, latency=args.latency,
+                            call_latency=args.call_latency, error_rate=args.error_rate,
+                            error_status=args.error_status, page_size=args.page_size)
+    print(f"Serving the Tasks API stand-in at {server.endpoint}")
+    print(f"Run the sync against it with TASKS_API_ENDPOINT={server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"{server.service.http_requests} HTTP requests, calls: {dict(server.service.calls)}, injected errors: {dict(server.injected_errors)}")
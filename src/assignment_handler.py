@@ -0,0 +1,59 @@
+import hashlib
+
+# Bytes of the description digest; enough to tell edits apart, not to resist tampering
+DESCRIPTION_DIGEST_SIZE = 8
+
+"""
+One assignment of a Canvas calendar feed.
+
+Feeds can hold tens of thousands of events and a worker keeps the assignments of many
+users in its feed caches, so the record is kept small: it has __slots__ instead of a
+per-instance dict, its text fields are plain strings rather than the icalendar
+library's types, and the description, which can be longer than everything else put
+together and is never sent to Google Tasks, is kept only as a hash.
+
+Records are compared by value and pickle as they are, for the feed cache.
+
+Attributes:
+- uid (str): The event UID, with the occurrence start appended for an occurrence of a
+    recurring event. None for events without a UID.
+- name (str): The event summary, e.g. "Homework 1 [COP3502]".
+- course (str): The course code at the end of the summary, or None.
+- date (date or datetime): The due date, a date for all-day events and otherwise a
+    datetime, with its time zone when the feed gives one.
+- description_hash (str): The hash of the description returned by 'hash_description()',
+    or None if the event has no description.
+"""
+class Assignment:
+    __slots__ = ("uid", "name", "course", "date", "description_hash")
+
+    def __init__(self, uid, name, course, date, description_hash=None):
+        self.uid = uid
+        self.name = name
+        self.course = course
+        self.date = date
+        self.description_hash = description_hash
+
+    """
+    Returns a copy of the assignment with the given fields replaced.
+    """
+    def replace(self, **changes):
+        return Assignment(**{**{field: getattr(self, field) for field in self.__slots__}, **changes})
+
+    def __eq__(self, other):
+        if not isinstance(other, Assignment):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Assignment(uid={self.uid!r}, name={self.name!r}, course={self.course!r}, date={self.date!r})"
+
+"""
+Returns the hash an assignment keeps of its description, or None for an empty one.
+"""
+def hash_description(description):
+    if not description:
+        return None
+    return hashlib.blake2b(str(description).encode("utf-8"), digest_size=DESCRIPTION_DIGEST_SIZE).hexdigest()
@@ -1,10 +1,16 @@
 import datetime
+import json
+import os
+import tempfile
+
+ASSIGNMENT_CACHE_FILE = "assignments.jsonl"
+LEGACY_ASSIGNMENT_FILE = "assignments.txt"
 
 
 def save_assignments_to_file(assignments, filename="assignments.txt"):
         with open(filename, "w") as file:
             for assignment in assignments:
-                file.write(f"{assignment['name']}\n{assignment['date']}\n")
+                file.write(f"{assignment.name}\n{assignment.date}\n")
 
 
 """
@@ -29,26 +35,115 @@ def load_assignments_from_file(filename="assignments.txt"):
 Returns array of assignments whose due date is changed from the date stored in file.
 """
 def get_changed_assignments(assignments, file="assignments.txt"):
-    previous_assignments = load_assignments_from_file()
+    previous_dates = {}
+    for previous_assignment in load_assignments_from_file(file):
+        previous_dates.setdefault(previous_assignment["name"], previous_assignment["date"])
     changed_assignments = []
     for assignment in assignments:
-        for previous_assignment in previous_assignments:
-            if(assignment["name"] == previous_assignment["name"]):
-                if(assignment["date"] != previous_assignment["date"]):
-                    print("Due date changed for assignment: " + assignment["name"])
-                    changed_assignments.append(assignment)
-                break
+        if assignment.name in previous_dates and assignment.date != previous_dates[assignment.name]:
+            print("Due date changed for assignment: " + assignment.name)
+            changed_assignments.append(assignment)
     return changed_assignments
 
 """
 returns array of assignments that were not in the previous update
 """
 def get_new_assignments(assignments, file="assignments.txt"):
-    previous_assignments = load_assignments_from_file()
+    previous_assignments = load_assignments_from_file(file)
     new_assignments = []
     previous_assignment_names = {assignment["name"] for assignment in previous_assignments}
     for assignment in assignments:
-        if assignment["name"] not in previous_assignment_names:
-            print("New assignment found: " + assignment["name"])
+        if assignment.name not in previous_assignment_names:
+            print("New assignment found: " + assignment.name)
             new_assignments.append(assignment)
-    return new_assignments
\ No newline at end of file
+    return new_assignments
+
+
+"""
+returns the ID an assignment is cached under: the event UID, or the name for
+assignments without one
+"""
+def get_assignment_id(assignment):
+    return assignment.uid or assignment.name
+
+"""
+returns dict of previous assignments, loaded once and keyed by assignment ID
+id: string
+name: string
+date: date
+
+Reads the JSON lines cache written by save_assignment_index(). If it doesn't exist yet,
+the old assignments.txt format is read instead so the first run keeps its history.
+The old format has no UIDs, so its entries are keyed by name and marked 'legacy';
+diff_assignments() matches them by name and moves them to their UID.
+"""
+def load_assignment_index(filename=ASSIGNMENT_CACHE_FILE, legacy_filename=LEGACY_ASSIGNMENT_FILE):
+    index = {}
+    try:
+        with open(filename, "r") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    record["date"] = datetime.date.fromisoformat(record["date"])
+                    index[record["id"]] = record
+    except FileNotFoundError:
+        if legacy_filename and os.path.exists(legacy_filename):
+            for assignment in load_assignments_from_file(legacy_filename):
+                index.setdefault(assignment["name"], {"id": assignment["name"], "legacy": True, **assignment})
+    return index
+
+"""
+Writes the assignment index as one JSON object per line. The file is written to a
+temporary file first and renamed, so readers never see a partial cache.
+"""
+def save_assignment_index(assignments, filename=ASSIGNMENT_CACHE_FILE):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            for assignment in assignments:
+                record = {
+                    "id": get_assignment_id(assignment),
+                    "name": assignment.name,
+                    "date": _to_date(assignment.date).isoformat(),
+                }
+                file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+"""
+Compares assignments against the previous index in one pass.
+Returns three arrays: assignments that are new, assignments whose due date changed,
+and previous assignments (from the index) that are no longer in the list.
+
+Legacy entries, keyed by name, are matched by the assignment's name and moved to its
+ID in 'previous_index'.
+"""
+def diff_assignments(assignments, previous_index):
+    new_assignments = []
+    changed_assignments = []
+    seen = set()
+    for assignment in assignments:
+        assignment_id = get_assignment_id(assignment)
+        seen.add(assignment_id)
+        previous_assignment = previous_index.get(assignment_id)
+        if previous_assignment is None and previous_index.get(assignment.name, {}).get("legacy"):
+            previous_assignment = previous_index.pop(assignment.name)
+            del previous_assignment["legacy"]
+            previous_assignment["id"] = assignment_id
+            previous_index[assignment_id] = previous_assignment
+        if previous_assignment is None:
+            new_assignments.append(assignment)
+        elif _to_date(assignment.date) != previous_assignment["date"]:
+            changed_assignments.append(assignment)
+    removed_assignments = [previous for assignment_id, previous in previous_index.items() if assignment_id not in seen]
+    return new_assignments, changed_assignments, removed_assignments
+
+def _to_date(value):
+    # The calendar day in local time, as fingerprint_handler.format_due() compares due dates
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone()
+        return value.date()
+    return value
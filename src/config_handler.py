@@ -1,69 +1,131 @@
+import os
+import tempfile
+import threading
+from typing import NamedTuple, Optional
+
+CONFIG_FILE = 'config.txt'
+DEFAULT_PROFILE = 'default'
+
+# Define global variables
+# Parsed config files by name, as (mtime, size, profiles)
+_CACHE = {}
+_LOCK = threading.Lock()
+
 """
-Creates a new configuration file named 'config.txt' if it doesn't exist.
+The settings of one sync profile. Fields that are not set in the file are None.
+"""
+class Profile(NamedTuple):
+    url: Optional[str] = None
+    task_list: Optional[str] = None
+    day_range: Optional[int] = None
+    state_dir: Optional[str] = None
+    token_file: Optional[str] = None
+
+# Value types of the profile fields, used when parsing the file
+_FIELD_TYPES = {'url': str, 'task_list': str, 'day_range': int, 'state_dir': str, 'token_file': str}
+# Sections written by earlier versions, and the profile field their key maps to
+_LEGACY_SECTIONS = {'URL': 'url', 'TASK_LIST': 'task_list'}
 
-Steps:
-    - Opens 'config.txt' in write mode and writes the default configuration content.
+"""
+Returns all profiles in the configuration file.
 
-Expected Inputs: None
+The file is parsed once and kept in memory. Later calls only check its modification
+time and size, and parse it again when either changed, so reading the config inside
+a sync loop costs a single stat call.
+
+The file holds one section per profile:
+
+    [profile default]
+    url = https://canvas.example.edu/feeds/calendars/user_abc.ics
+    task_list = School
+    day_range = 14
+
+Files written by earlier versions, with [URL] and [TASK_LIST] sections, are read as the
+default profile.
+
+Expected Inputs:
+    - filename: The configuration file (default is 'config.txt').
 
 Outputs:
-    - Generates a new 'config.txt' file with default configuration content.
+    - Returns a dict of Profile by name, empty if the file doesn't exist.
+
+Raises:
+    - ValueError: If a value has the wrong type, e.g. a day_range that is not a number.
+"""
+def get_profiles(filename=CONFIG_FILE):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return {}
+    cached = _CACHE.get(filename)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(filename, 'r') as configFile:
+        profiles = _parse_config(configFile)
+    _CACHE[filename] = (stat.st_mtime_ns, stat.st_size, profiles)
+    return profiles
+
 """
-def _create_config_file():
-    # Create a new configuration file if it doesn't exist
-    with open('config.txt', 'w') as configFile:
-        configFile.write('# Configuration File\n\n')
+Returns one profile from the configuration file.
 
+Expected Inputs:
+    - name: The name of the profile (default is 'default').
+    - filename: The configuration file (default is 'config.txt').
+
+Outputs:
+    - Returns the Profile, or None if the profile doesn't exist.
 """
-Saves the provided URL to the configuration file 'config.txt'.
+def get_profile(name=DEFAULT_PROFILE, filename=CONFIG_FILE):
+    return get_profiles(filename).get(name)
+
+"""
+Saves settings of a profile to the configuration file.
 
 Steps:
-    - Attempts to open 'config.txt' in append mode.
-    - If the file doesn't exist, creates a new 'config.txt' file and writes the URL.
-    - If the file exists, checks for the existence of [URL] tag, updates or appends the URL accordingly.
+    - Reads the current profiles and updates the given fields of the profile, creating it if needed.
+    - Writes the whole file to a temporary file next to it and renames it over the old one,
+        so readers always see either the old or the new file.
+
+Expected Inputs:
+    - name: The name of the profile.
+    - filename: The configuration file (default is 'config.txt').
+    - fields: The Profile fields to set, e.g. url='https://...'.
+
+Outputs:
+    - Returns the updated Profile.
+"""
+def save_profile(name=DEFAULT_PROFILE, filename=CONFIG_FILE, **fields):
+    with _LOCK:
+        profiles = dict(get_profiles(filename))
+        profile = profiles.get(name, Profile())._replace(**fields)
+        profiles[name] = profile
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as configFile:
+                configFile.write(_format_config(profiles))
+            os.replace(temp_path, filename)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return profile
+
+"""
+Saves the provided URL to the default profile of the configuration file 'config.txt'.
 
 Expected Inputs:
     - url: A string representing the URL to be saved in the configuration file.
 
 Outputs:
-    - Appends or updates [URL] tag with the provided URL in 'config.txt'.
+    - Sets the url of the default profile in 'config.txt'.
 """
 def save_url_to_config(url):
-    # Save a URL to the configuration file
-    try:
-        configFile = open('config.txt', 'a+')
-    except FileNotFoundError:
-        _create_config_file()
-        configFile = open('config.txt', 'a+')
-    finally:
-        configFile.seek(0)
-        lines = configFile.readlines()
-        url_tag_exists = any('[URL]' in line for line in lines)
-        
-        # If the [URL] tag doesn't exist, write it along with the URL
-        if not url_tag_exists:
-            configFile.write('[URL]\n')
-            configFile.write(f'url = {url}\n\n')
-        else:
-            # If the [URL] tag exists, update the URL value
-            configFile.seek(0)
-            updated_lines = []
-            for line in lines:
-                if '[URL]' in line:
-                    updated_lines.append(f'url = {url}\n')
-                else:
-                    updated_lines.append(line)
-            
-            configFile.truncate(0)
-            configFile.writelines(updated_lines)
-        configFile.close()
-
-"""
-Reads and retrieves the URL stored in the configuration file 'config.txt'.
+    save_profile(DEFAULT_PROFILE, url=url)
 
-Steps:
-    - Attempts to open 'config.txt' in read mode.
-    - Searches for the [URL] tag and extracts the stored URL.
+"""
+Reads and retrieves the URL of the default profile in the configuration file 'config.txt'.
 
 Expected Inputs: None
 
@@ -71,69 +133,23 @@ Outputs:
     - Returns the URL stored in 'config.txt' or None if not found.
 """
 def read_url_from_config():
-    # Read the URL from the configuration file
-    try:
-        with open('config.txt', 'r') as configFile:
-            lines = configFile.readlines()
-            for index, line in enumerate(lines):
-                if '[URL]' in line:
-                    url_line = lines[index + 1]
-                    url = url_line.split('=')[1].strip()
-                    return url
-            return None
-    except FileNotFoundError:
-        return None
+    profile = get_profile()
+    return profile.url if profile else None
 
 """
-Saves the provided task list name to the configuration file 'config.txt'.
-
-Steps:
-    - Attempts to open 'config.txt' in append mode.
-    - If the file doesn't exist, creates a new 'config.txt' file and writes the task list name.
-    - If the file exists, checks for the existence of [TASK_LIST] tag, updates or appends the task list name accordingly.
+Saves the provided task list name to the default profile of the configuration file 'config.txt'.
 
 Expected Inputs:
     - taskListName: A string representing the task list name to be saved in the configuration file.
 
 Outputs:
-    - Appends or updates [TASK_LIST] tag with the provided task list name in 'config.txt'.
+    - Sets the task_list of the default profile in 'config.txt'.
 """
 def save_task_list_name(taskListName):
-    # Save a task list name to the configuration file
-    try:
-        configFile = open('config.txt', 'a+')
-    except FileNotFoundError:
-        _create_config_file()
-        configFile = open('config.txt', 'a+')
-    finally:
-        configFile.seek(0)
-        lines = configFile.readlines()
-        task_list_tag_exists = any('[TASK_LIST]' in line for line in lines)
-        
-        # If the [TASK_LIST] tag doesn't exist, write it along with the task list name
-        if not task_list_tag_exists:
-            configFile.write('[TASK_LIST]\n')
-            configFile.write(f'name = {taskListName}\n\n')
-        else:
-            # If the [TASK_LIST] tag exists, update the task list name
-            configFile.seek(0)
-            updated_lines = []
-            for line in lines:
-                if '[TASK_LIST]' in line:
-                    updated_lines.append(f'name = {taskListName}\n')
-                else:
-                    updated_lines.append(line)
-            
-            configFile.truncate(0)
-            configFile.writelines(updated_lines)
-        configFile.close()
-
-"""
-Retrieves the task list name stored in the configuration file 'config.txt'.
+    save_profile(DEFAULT_PROFILE, task_list=taskListName)
 
-Steps:
-    - Attempts to open 'config.txt' in read mode.
-    - Searches for the 'name' attribute under [TASK_LIST] tag and extracts the stored task list name.
+"""
+Retrieves the task list name of the default profile in the configuration file 'config.txt'.
 
 Expected Inputs: None
 
@@ -141,15 +157,46 @@ Outputs:
     - Returns the task list name stored in 'config.txt' or None if not found.
 """
 def get_task_list_name():
-    # Get the saved task list name from the configuration file
-    try:
-        with open('config.txt', 'r') as configFile:
-            lines = configFile.readlines()
-
-        for line in lines:
-            if "name" in line:
-                taskListName = line.split("=")[1].strip()
-                return taskListName
-        return None
-    except FileNotFoundError:
-        return None
+    profile = get_profile()
+    return profile.task_list if profile else None
+
+def _parse_config(lines):
+    values = {}
+    section = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            section = line[1:-1].strip()
+            continue
+        if '=' not in line:
+            continue
+        key, value = (part.strip() for part in line.split('=', 1))
+
+        if section is not None and section.startswith('profile '):
+            name, field = section[len('profile '):].strip(), key
+        elif section in _LEGACY_SECTIONS or section is None:
+            # Earlier versions could lose the section line when saving, so a bare
+            # 'url = ...' or 'name = ...' line is read the same way
+            name = DEFAULT_PROFILE
+            field = _LEGACY_SECTIONS.get(section) or {'url': 'url', 'name': 'task_list'}.get(key)
+        else:
+            continue
+        if field not in _FIELD_TYPES or (section is None and field in values.get(name, {})):
+            continue
+        try:
+            values.setdefault(name, {})[field] = _FIELD_TYPES[field](value)
+        except ValueError:
+            raise ValueError(f"Invalid {field} '{value}' in profile '{name}' of the configuration file.")
+    return {name: Profile(**fields) for name, fields in values.items()}
+
+def _format_config(profiles):
+    lines = ['# Configuration File', '']
+    for name, profile in profiles.items():
+        lines.append(f'[profile {name}]')
+        for field, value in profile._asdict().items():
+            if value is not None:
+                lines.append(f'{field} = {value}')
+        lines.append('')
+    return '\n'.join(lines)
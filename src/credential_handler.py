@@ -0,0 +1,193 @@
+import datetime
+import os
+import pickle
+import tempfile
+import threading
+
+# Define global constants
+CLIENT_SECRETS_FILE = 'credentials.json'
+# Refresh the access token this long before it expires, so no API call waits on a refresh
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+# Wait this long before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 30
+
+# Define global variables
+# Credential managers by token file, shared by all threads of the process
+MANAGERS = {}
+_MANAGERS_LOCK = threading.Lock()
+
+"""
+Keeps the OAuth credentials of one token file in memory and refreshes them in the
+background shortly before they expire.
+
+The token file is only read again when it changes on disk, and written atomically
+whenever the credentials change. All threads share the same credentials object, and
+a refresh is done once under a lock, however many threads need it at the same time.
+
+If the background refresher finds the refresh token revoked or expired, it stops and
+sets 'needs_sign_in' until the user signs in again or the token file changes. Only
+network errors are retried.
+
+Usage:
+    credentials = get_credential_manager('token.pickle', SCOPES).get()
+"""
+class CredentialManager:
+    def __init__(self, token_file, scopes):
+        self.token_file = token_file
+        self.scopes = scopes
+        self.credentials = None
+        self.needs_sign_in = False
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._closed = threading.Event()
+
+    """
+    Returns valid credentials and starts the background refresher.
+
+    Loads the token file on first use or when it changed on disk, refreshes expired
+    credentials and, if 'interactive' is True, asks the user to sign in when there is
+    no usable token.
+
+    Raises:
+    - RuntimeError: If sign-in is needed and 'interactive' is False.
+    - google.auth.exceptions.RefreshError: If the refresh token was revoked or expired.
+    """
+    def get(self, interactive=True):
+        with self._lock:
+            self._load_if_changed()
+            if self.needs_sign_in:
+                from google.auth.exceptions import RefreshError
+                raise RefreshError(f"The refresh token in '{self.token_file}' was revoked or has expired.")
+            if not self.credentials or not self.credentials.valid:
+                if self.credentials and self.credentials.refresh_token:
+                    self._refresh()
+                elif not interactive:
+                    raise RuntimeError(f"No valid credentials in '{self.token_file}' and sign-in is disabled.")
+                else:
+                    self._sign_in()
+            self._start_refresher()
+            return self.credentials
+
+    """
+    Forgets the cached credentials and asks the user to sign in again.
+    """
+    def sign_in(self):
+        with self._lock:
+            self._sign_in()
+            self._start_refresher()
+            return self.credentials
+
+    """
+    Stops the background refresher. The manager can still be used afterwards.
+    """
+    def close(self):
+        self._closed.set()
+        refresher = self._refresher
+        if refresher is not None and refresher is not threading.current_thread():
+            refresher.join()
+        self._refresher = None
+
+    def _load_if_changed(self):
+        try:
+            mtime = os.stat(self.token_file).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.token_file, 'rb') as token:
+                self.credentials = pickle.load(token)
+            self._mtime = mtime
+            # A new token may have been saved by a sign-in in another process
+            self.needs_sign_in = False
+
+    def _refresh(self):
+        from google.auth.transport.requests import Request
+        self.credentials.refresh(Request())
+        self._save()
+
+    def _sign_in(self):
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, self.scopes)
+        self.credentials = flow.run_local_server(port=0, access_type='offline')
+        self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as token:
+                pickle.dump(self.credentials, token)
+            os.replace(temp_path, self.token_file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._mtime = os.stat(self.token_file).st_mtime_ns
+        self.needs_sign_in = False
+
+    def _start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        if not self.credentials.refresh_token:
+            return
+        self._closed.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="credential-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._closed.wait(self._seconds_until_refresh()):
+            try:
+                with self._lock:
+                    # Another thread may have refreshed or replaced the token in the meantime
+                    self._load_if_changed()
+                    if self._seconds_until_refresh() <= 0:
+                        self._refresh()
+            except Exception as e:
+                from google.auth.exceptions import RefreshError, TransportError
+                if isinstance(e, TransportError):
+                    print(f"Background token refresh failed, retrying in {REFRESH_RETRY_SECONDS}s: {e}")
+                    if self._closed.wait(REFRESH_RETRY_SECONDS):
+                        break
+                    continue
+                if isinstance(e, RefreshError):
+                    # Retrying can't help, the user has to sign in again
+                    self.needs_sign_in = True
+                    print(f"Background token refresh stopped, sign in again: {e}")
+                else:
+                    print(f"Background token refresh stopped: {e}")
+                break
+
+    def _seconds_until_refresh(self):
+        expiry = self.credentials.expiry
+        if expiry is None:
+            # Unknown expiry, check again in an hour
+            return 3600
+        # google-auth stores the expiry as naive UTC
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - REFRESH_MARGIN - now).total_seconds())
+
+"""
+Returns the credential manager of a token file, creating it on first use.
+
+Args:
+- token_file (str): The file the OAuth token is stored in.
+- scopes (list): The OAuth scopes to request when the user signs in.
+
+Returns:
+- CredentialManager: The manager shared by all callers in this process.
+"""
+def get_credential_manager(token_file, scopes):
+    with _MANAGERS_LOCK:
+        manager = MANAGERS.get(token_file)
+        if manager is None:
+            manager = MANAGERS[token_file] = CredentialManager(token_file, scopes)
+        return manager
+
+"""
+Stops the background refresher of a token file and drops its cached credentials.
+Used when a process is done with a user, such as a multi-tenant worker.
+"""
+def close_credential_manager(token_file):
+    with _MANAGERS_LOCK:
+        manager = MANAGERS.pop(token_file, None)
+    if manager is not None:
+        manager.close()
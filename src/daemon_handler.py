@@ -0,0 +1,180 @@
+import datetime
+import signal
+import threading
+import time
+from collections import deque
+import config_handler
+import icalendar_handler
+
+# Define global constants
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 6 * 60 * 60
+# How much longer to wait after each poll that found the feed unchanged
+BACKOFF_FACTOR = 1.5
+# Number of recent polls used to estimate how often the feed changes
+HISTORY_SIZE = 24
+# Poll at least this many times between a feed change and the next expected one
+POLLS_PER_CHANGE = 3
+# Poll at least this many times before the nearest due date
+POLLS_BEFORE_DUE = 4
+# Manual triggers arriving within this many seconds of each other start a single sync
+TRIGGER_DEBOUNCE = 2.0
+
+"""
+Picks the time of the next feed poll.
+
+The interval adapts to two signals:
+- How often the feed changed recently. After a change the scheduler polls again after
+    MIN_INTERVAL, and every unchanged poll makes the next wait BACKOFF_FACTOR times longer,
+    up to MAX_INTERVAL, but never longer than a third of the average time between the
+    recent changes.
+- How soon the nearest due date is. The wait is capped at a quarter of the time left
+    until it, so due-date changes made right before a deadline are caught quickly.
+
+The interval is never shorter than MIN_INTERVAL.
+"""
+class PollScheduler:
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        # (time, changed) of the recent polls
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+    """
+    Records the outcome of a poll and returns the number of seconds until the next one.
+
+    Args:
+    - changed (bool): Whether the feed changed since the previous poll.
+    - next_due (date or datetime, optional): The earliest due date in the sync window.
+    - now (float, optional): The current time in seconds since the epoch.
+    """
+    def record_poll(self, changed, next_due=None, now=None):
+        now = time.time() if now is None else now
+        self.history.append((now, changed))
+
+        if changed:
+            interval = self.min_interval
+        else:
+            interval = self.interval * BACKOFF_FACTOR
+            change_gap = self._get_change_gap()
+            if change_gap is not None:
+                interval = min(interval, change_gap / POLLS_PER_CHANGE)
+
+        if next_due is not None:
+            until_due = _to_timestamp(next_due) - now
+            if until_due > 0:
+                interval = min(interval, until_due / POLLS_BEFORE_DUE)
+
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+        return self.interval
+
+    def _get_change_gap(self):
+        changes = [moment for moment, changed in self.history if changed]
+        if len(changes) < 2:
+            return None
+        return (changes[-1] - changes[0]) / (len(changes) - 1)
+
+"""
+Runs the sync in a loop, keeping the Google Tasks session and the caches of the
+process warm between cycles.
+
+The next cycle starts when the interval picked by the PollScheduler has passed or a
+sync is triggered manually with 'trigger()' or SIGUSR1. Triggers that arrive while
+waiting or syncing are coalesced, so a burst of them starts one extra sync.
+
+With 'profile', the feed URL, task list and day range are read from that profile of
+the configuration file before every cycle, so edits take effect without a restart.
+"""
+class SyncDaemon:
+    def __init__(self, sync, feed_url, scheduler=None, profile=None, **sync_args):
+        self.sync = sync
+        self.feed_url = feed_url
+        self.profile = profile
+        self.sync_args = sync_args
+        self.scheduler = scheduler or PollScheduler()
+        self._wake = threading.Event()
+        self._triggered = False
+        self._stopping = False
+        self._previous_hash = None
+
+    """
+    Requests a sync as soon as possible.
+    """
+    def trigger(self):
+        self._triggered = True
+        self._wake.set()
+
+    """
+    Stops the daemon after the current cycle.
+    """
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    """
+    Runs cycles until 'stop()' is called.
+
+    Args:
+    - cycles (int, optional): Stop after this many cycles, for testing.
+    """
+    def run(self, cycles=None):
+        completed = 0
+        while not self._stopping and (cycles is None or completed < cycles):
+            self._triggered = False
+            self._wake.clear()
+            interval = self._run_cycle()
+            completed += 1
+            if cycles is not None and completed >= cycles:
+                break
+
+            if not self._triggered:
+                print(f"Next sync in {interval / 60:.1f} minutes.")
+                self._wake.wait(interval)
+            if self._triggered and not self._stopping:
+                # Let a burst of triggers settle into one sync
+                time.sleep(TRIGGER_DEBOUNCE)
+
+    """
+    Installs signal handlers: SIGUSR1 triggers a sync, SIGINT and SIGTERM stop the daemon.
+    Must be called from the main thread.
+    """
+    def install_signal_handlers(self):
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.trigger())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+
+    def _run_cycle(self):
+        next_due = None
+        try:
+            self._reload_profile()
+            results = self.sync(self.feed_url, reuse_session=True, **self.sync_args)
+            next_due = results.get("next_due")
+        except Exception as e:
+            print(f"Sync failed: {e}")
+
+        feed_urls = icalendar_handler.split_feed_urls(self.feed_url)
+        body_hashes = tuple(icalendar_handler.FEED_STATE.get(url, {}).get("body_hash") for url in feed_urls)
+        # A feed that could not be fetched tells nothing about changes
+        changed = None not in body_hashes and body_hashes != self._previous_hash
+        if None not in body_hashes:
+            self._previous_hash = body_hashes
+        return self.scheduler.record_poll(changed, next_due)
+
+    def _reload_profile(self):
+        profile = config_handler.get_profile(self.profile) if self.profile else None
+        if profile is None:
+            return
+        if profile.url:
+            self.feed_url = profile.url
+        if profile.task_list:
+            self.sync_args["task_list_name"] = profile.task_list
+        if profile.day_range:
+            self.sync_args["day_range"] = profile.day_range
+
+def _to_timestamp(due):
+    if isinstance(due, datetime.datetime):
+        return due.timestamp()
+    # All-day due dates count as due at the end of the day
+    return datetime.datetime.combine(due, datetime.time.max).timestamp()
@@ -0,0 +1,104 @@
+from fingerprint_handler import get_assignment_key, get_fingerprint, format_due, FINGERPRINT_PREFIX, OCCURRENCE_SEPARATOR
+
+"""
+Compares the assignments of a feed with the synced tasks and returns every change
+needed to bring the task list up to date.
+
+Assignments are matched to tasks through the fingerprint index, keyed by event UID,
+so a renamed assignment or one with a new due date keeps its task. Each assignment,
+index entry and task is looked at once, and due dates are normalized to ISO date
+strings once per value, so the diff is linear in the number of events and tasks.
+
+- created: assignments that were never synced, or whose task was deleted in Google Tasks.
+- due_changed: assignments whose due date differs from their task's.
+- renamed: assignments whose title changed on Canvas since they were last synced.
+    Titles edited in Google Tasks are left alone.
+- moved: assignments whose task is in another task list than the one they are routed to.
+- deleted: synced assignments whose UID is no longer in the feed. Assignments that
+    only moved out of the sync window are not deleted, and neither are assignments
+    without a UID or legacy entries that were never matched. An occurrence of a
+    recurring event is only deleted with its whole series, since past occurrences
+    are not expanded. Only detected when 'feed_uids' is given.
+
+An assignment can be both in 'due_changed' and in 'renamed', and also in 'moved'.
+
+With 'tasklist_for', every assignment is routed to the task list it returns. An
+assignment whose task is in another list than its route is moved to the new list,
+so the task keeps its status and notes. Its other changes are given for the new list.
+
+Index entries written before the index was keyed by UID are moved to their UID
+key in 'fingerprint_index' as they are matched, and entries of removed assignments
+whose task no longer exists are dropped from it.
+
+Args:
+- assignments (list): The assignments returned by 'get_ical_content()'.
+- fingerprint_index (dict): The index returned by 'load_fingerprint_index()'.
+- tasks (list): The tasks of all task lists the assignments are synced to, as returned
+    by 'get_mirrored_tasks()'.
+- feed_uids (set, optional): The UIDs of all events in the feed, as returned by 'get_feed_uids()'.
+- tasklist_for (callable, optional): Returns the ID of the task list an assignment belongs in.
+- default_tasklist (str, optional): The task list of index entries that do not record one.
+
+Returns:
+- dict: The keys 'created' (list of (key, assignment, tasklist)), 'due_changed' and 'renamed'
+    (lists of (key, task_id, assignment, tasklist)), 'moved' (list of (key, task_id,
+    assignment, tasklist, destination_tasklist)) and 'deleted' (list of (key, task_id, tasklist)).
+    The task list is None when neither 'tasklist_for' nor 'default_tasklist' is given.
+"""
+def diff_tasks(assignments, fingerprint_index, tasks, feed_uids=None, tasklist_for=None, default_tasklist=None):
+    tasks_by_id = {task['id']: task for task in tasks}
+    changes = {"created": [], "due_changed": [], "renamed": [], "moved": [], "deleted": []}
+    seen = set()
+
+    for assignment in assignments:
+        key = get_assignment_key(assignment)
+        if key in seen:
+            # The same event appears twice in the feed
+            continue
+        seen.add(key)
+
+        entry = fingerprint_index.get(key)
+        if entry is None:
+            entry = _migrate_legacy_entry(fingerprint_index, key, assignment)
+        tasklist = tasklist_for(assignment) if tasklist_for else default_tasklist
+        task = tasks_by_id.get(entry['task_id']) if entry else None
+        if task is None:
+            # Assignment has never been synced or its task was deleted, it's a new assignment
+            changes["created"].append((key, assignment, tasklist))
+            continue
+
+        current_tasklist = entry.get('tasklist') or default_tasklist
+        if current_tasklist != tasklist:
+            # The assignment is routed to another list now, move its task there
+            changes["moved"].append((key, entry['task_id'], assignment, current_tasklist, tasklist))
+
+        if format_due(task['due'] or entry['due']) != format_due(assignment.date):
+            changes["due_changed"].append((key, entry['task_id'], assignment, tasklist))
+        if entry['title'] != assignment.name:
+            changes["renamed"].append((key, entry['task_id'], assignment, tasklist))
+
+    if feed_uids is not None:
+        forgotten = []
+        for key, entry in fingerprint_index.items():
+            if key in seen or key in feed_uids or 'title' not in entry or key.startswith(FINGERPRINT_PREFIX):
+                continue
+            if OCCURRENCE_SEPARATOR in key and key.partition(OCCURRENCE_SEPARATOR)[0] in feed_uids:
+                # An occurrence of a recurring event that is still in the feed
+                continue
+            if entry['task_id'] in tasks_by_id:
+                changes["deleted"].append((key, entry['task_id'], entry.get('tasklist') or default_tasklist))
+            else:
+                # Removed from Canvas and its task is already gone, nothing left to do
+                forgotten.append(key)
+        for key in forgotten:
+            del fingerprint_index[key]
+
+    return changes
+
+def _migrate_legacy_entry(fingerprint_index, key, assignment):
+    entry = fingerprint_index.pop(get_fingerprint(assignment), None)
+    if entry is not None:
+        # Legacy entries have no title, take the one of the assignment they were found by
+        entry.setdefault('title', assignment.name)
+        fingerprint_index[key] = entry
+    return entry
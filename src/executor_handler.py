@@ -0,0 +1,174 @@
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from metrics_handler import increment
+import random
+import threading
+import time
+
+# Define global constants
+MAX_WORKERS = 8
+# The Tasks API allows 50,000 queries per day and is throttled per user per minute,
+# so stay well below a sustained 10 requests per second
+RATE_LIMIT = 8
+BURST_LIMIT = 16
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Define global variables
+HTTP_FACTORY = None
+# Incremented by every 'set_http_factory()' call, so threads drop transports built before it
+HTTP_GENERATION = 0
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_THREAD_LOCAL = threading.local()
+
+"""
+Token bucket rate limiter shared by all executor threads.
+
+Tokens are added continuously at 'rate' per second up to 'capacity'. Each API call
+takes one token (a batch request takes one per request inside it) and waits until
+enough tokens are available, so bursts are allowed but the long-run request rate
+never exceeds 'rate'.
+
+A request costing more than 'capacity', such as a batch of 50 calls, waits for a full
+bucket and then takes its whole cost, leaving the bucket in debt. Later requests wait
+until the debt is paid back, so large batches are throttled like single calls.
+"""
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # The bucket never holds more than its capacity, so that is all a request can wait for
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+BUCKET = TokenBucket(RATE_LIMIT, BURST_LIMIT)
+
+"""
+Sets the function used to create the HTTP transport of each executor thread.
+
+httplib2 connections are not thread-safe, so every worker thread builds its own
+transport with this factory the first time it executes a request. Transports built
+before the last call, possibly with other credentials, are discarded.
+
+Args:
+- factory (callable): Returns a new authorized HTTP object, or None to use the
+    transport the request was built with.
+"""
+def set_http_factory(factory):
+    global HTTP_FACTORY, HTTP_GENERATION
+    HTTP_FACTORY = factory
+    HTTP_GENERATION += 1
+
+"""
+Submits a Tasks API request to the thread pool.
+
+The request is executed on a worker thread once the rate limiter allows it, and
+is retried with exponential backoff and jitter when it fails with a 429 or 5xx
+status or a network error.
+
+Args:
+- request: An HttpRequest or BatchHttpRequest, or a function returning one. A function
+    is called again before every attempt, which is needed for requests that cannot be
+    sent twice.
+- cost (int, optional): The number of API calls the request counts against the quota (default is 1).
+
+Returns:
+- Future: Resolves to the API response, or raises the last error.
+"""
+def submit(request, cost=1):
+    return _get_executor().submit(_execute_with_retry, request, cost)
+
+"""
+Executes a Tasks API request through the thread pool and waits for the response.
+
+Args:
+- request: An HttpRequest or BatchHttpRequest, or a function returning one.
+- cost (int, optional): The number of API calls the request counts against the quota (default is 1).
+
+Returns:
+- The API response.
+
+Raises:
+- HttpError: If the request fails with a non-retryable status or runs out of retries.
+"""
+def execute(request, cost=1):
+    return submit(request, cost).result()
+
+"""
+Returns True if a request that failed with 'error' should be retried.
+"""
+def is_retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRY_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+"""
+Returns the number of seconds to wait before retry number 'attempt' (starting at 0).
+
+Uses exponential backoff with full jitter, capped at BACKOFF_MAX.
+"""
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+"""
+Shuts down the thread pool. A new pool is created on the next submit.
+"""
+def shutdown():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=True)
+            _EXECUTOR = None
+
+def _get_executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tasks-api")
+        return _EXECUTOR
+
+def _get_thread_http():
+    if HTTP_FACTORY is None:
+        return None
+    if getattr(_THREAD_LOCAL, 'generation', None) != HTTP_GENERATION:
+        _THREAD_LOCAL.http = HTTP_FACTORY()
+        _THREAD_LOCAL.generation = HTTP_GENERATION
+    return _THREAD_LOCAL.http
+
+def _execute_with_retry(request, cost):
+    attempt = 0
+    while True:
+        current_request = request if hasattr(request, 'execute') else request()
+        method = getattr(current_request, 'methodId', None) or 'batch'
+        BUCKET.acquire(cost)
+        increment("tasks_api_requests_total", method=method)
+        increment("tasks_api_quota_calls_total", cost)
+        try:
+            http = _get_thread_http()
+            return current_request.execute(http=http) if http else current_request.execute()
+        except Exception as e:
+            if attempt >= MAX_RETRIES or not is_retryable(e):
+                increment("tasks_api_errors_total", method=method)
+                raise
+            increment("tasks_api_retries_total", method=method)
+            delay = backoff_delay(attempt)
+            print(f"Retrying Tasks API request in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+FEED_CACHE_DIR = ".feed_cache"
+
+"""
+    Loads the cached copy of an iCalendar feed.
+
+    Args:
+        url (str): The URL of the feed.
+        cache_dir (str): The directory holding the feed cache.
+
+    Returns:
+        dict: The cache entry with the keys 'url', 'etag', 'last_modified', 'body_hash',
+            'body', 'parsed' and 'synced', or None if the feed has not been cached yet.
+"""
+def load_feed_cache(url, cache_dir=FEED_CACHE_DIR):
+    try:
+        with open(_get_cache_path(url, cache_dir), 'rb') as file:
+            entry = pickle.load(file)
+    except Exception:
+        # A missing, truncated or foreign cache file is refetched and rebuilt
+        return None
+    # Ignore hash collisions and entries written for another URL
+    return entry if isinstance(entry, dict) and entry.get('url') == url else None
+
+"""
+    Saves a feed cache entry, replacing the previous one atomically.
+
+    The entry is written to a temporary file in the cache directory and then renamed,
+    so a run that is interrupted never leaves a partially written cache behind.
+
+    Args:
+        entry (dict): The cache entry, as returned by 'new_feed_cache_entry()' or 'load_feed_cache()'.
+        cache_dir (str): The directory holding the feed cache.
+"""
+def save_feed_cache(entry, cache_dir=FEED_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, _get_cache_path(entry['url'], cache_dir))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+"""
+    Creates an empty feed cache entry for a URL.
+"""
+def new_feed_cache_entry(url):
+    return {
+        "url": url,
+        "etag": None,
+        "last_modified": None,
+        "body_hash": None,
+        "body": None,
+        "parsed": None,
+        "synced": None,
+    }
+
+"""
+    Returns the hash used to detect whether a feed body changed.
+"""
+def hash_feed_body(body):
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+def _get_cache_path(url, cache_dir):
+    return os.path.join(cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".pickle")
@@ -0,0 +1,162 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+FINGERPRINT_FILE = "fingerprints.json"
+FINGERPRINT_PREFIX = "fingerprint:"
+# Keys the task left behind by a half-finished move to another list, until it is deleted
+MOVED_PREFIX = "moved:"
+# Joins the UID of a recurring event and the original start of one of its occurrences
+OCCURRENCE_SEPARATOR = "#"
+
+"""
+Returns the fingerprint of an assignment.
+
+The fingerprint is a hash of the event UID, the course and the title, so assignments
+with the same title in different courses get different fingerprints, and a renamed
+assignment gets a new one.
+
+Args:
+- assignment (Assignment): An assignment as returned by 'get_ical_content()'.
+
+Returns:
+- str: The hex digest identifying the assignment.
+"""
+def get_fingerprint(assignment):
+    key = "\x1f".join(str(getattr(assignment, field) or "") for field in ("uid", "course", "name"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+"""
+Returns the key an assignment is stored under in the fingerprint index.
+
+The key is the event UID, which Canvas keeps when an assignment is renamed or its
+due date changes. Assignments without a UID fall back to their fingerprint, prefixed
+with FINGERPRINT_PREFIX.
+
+Args:
+- assignment (Assignment): An assignment as returned by 'get_ical_content()'.
+
+Returns:
+- str: The key of the assignment.
+"""
+def get_assignment_key(assignment):
+    return assignment.uid or FINGERPRINT_PREFIX + get_fingerprint(assignment)
+
+"""
+Returns a due date as the string stored in the fingerprint index.
+
+Args:
+- due (date, datetime or str): A date, a datetime, or an RFC3339 due string from the Google Tasks API.
+
+Returns:
+- str: The due date in ISO format (YYYY-MM-DD), or None.
+"""
+def format_due(due):
+    if due is None:
+        return None
+    if isinstance(due, str):
+        return due[:10]
+    if isinstance(due, datetime.datetime):
+        if due.tzinfo is not None:
+            due = due.astimezone()
+        due = due.date()
+    return due.isoformat()
+
+"""
+Loads the fingerprint index.
+
+The index maps each assignment key (see 'get_assignment_key()') to a dict with the
+Google task ID ('task_id'), the task list holding it ('tasklist') and the due date
+('due') and title ('title') it was last synced with. Indexes written before the keys were UIDs are keyed by fingerprint and
+have no title; the diff moves their entries to the new keys as it finds them.
+
+Args:
+- filename (str): The file holding the index.
+
+Returns:
+- dict: The fingerprint index, or None if no index has been saved yet.
+"""
+def load_fingerprint_index(filename=FINGERPRINT_FILE):
+    try:
+        with open(filename, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+"""
+Saves the fingerprint index atomically.
+
+The index is written to a temporary file next to 'filename' and then renamed over it,
+so an interrupted run leaves either the old or the new index behind.
+
+Args:
+- index (dict): The fingerprint index.
+- filename (str): The file holding the index.
+"""
+def save_fingerprint_index(index, filename=FINGERPRINT_FILE):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(index, file, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+"""
+Records the Google task an assignment was synced to.
+
+Args:
+- index (dict): The fingerprint index.
+- key (str): The key of the assignment, as returned by 'get_assignment_key()'.
+- task_id (str): The ID of the Google task.
+- due (date, datetime or str): The due date the task was synced with.
+- title (str, optional): The title the task was synced with.
+- tasklist (str, optional): The ID of the task list holding the task.
+"""
+def record_fingerprint(index, key, task_id, due, title=None, tasklist=None):
+    index[key] = {"task_id": task_id, "due": format_due(due), "title": title, "tasklist": tasklist}
+
+"""
+Records the old task of an assignment that moved to another task list, when its new
+task was created but the old one could not be deleted yet.
+
+The entry is keyed by MOVED_PREFIX and the assignment key, which is never in a feed, so
+the diff plans its delete like that of a removed assignment on every run until it succeeds.
+
+Args:
+- index (dict): The fingerprint index.
+- key (str): The key of the assignment, as returned by 'get_assignment_key()'.
+- task_id (str): The ID of the old Google task.
+- tasklist (str, optional): The ID of the task list holding the old task.
+"""
+def record_moved_task(index, key, task_id, tasklist=None):
+    record_fingerprint(index, MOVED_PREFIX + key, task_id, None, "", tasklist)
+
+"""
+Builds an index for assignments that were synced before the fingerprint index existed.
+
+Assignments are matched to existing Google tasks by title, which is how tasks were
+matched before. Each task is matched to at most one assignment, so assignments with
+the same title in different courses do not share a task. This is only needed once,
+the first time the index is created.
+
+Args:
+- assignments (list): The assignments returned by 'get_ical_content()'.
+- tasks (list): All tasks of the task list, as returned by 'get_all_tasks()'.
+
+Returns:
+- dict: A fingerprint index for the assignments that already have a task.
+"""
+def seed_fingerprint_index(assignments, tasks):
+    task_dict = {task['title']: task for task in tasks}
+    index = {}
+    for assignment in assignments:
+        task = task_dict.pop(assignment.name, None)
+        if task:
+            record_fingerprint(index, get_assignment_key(assignment), task['id'], task.get('due'), task['title'])
+    return index
@@ -1,69 +1,837 @@
+import calendar
 import datetime
-import requests
-import icalendar
+import heapq
+import re
+import threading
+import time
+# requests and icalendar are imported where they are used, so a run that exits early
+# or only uses the streaming parser doesn't pay for loading them
+from assignment_handler import Assignment, hash_description
+from feed_cache_handler import *
+from fingerprint_handler import OCCURRENCE_SEPARATOR
+from metrics_handler import span, increment
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+FETCH_TIMEOUT = 30
+POOL_SIZE = 10
+
+SESSION = None
+_SESSION_LOCK = threading.Lock()
+# Per feed URL: the body hash, window and event UIDs of the last get_ical_content()
+# call, and whether that exact content was already synced
+FEED_STATE = {}
+
+# Bumped when the parsed assignments change shape, so cached parses of older versions are not reused
+PARSE_FORMAT = 2
+
+# Several feed URLs can be given in one setting, separated by whitespace or commas
+FEED_URL_SEPARATOR = re.compile(r"[\s,]+")
+
+# Canvas appends the course code to every event summary, e.g. "Homework 1 [COP3502]"
+COURSE_PATTERN = re.compile(r"\[([^\[\]]+)\]\s*$")
+
+# BYDAY weekday codes, in the order of date.weekday()
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+# RRULE parts the recurrence expansion understands. Rules with any other part, or with
+# a frequency below a day, are not expanded and only their DTSTART occurrence is kept.
+SUPPORTED_RULE_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "BYMONTH", "WKST"}
+# Properties of an event outside the window that are kept in case an RRULE or RDATE
+# line further down brings it back into the window
+_DEFERRED_PROPERTIES = ("UID", "SUMMARY", "DESCRIPTION", "DTEND", "EXDATE", "RECURRENCE-ID")
+
+"""
+    [Internal] Returns the HTTP session shared by all feed downloads.
+
+    The session keeps connections alive between requests and asks for a compressed
+    response, which makes large Canvas feeds much smaller on the wire. It is shared by
+    the threads of 'get_ical_contents()', with up to POOL_SIZE connections per host.
+
+    Returns:
+        requests.Session: The shared session.
+"""
+def _get_session():
+    global SESSION
+    with _SESSION_LOCK:
+        if SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            SESSION = session
+    return SESSION
 
 """
     [Internal] Fetches an iCalendar file from a given URL.
 
+    When validators from a previous download are given, the request is conditional and
+    the server may answer with 304 Not Modified instead of sending the file again.
+
     Args:
         url (str): The URL pointing to the iCalendar file.
+        etag (str): The ETag of the cached copy, if any.
+        last_modified (str): The Last-Modified header of the cached copy, if any.
 
     Returns:
-        str: The text content of the fetched iCalendar file.
+        tuple: The text content of the fetched iCalendar file (None if it was not modified)
+            and the response.
 
     Raises:
-        Exception: If fetching the iCalendar file fails due to a non-200 status code.
+        Exception: If fetching the iCalendar file fails due to a status code other than 200 or 304.
 """
-def _fetch_ical_from_web(url):
+def _fetch_ical_from_web(url, etag=None, last_modified=None):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
     # Fetch iCalendar file from the web using the provided URL
-    response = requests.get(url)
-    
-    # Check if the request was successful (status code 200)
+    with span("ical.download"):
+        response = _get_session().get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    # Content-Length is the size on the wire, before decompression
+    increment("feed_bytes_downloaded_total", int(response.headers.get("Content-Length") or len(response.content)))
+    increment("feed_responses_total", status=response.status_code)
+
+    # Check if the request was successful (status code 200) or the cached copy is still valid (304)
     if response.status_code == 200:
-        return response.text
+        return response.text, response
+    elif response.status_code == 304:
+        return None, response
     else:
         # Raise an exception if fetching the iCalendar file failed
         raise Exception(f"Failed to fetch iCalendar file. Status code: {response.status_code}")
 
+"""
+    [Internal] Parses iCalendar content and yields its assignments.
+
+    The calendar tree is built up front, but the assignments are yielded one at a time
+    as the events are walked, like 'iter_ical_assignments()' does.
+
+    Args:
+        ical_content (str): The text content of an iCalendar file.
+        day_range (int): The number of days into the future to get assignments
+        seen_uids (set, optional): Receives the UID of every event in the feed, also
+            those outside the window.
+
+    Yields:
+        Assignment: Each assignment inside the window.
+"""
+def _parse_ical_content(ical_content, day_range, seen_uids=None):
+    import icalendar
+
+    # Parse the fetched iCalendar content
+    cal = icalendar.Calendar.from_ical(ical_content)
+    now, assignment_cutoff_date = _get_window(day_range)
+    # Occurrences of recurring events, and the ones replaced by a RECURRENCE-ID event
+    occurrences = []
+    overridden = set()
+
+    # Iterate through each component in the iCalendar data
+    parsed = kept = 0
+    try:
+        for component in cal.walk():
+            if component.name == "VEVENT":
+                parsed += 1
+                uid = str(component.get('uid')) if component.get('uid') else None
+                if seen_uids is not None and uid:
+                    seen_uids.add(uid)
+                if 'recurrence-id' in component:
+                    # A single occurrence of a recurring event that was moved or edited
+                    uid = _get_occurrence_uid(uid, component.get('recurrence-id').dt)
+                    overridden.add(uid)
+                # Skip the component unless it is an assignment (a due date but no end date)
+                if 'dtstart' not in component or 'dtend' in component:
+                    continue
+                summary = str(component.get('summary')) if component.get('summary') is not None else None
+                assignment = Assignment(uid, summary, _get_course(summary), component.get('dtstart').dt,
+                                        hash_description(component.get('description')))
+                if 'recurrence-id' not in component and ('rrule' in component or 'rdate' in component):
+                    occurrences.extend(_expand_event(assignment, _get_rrule(component), _get_dates(component, 'rdate'),
+                                                     _get_dates(component, 'exdate'), now, assignment_cutoff_date))
+                    continue
+                # filter out dates that are in the past or too many days into the future
+                if now <= _to_date(assignment.date) <= assignment_cutoff_date:
+                    kept += 1
+                    yield assignment
+
+        for occurrence in occurrences:
+            if occurrence.uid not in overridden:
+                kept += 1
+                yield occurrence
+    finally:
+        increment("ical_events_parsed_total", parsed)
+        increment("ical_events_kept_total", kept)
+
+"""
+    Parses iCalendar lines one at a time and yields the assignments inside the window.
+
+    Unlike '_parse_ical_content()', no calendar tree is built. Only the few properties
+    needed for an assignment are kept while reading an event, and an event is skipped
+    as soon as its DTSTART falls outside the window, so memory use does not depend on
+    the size of the feed and out-of-window events cost almost nothing.
+
+    Recurring events are expanded with 'iter_occurrences()'. Their occurrences are
+    yielded after the last event of the feed, once every RECURRENCE-ID event that
+    replaces one of them is known.
+
+    Args:
+        lines (iterable): The lines of an iCalendar file, e.g. an open file or a response's iter_lines().
+        day_range (int): The number of days into the future to get assignments
+        today (date): The first day of the window. Defaults to today.
+        seen_uids (set, optional): Receives the UID of every event in the feed, also
+            those outside the window.
+
+    Yields:
+        Assignment: Each assignment inside the window.
+"""
+def iter_ical_assignments(lines, day_range=14, today=None, seen_uids=None):
+    start, end = _get_window(day_range, today)
+    event = None
+    depth = 0
+    skip = False
+    deferred = []
+    occurrences = []
+    overridden = set()
+    parsed = kept = 0
+
+    try:
+        for line in _unfold_lines(lines):
+            if line.startswith("BEGIN:"):
+                if event is not None:
+                    # Nested component such as VALARM
+                    depth += 1
+                elif line == "BEGIN:VEVENT":
+                    event = {}
+                    depth = 0
+                    skip = False
+                    deferred = []
+                    parsed += 1
+                continue
+
+            if line.startswith("END:"):
+                if event is not None and depth:
+                    depth -= 1
+                elif line == "END:VEVENT" and event is not None:
+                    if skip:
+                        # Only the UID of an event outside the window is still needed, and
+                        # the occurrence it replaces if it is a moved occurrence
+                        for deferred_line in deferred:
+                            if deferred_line.startswith(("UID", "RECURRENCE-ID")):
+                                _read_property(event, deferred_line)
+                    if seen_uids is not None and "UID" in event:
+                        seen_uids.add(event["UID"])
+                    if "RECURRENCE-ID" in event:
+                        overridden.add(_get_occurrence_uid(event.get("UID"), event["RECURRENCE-ID"]))
+                    # Check if the component is an assignment (missing start or end date)
+                    is_assignment = "DTSTART" not in event or "DTEND" not in event
+                    if not skip and is_assignment and "DTSTART" in event:
+                        assignment = Assignment(event.get("UID"), event.get("SUMMARY"), _get_course(event.get("SUMMARY")),
+                                                event["DTSTART"], hash_description(event.get("DESCRIPTION")))
+                        if "RECURRENCE-ID" in event:
+                            assignment.uid = _get_occurrence_uid(event.get("UID"), event["RECURRENCE-ID"])
+                        elif "RRULE" in event or "RDATE" in event:
+                            occurrences.extend(_expand_event(assignment, event.get("RRULE"), event.get("RDATE", ()),
+                                                             event.get("EXDATE", ()), start, end))
+                            assignment = None
+                        if assignment is not None:
+                            kept += 1
+                            yield assignment
+                    event = None
+                continue
+
+            if event is None or depth:
+                continue
+            if skip:
+                if line.startswith(("RRULE", "RDATE")):
+                    # A recurring event can have occurrences in the window although its first one is outside
+                    skip = False
+                    for deferred_line in deferred:
+                        _read_property(event, deferred_line)
+                    _read_property(event, line)
+                elif line.startswith(_DEFERRED_PROPERTIES):
+                    deferred.append(line)
+                continue
+
+            name = _read_property(event, line)
+            if name == "DTSTART" and "RRULE" not in event and "RDATE" not in event:
+                # filter out dates that are in the past or too many days into the future
+                skip = not start <= _to_date(event[name]) <= end
+
+        for assignment in occurrences:
+            if assignment.uid not in overridden:
+                kept += 1
+                yield assignment
+    finally:
+        # Counted once at the end, also when the caller stops reading early
+        increment("ical_events_parsed_total", parsed)
+        increment("ical_events_kept_total", kept)
+
+"""
+    [Internal] Reads one content line of an event into 'event' and returns the property name.
+"""
+def _read_property(event, line):
+    name, params, value = _split_property(line)
+    if name in ("DTSTART", "RECURRENCE-ID"):
+        event[name] = _parse_ical_date(value, params)
+    elif name == "DTEND":
+        event[name] = True
+    elif name in ("UID", "SUMMARY", "DESCRIPTION"):
+        event[name] = _unescape_text(value)
+    elif name == "RRULE":
+        event[name] = value
+    elif name in ("RDATE", "EXDATE"):
+        # PERIOD values ("start/end") only need their start
+        event.setdefault(name, []).extend(_parse_ical_date(part.split("/")[0], params) for part in value.split(","))
+    return name
+
+"""
+    Yields the starts of the occurrences of a recurring event inside a window, in order.
+
+    The RRULE is expanded lazily, one period (day, week, month or year) at a time, and
+    stops at the end of the window. An open-ended rule jumps straight to the period
+    holding the window start, and so does a COUNT rule whose periods all have the same
+    number of occurrences, so the cost grows with the size of the window and not with
+    how long ago the rule started. Other COUNT rules are walked from the start, which
+    is bounded by their COUNT.
+
+    Supported are FREQ=DAILY, WEEKLY, MONTHLY and YEARLY with INTERVAL, COUNT, UNTIL,
+    BYDAY (with ordinals such as -1FR in monthly and yearly rules), BYMONTHDAY, BYMONTH
+    and WKST. Yearly rules take BYDAY and BYMONTHDAY only together with BYMONTH. Any
+    other rule yields only DTSTART, like an event without a rule.
+
+    Args:
+        dtstart (date or datetime): The start of the first occurrence.
+        start (date): The first day of the window.
+        end (date): The last day of the window.
+        rrule (str, optional): The RRULE value, e.g. "FREQ=WEEKLY;BYDAY=MO,WE".
+        rdates (iterable, optional): Additional occurrence starts from RDATE.
+        exdates (iterable, optional): Occurrence starts removed by EXDATE.
+
+    Yields:
+        date or datetime: The start of each occurrence inside the window.
+"""
+def iter_occurrences(dtstart, start, end, rrule=None, rdates=(), exdates=()):
+    excluded = {_get_occurrence_id(value) for value in exdates}
+    single = sorted((value for value in [dtstart, *rdates] if start <= _to_date(value) <= end), key=_get_occurrence_order)
+    expanded = _expand_rule(dtstart, _parse_rrule(rrule), start, end) if rrule else ()
+
+    previous = None
+    for value in heapq.merge(expanded, single, key=_get_occurrence_order):
+        occurrence_id = _get_occurrence_id(value)
+        if occurrence_id != previous and occurrence_id not in excluded:
+            yield value
+        previous = occurrence_id
+
+"""
+    [Internal] Returns the occurrences of a recurring event inside the window as copies of 'assignment'.
+
+    Each copy gets the UID of its occurrence, see '_get_occurrence_uid()'.
+"""
+def _expand_event(assignment, rrule, rdates, exdates, start, end):
+    for value in iter_occurrences(assignment.date, start, end, rrule, rdates, exdates):
+        yield assignment.replace(uid=_get_occurrence_uid(assignment.uid, value), date=value)
+
+"""
+    [Internal] Returns the UID of one occurrence of a recurring event: the event UID and the
+    original start of the occurrence, which stays the same when the rule is edited or the
+    occurrence is moved with a RECURRENCE-ID event.
+"""
+def _get_occurrence_uid(uid, value):
+    return f"{uid or ''}{OCCURRENCE_SEPARATOR}{_get_occurrence_id(value)}"
+
+"""
+    [Internal] Formats an occurrence start like an iCalendar value, with times in UTC,
+    so the same moment given in different time zones gets the same ID.
+"""
+def _get_occurrence_id(value):
+    if not isinstance(value, datetime.datetime):
+        return value.strftime("%Y%m%d")
+    if value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%dT%H%M%S")
+
+def _get_occurrence_order(value):
+    return _to_date(value), _get_occurrence_id(value)
+
+def _parse_rrule(value):
+    rule = {}
+    for part in value.split(";"):
+        name, _, part_value = part.partition("=")
+        rule[name.strip().upper()] = part_value.strip().upper()
+    return rule
+
+"""
+    [Internal] Yields the occurrences of an RRULE inside the window, see 'iter_occurrences()'.
+"""
+def _expand_rule(dtstart, rule, start, end):
+    frequency = rule.get("FREQ")
+    if frequency not in ("DAILY", "WEEKLY", "MONTHLY", "YEARLY") or not set(rule) <= SUPPORTED_RULE_PARTS:
+        return
+    # Without BYMONTH these pick days of the whole year, e.g. the 20th Monday
+    if frequency == "YEARLY" and not rule.get("BYMONTH") and (rule.get("BYDAY") or rule.get("BYMONTHDAY")):
+        return
+    interval = max(1, int(rule.get("INTERVAL") or 1))
+    count = int(rule["COUNT"]) if rule.get("COUNT") else None
+    until = _parse_ical_date(rule["UNTIL"], {}) if rule.get("UNTIL") else None
+    # The rule is expanded in the time zone of DTSTART, so its own date is the first day
+    first_day = dtstart.date() if isinstance(dtstart, datetime.datetime) else dtstart
+    parts = {
+        "frequency": frequency,
+        "first_day": first_day,
+        "wkst": WEEKDAYS.index(rule["WKST"]) if rule.get("WKST") in WEEKDAYS else 0,
+        "byday": [_parse_weekday(value) for value in rule["BYDAY"].split(",")] if rule.get("BYDAY") else [],
+        "bymonthday": [int(value) for value in rule["BYMONTHDAY"].split(",")] if rule.get("BYMONTHDAY") else [],
+        "bymonth": sorted({int(value) for value in rule["BYMONTH"].split(",")}) if rule.get("BYMONTH") else [],
+    }
+
+    # Occurrences are converted to local dates for the window check, so start a little
+    # early in case the time zone moves them to the previous day
+    offset = _get_period_offset(parts, start - datetime.timedelta(days=2)) // interval * interval
+    emitted = 0
+    if offset > 0 and count is not None:
+        per_period = _get_occurrences_per_period(parts)
+        if per_period is None:
+            offset = 0
+        else:
+            # The first period may start before DTSTART, the rest are full
+            in_first_period = sum(1 for day in _get_period_days(parts, 0)[1] if day >= first_day)
+            emitted = in_first_period + (offset // interval - 1) * per_period
+            if emitted >= count:
+                return
+
+    while True:
+        period_start, days = _get_period_days(parts, offset)
+        if period_start > end + datetime.timedelta(days=1):
+            return
+        for day in days:
+            if day < first_day:
+                continue
+            value = datetime.datetime.combine(day, dtstart.timetz()) if isinstance(dtstart, datetime.datetime) else day
+            emitted += 1
+            if (count is not None and emitted > count) or (until is not None and _is_after(value, until)):
+                return
+            if start <= _to_date(value) <= end:
+                yield value
+        offset += interval
+
+def _parse_weekday(value):
+    # e.g. "MO", "2TU" (second Tuesday) or "-1FR" (last Friday)
+    return int(value[:-2] or 0), WEEKDAYS.index(value[-2:])
+
+"""
+    [Internal] Returns the number of periods (days, weeks, months or years) between the
+    first period of a rule and the one holding 'day'.
+"""
+def _get_period_offset(parts, day):
+    first_day = parts["first_day"]
+    if parts["frequency"] == "DAILY":
+        return (day - first_day).days
+    if parts["frequency"] == "WEEKLY":
+        return (day - _get_week_start(first_day, parts["wkst"])).days // 7
+    if parts["frequency"] == "MONTHLY":
+        return (day.year - first_day.year) * 12 + day.month - first_day.month
+    return day.year - first_day.year
+
+"""
+    [Internal] Returns the number of occurrences every full period of a rule has, or None
+    if it differs between periods.
+"""
+def _get_occurrences_per_period(parts):
+    if parts["bymonth"] or parts["bymonthday"]:
+        return None
+    if parts["frequency"] == "DAILY" and not parts["byday"]:
+        return 1
+    if parts["frequency"] == "WEEKLY":
+        return len({weekday for _, weekday in parts["byday"]}) or 1
+    return None
+
+"""
+    [Internal] Returns the first day of a period of a rule and its candidate days, in order.
+"""
+def _get_period_days(parts, offset):
+    first_day = parts["first_day"]
+    frequency = parts["frequency"]
+    if frequency == "DAILY":
+        period_start = first_day + datetime.timedelta(days=offset)
+        days = [period_start]
+    elif frequency == "WEEKLY":
+        period_start = _get_week_start(first_day, parts["wkst"]) + datetime.timedelta(weeks=offset)
+        weekdays = {weekday for _, weekday in parts["byday"]} or {first_day.weekday()}
+        days = sorted(period_start + datetime.timedelta(days=(weekday - parts["wkst"]) % 7) for weekday in weekdays)
+    elif frequency == "MONTHLY":
+        year, month = divmod(first_day.month - 1 + offset, 12)
+        period_start = datetime.date(first_day.year + year, month + 1, 1)
+        days = _get_month_days(period_start.year, period_start.month, parts)
+    else:
+        period_start = datetime.date(first_day.year + offset, 1, 1)
+        days = [day for month in parts["bymonth"] or [first_day.month] for day in _get_month_days(period_start.year, month, parts)]
+
+    # BYxxx parts that don't pick the days of the period limit them instead
+    if parts["bymonth"] and frequency != "YEARLY":
+        days = [day for day in days if day.month in parts["bymonth"]]
+    if frequency in ("DAILY", "WEEKLY"):
+        if parts["bymonthday"]:
+            days = [day for day in days if _matches_monthday(day, parts["bymonthday"])]
+        if parts["byday"] and frequency == "DAILY":
+            days = [day for day in days if day.weekday() in {weekday for _, weekday in parts["byday"]}]
+    return period_start, days
+
+def _get_week_start(day, wkst):
+    return day - datetime.timedelta(days=(day.weekday() - wkst) % 7)
+
+def _matches_monthday(day, monthdays):
+    length = calendar.monthrange(day.year, day.month)[1]
+    return day.day in monthdays or day.day - length - 1 in monthdays
+
+"""
+    [Internal] Returns the days of a month picked by BYMONTHDAY and BYDAY, or the day of
+    the month of DTSTART if the rule has neither. Months without that day are skipped.
+"""
+def _get_month_days(year, month, parts):
+    length = calendar.monthrange(year, month)[1]
+    days = None
+    if parts["bymonthday"]:
+        days = {day if day > 0 else length + day + 1 for day in parts["bymonthday"]}
+    elif not parts["byday"]:
+        days = {parts["first_day"].day}
+    if parts["byday"]:
+        first_weekday = datetime.date(year, month, 1).weekday()
+        matching = set()
+        for ordinal, weekday in parts["byday"]:
+            weekday_days = range((weekday - first_weekday) % 7 + 1, length + 1, 7)
+            if not ordinal:
+                matching.update(weekday_days)
+            elif -len(weekday_days) <= ordinal <= len(weekday_days):
+                matching.add(weekday_days[ordinal - 1 if ordinal > 0 else ordinal])
+        days = matching if days is None else days & matching
+    return [datetime.date(year, month, day) for day in sorted(days) if 1 <= day <= length]
+
+def _is_after(value, until):
+    if isinstance(value, datetime.datetime) and isinstance(until, datetime.datetime) and (value.tzinfo is None) == (until.tzinfo is None):
+        return value > until
+    return _to_date(value) > _to_date(until)
+
+"""
+    [Internal] Returns the RRULE of an icalendar component as text, or None.
+"""
+def _get_rrule(component):
+    rule = component.get('rrule')
+    if isinstance(rule, list):
+        rule = rule[0]
+    return rule.to_ical().decode() if rule is not None else None
+
+"""
+    [Internal] Returns the dates of all RDATE or EXDATE properties of an icalendar component.
+"""
+def _get_dates(component, name):
+    properties = component.get(name) or []
+    if not isinstance(properties, list):
+        properties = [properties]
+    # PERIOD values are (start, end) tuples
+    return [value.dt[0] if isinstance(value.dt, tuple) else value.dt for prop in properties for value in prop.dts]
+
+"""
+    [Internal] Returns the course code at the end of an event summary, or None.
+"""
+def _get_course(summary):
+    match = COURSE_PATTERN.search(summary or "")
+    return match.group(1) if match else None
+
+"""
+    [Internal] Returns the first and last day of the assignment window.
+"""
+def _get_window(day_range, today=None):
+    start = today or datetime.date.today()
+    return start, start + datetime.timedelta(days=day_range)
+
+"""
+    [Internal] Returns the calendar date of a DATE or DATE-TIME value, in local time.
+"""
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone()
+        return value.date()
+    return value
+
+"""
+    [Internal] Yields the lines of a string one at a time, with their line endings.
+
+    Unlike io.StringIO or splitlines(), this never holds a second copy of the whole
+    text, which for a large feed would be several times its size.
+"""
+def _iter_lines(text):
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        end = length if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+"""
+    [Internal] Joins folded iCalendar lines (RFC 5545 section 3.1) and strips line endings.
+"""
+def _unfold_lines(lines):
+    current = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+"""
+    [Internal] Splits a content line into its name, parameters and value.
+"""
+def _split_property(line):
+    # The value starts at the first colon that is not inside a quoted parameter value
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            break
+    else:
+        return line.upper(), {}, ""
+
+    name, *param_parts = line[:index].split(";")
+    params = {}
+    for part in param_parts:
+        key, _, param_value = part.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, line[index + 1:]
+
+"""
+    [Internal] Parses a DATE or DATE-TIME property value.
+"""
+def _parse_ical_date(value, params):
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.datetime.strptime(value, "%Y%m%d").date()
+    if value.endswith("Z"):
+        return datetime.datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+    parsed = datetime.datetime.strptime(value, "%Y%m%dT%H%M%S")
+    if "TZID" in params:
+        try:
+            parsed = parsed.replace(tzinfo=ZoneInfo(params["TZID"]))
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return parsed
+
+"""
+    [Internal] Unescapes an iCalendar TEXT value.
+"""
+def _unescape_text(value):
+    if "\\" not in value:
+        return value
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            result.append("\n" if char in ("n", "N") else char)
+        else:
+            result.append(char)
+    return "".join(result)
+
 """
     Fetches and parses iCalendar content from the provided URL.
 
+    The feed is cached on disk together with its ETag and Last-Modified validators.
+    If the server reports that the feed is unchanged, or sends the same content again,
+    the assignments parsed on a previous run today are returned without parsing again.
+
     Args:
         URL (str): The URL pointing to the iCalendar file (taken from the Canvas calendar page).
         day_range (int): The number of days into the future to get assignments
+        use_cache (bool): Whether to use and update the on-disk feed cache.
+        cache_dir (str): The directory holding the feed cache.
+        streaming (bool): Whether to parse with 'iter_ical_assignments()' instead of building a
+            calendar tree. The streaming parser is faster for large feeds.
 
     Returns:
-        assignments (list): List of assignments.
+        assignments (list): The assignments inside the window, as Assignment records.
 
     Raises:
         Exception: If there's an error fetching or parsing the iCalendar content.
 """
-def get_ical_content(URL, day_range=14):
+def get_ical_content(URL, day_range=14, use_cache=True, cache_dir=FEED_CACHE_DIR, streaming=False):
+    started = time.perf_counter()
+    entry = (load_feed_cache(URL, cache_dir) if use_cache else None) or new_feed_cache_entry(URL)
+    # A cached parse is only valid for the window it was filtered with
+    parse_key = (day_range, datetime.date.today(), PARSE_FORMAT)
+
     try:
-        ical_content = _fetch_ical_from_web(URL)
+        ical_content, response = _fetch_ical_from_web(URL, entry["etag"], entry["last_modified"])
     except Exception as e:
         print(f"Error fetching iCal content: {e}")
         raise
 
-    # Parse the fetched iCalendar content
-    cal = icalendar.Calendar.from_ical(ical_content)
-    assignments = []
-    
-    # Iterate through each component in the iCalendar data
-    for component in cal.walk():
-        if component.name == "VEVENT":
-            # Check if the component is an assignment (missing start or end date)
-            is_assignment = 'dtstart' not in component or 'dtend' not in component
-            event = {
-                "name": component.get('summary'),
-                "date": component.get('dtstart').dt,
-                "description": component.get('description'),
-                "is_assignment": is_assignment,
-            }
-            # filter out dates that are in the past or too many days into the future
-            now = datetime.datetime.date(datetime.datetime.now())
-            assignment_cutoff_date = now + datetime.timedelta(days=day_range)
-            if event["is_assignment"] and now <= event["date"] <= assignment_cutoff_date:
-                assignments.append(event)
-    
-    return assignments
\ No newline at end of file
+    if ical_content is None:
+        # 304 Not Modified, so the cached body is still current
+        ical_content = entry["body"]
+        unchanged = True
+    else:
+        body_hash = hash_feed_body(ical_content)
+        unchanged = body_hash == entry["body_hash"]
+        entry["body"] = ical_content
+        entry["body_hash"] = body_hash
+    entry["etag"] = response.headers.get("ETag", entry["etag"])
+    entry["last_modified"] = response.headers.get("Last-Modified", entry["last_modified"])
+
+    # Caches written before the UIDs were stored have no third element
+    cache_hit = unchanged and entry["parsed"] and len(entry["parsed"]) == 3 and entry["parsed"][0] == parse_key
+    FEED_STATE[URL] = {
+        "body_hash": entry["body_hash"],
+        "parse_key": parse_key,
+        "synced": bool(cache_hit) and entry.get("synced") == (entry["body_hash"], parse_key),
+        "status": response.status_code,
+        "bytes": len(response.content),
+    }
+
+    if cache_hit:
+        increment("feed_cache_hits_total")
+        assignments, uids = entry["parsed"][1], entry["parsed"][2]
+    else:
+        uids = set()
+        with span("ical.parse"):
+            if streaming:
+                parsed = iter_ical_assignments(_iter_lines(ical_content), day_range, seen_uids=uids)
+            else:
+                parsed = _parse_ical_content(ical_content, day_range, uids)
+            # The only list of the pipeline, kept in the feed cache
+            assignments = list(parsed)
+        entry["parsed"] = (parse_key, assignments, uids)
+    FEED_STATE[URL]["uids"] = uids
+
+    if use_cache:
+        save_feed_cache(entry, cache_dir)
+    FEED_STATE[URL]["assignments"] = len(assignments)
+    FEED_STATE[URL]["seconds"] = time.perf_counter() - started
+    return assignments
+
+"""
+    Fetches and parses several iCalendar feeds concurrently and merges their assignments.
+
+    Each feed goes through 'get_ical_content()', with its own cache entry, in a thread of
+    its own (at most POOL_SIZE at a time) over the shared session, so the run takes about
+    as long as the slowest feed rather than the sum of all of them. Events that appear
+    in more than one feed are kept once, from the first feed listing their UID.
+
+    Args:
+        URLs (list): The URLs of the iCalendar files.
+        day_range (int): The number of days into the future to get assignments
+        use_cache (bool): Whether to use and update the on-disk feed cache.
+        cache_dir (str): The directory holding the feed cache.
+        streaming (bool): Whether to parse with 'iter_ical_assignments()'.
+
+    Returns:
+        assignments (list): The assignments of all feeds, in the order of the feeds.
+
+    Raises:
+        Exception: If fetching or parsing any of the feeds fails. A feed is never left out,
+            since its assignments would then look removed from Canvas.
+"""
+def get_ical_contents(URLs, day_range=14, use_cache=True, cache_dir=FEED_CACHE_DIR, streaming=False):
+    fetch = lambda URL: get_ical_content(URL, day_range, use_cache, cache_dir, streaming)
+    if len(URLs) == 1:
+        feeds = [fetch(URLs[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(POOL_SIZE, len(URLs)), thread_name_prefix="feed") as pool:
+            feeds = list(pool.map(fetch, URLs))
+
+    merged = []
+    seen = set()
+    for assignments in feeds:
+        for assignment in assignments:
+            uid = assignment.uid
+            if uid is not None:
+                if uid in seen:
+                    increment("ical_duplicate_events_total")
+                    continue
+                seen.add(uid)
+            merged.append(assignment)
+    return merged
+
+"""
+    Splits a setting holding one or more feed URLs, separated by whitespace or commas.
+
+    Args:
+        value (str or list): The setting, or a list of URLs, which is returned as is.
+
+    Returns:
+        list: The feed URLs.
+"""
+def split_feed_urls(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [url for url in FEED_URL_SEPARATOR.split(value or "") if url]
+
+"""
+    Returns the download statistics of the last 'get_ical_content()' call for this URL, or
+    None if the feed has not been fetched in this process.
+
+    Args:
+        URL (str): The URL pointing to the iCalendar file.
+
+    Returns:
+        dict: The HTTP status ('status'), the size of the downloaded body in bytes, 0 when the
+            server answered 304 ('bytes'), the number of assignments in the window ('assignments')
+            and the time taken to fetch and parse the feed in seconds ('seconds').
+"""
+def get_feed_stats(URL):
+    state = FEED_STATE.get(URL)
+    if state is None or "seconds" not in state:
+        return None
+    return {key: state[key] for key in ("status", "bytes", "assignments", "seconds")}
+
+"""
+    Returns True if the content returned by the last 'get_ical_content()' call for this URL
+    was unchanged and had already been synced successfully with 'mark_feed_synced()'.
+
+    Args:
+        URL (str): The URL pointing to the iCalendar file.
+"""
+def is_feed_synced(URL):
+    return FEED_STATE.get(URL, {}).get("synced", False)
+
+"""
+    Returns the UIDs of all events in the content returned by the last 'get_ical_content()'
+    call for this URL, including events outside the window, or None if the feed has not
+    been fetched in this process.
+
+    An assignment that synced before and whose UID is missing here was removed from Canvas,
+    while one that is only missing from the assignments moved out of the window.
+
+    Args:
+        URL (str): The URL pointing to the iCalendar file.
+"""
+def get_feed_uids(URL):
+    return FEED_STATE.get(URL, {}).get("uids")
+
+"""
+    Records that the content returned by the last 'get_ical_content()' call for this URL
+    has been synced, so the next run can exit early if the feed is still the same.
+
+    Args:
+        URL (str): The URL pointing to the iCalendar file.
+        cache_dir (str): The directory holding the feed cache.
+"""
+def mark_feed_synced(URL, cache_dir=FEED_CACHE_DIR):
+    state = FEED_STATE.get(URL)
+    entry = load_feed_cache(URL, cache_dir)
+    if state is None or entry is None or entry["body_hash"] != state["body_hash"]:
+        return
+    entry["synced"] = (state["body_hash"], state["parse_key"])
+    save_feed_cache(entry, cache_dir)
+
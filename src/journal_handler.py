@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import time
+from fingerprint_handler import record_fingerprint, record_moved_task, format_due
+
+JOURNAL_FILE = "sync_journal.jsonl"
+
+"""
+Write-ahead journal of the mutations of one sync.
+
+Before any mutation is sent, the whole plan is written to the journal and synced to
+disk. Every mutation that succeeds is then appended with the task it produced, as soon
+as its response arrives. The journal is removed once the fingerprint index holding the
+results has been saved, so a journal left behind means the previous run stopped
+between sending changes and recording them, and 'recover_journal()' can finish it.
+
+Results are flushed to the operating system one by one, which survives the process
+dying from an error, Ctrl-C or a kill. Only the plan is synced to the disk itself.
+
+The file holds one JSON object per line: a 'plan' record with the planned mutations,
+followed by a 'done' record per finished mutation.
+"""
+class SyncJournal:
+    def __init__(self, filename=JOURNAL_FILE):
+        self.filename = filename
+        self._file = None
+        self._lock = threading.Lock()
+
+    """
+    Starts the journal of a new sync with its plan, replacing any previous journal.
+
+    Args:
+    - plan (list): The mutations returned by 'plan_mutations()'.
+    - request_ids (list): The request ID each mutation is queued under, in the same order.
+    """
+    def begin(self, plan, request_ids):
+        mutations = [_serialize_mutation(mutation, request_id) for mutation, request_id in zip(plan, request_ids)]
+        self._file = open(self.filename, "w")
+        self._write({"type": "plan", "started": time.time(), "mutations": mutations})
+        os.fsync(self._file.fileno())
+
+    """
+    Records that a mutation succeeded. Safe to call from the executor threads.
+
+    Args:
+    - request_id (str): The request ID of the mutation.
+    - response (dict): The API response, the task for inserts and patches.
+    """
+    def record_result(self, request_id, response):
+        task = response if isinstance(response, dict) else {}
+        with self._lock:
+            # Batches still in flight can answer after the journal was closed
+            if self._file is not None and not self._file.closed:
+                self._write({"type": "done", "request_id": request_id, "task_id": task.get("id")})
+
+    """
+    Removes the journal once its results have been recorded in the fingerprint index.
+    """
+    def commit(self):
+        self.close()
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+"""
+Applies the journal of an interrupted sync to the fingerprint index.
+
+- Mutations recorded as done are recorded in the index as the sync would have done,
+    so they are neither sent again nor create duplicates.
+- Inserts that were planned but never recorded may still have reached Google Tasks
+    before the run stopped. Each is matched to a task of its task list with the same
+    title and due date that no index entry points to, if there is one.
+- Moves that were planned but never recorded are recorded if their task is found in
+    the destination list. A recorded move keeps the title and due date of the index
+    entry, its patch records the new ones.
+- The unfinished delete of an assignment that was moving to another list, whose new
+    task was created or found, is recorded with 'record_moved_task()', so the old task
+    is deleted by a later diff instead of being left behind as a duplicate.
+- Other unfinished mutations are left out, the next diff plans them again.
+
+Args:
+- filename (str): The journal file.
+- fingerprint_index (dict): The index returned by 'load_fingerprint_index()'.
+- tasks_by_list (dict): The mirrored tasks of each task list, by task list ID.
+
+Returns:
+- dict: The number of finished mutations recorded ('finished'), of unfinished inserts
+    and moves matched to an existing task ('matched') and of old tasks of moves left to delete
+    ('moved'), or None if there is no journal to recover.
+"""
+def recover_journal(filename, fingerprint_index, tasks_by_list):
+    records = _read_journal(filename)
+    if not records or records[0].get("type") != "plan":
+        return None
+    mutations = {mutation["request_id"]: mutation for mutation in records[0]["mutations"]}
+    done = {record["request_id"]: record.get("task_id") for record in records[1:] if record.get("type") == "done"}
+
+    indexed_ids = {entry.get("task_id") for entry in fingerprint_index.values()}
+    finished = matched = 0
+    for request_id, mutation in mutations.items():
+        key = mutation["key"]
+        if request_id in done:
+            finished += 1
+            if mutation["operation"] == "delete":
+                if fingerprint_index.get(key, {}).get("task_id") == mutation["task_id"]:
+                    del fingerprint_index[key]
+                continue
+            task_id = done[request_id] or mutation["task_id"]
+        elif mutation["operation"] == "insert":
+            task_id = _find_unindexed_task(tasks_by_list.get(mutation["tasklist"], []), mutation, indexed_ids)
+            if task_id is None:
+                continue
+            matched += 1
+        elif mutation["operation"] == "move":
+            destination_tasks = tasks_by_list.get(mutation["destination_tasklist"], [])
+            if not any(task["id"] == mutation["task_id"] for task in destination_tasks):
+                continue
+            task_id = mutation["task_id"]
+            matched += 1
+        else:
+            continue
+        if mutation["operation"] == "move":
+            entry = fingerprint_index.get(key, {})
+            record_fingerprint(fingerprint_index, key, task_id, entry.get("due"), entry.get("title"), mutation["destination_tasklist"])
+        else:
+            record_fingerprint(fingerprint_index, key, task_id, mutation["due"], mutation["title"], mutation["tasklist"])
+        indexed_ids.add(task_id)
+
+    moved = 0
+    for request_id, mutation in mutations.items():
+        if mutation["operation"] == "delete" and request_id not in done:
+            entry = fingerprint_index.get(mutation["key"])
+            if entry is not None and entry["task_id"] != mutation["task_id"]:
+                # The new task of the move exists, the old one still has to go
+                record_moved_task(fingerprint_index, mutation["key"], mutation["task_id"], mutation["tasklist"])
+                moved += 1
+    return {"finished": finished, "matched": matched, "moved": moved}
+
+"""
+Removes the journal of an interrupted sync after it has been recovered.
+"""
+def remove_journal(filename):
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+def _serialize_mutation(mutation, request_id):
+    assignment = mutation["assignment"]
+    return {
+        "request_id": request_id,
+        "operation": mutation["operation"],
+        "key": mutation["key"],
+        "tasklist": mutation["tasklist"],
+        "task_id": mutation["task_id"],
+        "destination_tasklist": mutation["fields"].get("destination_tasklist"),
+        # The title and due date the task has once the mutation is done
+        "title": assignment.name if assignment else None,
+        "due": format_due(assignment.date) if assignment else None,
+    }
+
+def _read_journal(filename):
+    records = []
+    try:
+        with open(filename, "r") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line may have been cut off when the run stopped
+                    break
+    except FileNotFoundError:
+        return None
+    return records
+
+def _find_unindexed_task(tasks, mutation, indexed_ids):
+    for task in tasks:
+        if task["id"] not in indexed_ids and task["title"] == mutation["title"] and format_due(task["due"]) == mutation["due"]:
+            return task["id"]
+    return None
@@ -1,75 +1,378 @@
-import datetime
+import argparse
+import asyncio
 from cache_handler import *
 from config_handler import *
-from icalendar_handler import get_ical_content
+from diff_handler import diff_tasks
+from plan_handler import plan_mutations, print_plan, get_plan_cost, queue_plan, get_request_id, order_by_urgency, split_plan
+from routing_handler import load_routing_rules, route_assignment, ROUTING_FILE
+from fingerprint_handler import *
+from journal_handler import SyncJournal, recover_journal, remove_journal, JOURNAL_FILE
+from icalendar_handler import get_ical_contents, get_feed_uids, get_feed_stats, is_feed_synced, mark_feed_synced, split_feed_urls, FEED_CACHE_DIR
+from metrics_handler import span, reset_metrics, write_run_report, get_counter, RUN_REPORT_FILE, PROMETHEUS_FILE
+from task_mirror_handler import *
 from tasks_api_handler import *
 import os
 from dotenv import load_dotenv
 
-def find_new_and_updated_assignments(assignments, current_tasks):
-    new_assignments = []
-    updated_assignments = []
-
-    # Create a dictionary of current tasks for quick lookup
-    task_dict = {task['title']: task for task in current_tasks}
-    # debug print assignments
-    # print("current canvas assignments:")
-    # for assignment in assignments:
-    #     print(assignment["name"])
-    # print("\ncurrent google tasks:")
-    # for task in task_dict:
-    #     print(task_dict[task]['title'])
-        
-
-    for assignment in assignments:
-        assignment_name = assignment['name']
-        assignment_due_date = assignment['date']
-
-        if assignment_name not in task_dict:
-            # Assignment not found in current tasks, it's a new assignment
-            new_assignments.append(assignment)
-        else:
-            # Assignment found, check if the due date has changed
-            task_due_date = task_dict[assignment_name].get('due')
-            if task_due_date:
-                task_due_date = datetime.datetime.strptime(task_due_date, '%Y-%m-%dT%H:%M:%S.%fZ').date()
-                if task_due_date != assignment_due_date:
-                    updated_assignments.append((task_dict[assignment_name]['id'], assignment_due_date))
+# Stands in for the ID of a routed task list that a dry run did not create
+NEW_TASK_LIST_PREFIX = "new list: "
 
-    return new_assignments, updated_assignments
+"""
+Syncs the assignments of one or more Canvas calendar feeds to a Google Tasks list.
 
-if __name__ == "__main__":
-    load_dotenv()
+Steps:
+- Fetches the feeds concurrently and merges their assignments. If every feed is unchanged
+    since the last successful sync, stops here without authenticating or loading the
+    Google API client.
+- Authenticates with Google Tasks and selects the task list.
+- Pulls the changed tasks into the local task mirror.
+- Routes each assignment to its task list with the rules in 'routing.json' in the state
+    directory, if there is one, creating the lists that do not exist yet. Without rules
+    every assignment goes to 'task_list_name'.
+- Plans the fewest API calls for the changes: an insert for each new assignment, a single
+    patch with only the changed fields for each changed one, a move for each task routed
+    to another list, and a delete for each assignment removed from Canvas. Changes the
+    task already has are dropped.
+- With a quota budget, reserves the planned calls from the budget shared with the
+    other tenants. Changes to assignments due within 48 hours go first, the ones
+    that don't fit are deferred to a later run.
+- Writes the plan to a journal in the state directory, then sends the planned calls in
+    batches and journals each one that succeeds. Moves are sent first, so the patches of
+    moved tasks are sent to their new list.
+- Records the synced tasks in the fingerprint index and removes the journal. If a
+    previous run stopped before this step, its journal is applied to the index first,
+    so the changes it already made are not sent again.
+- Once every change made it to Google Tasks, marks the feeds synced and saves the
+    assignments to the assignment index in the state directory.
+- Writes the timing and API-call metrics of the run to 'run_report.json' and
+    'metrics.prom' in the state directory, also when the run fails.
+
+Args:
+- feed_url (str or list): The Canvas iCal feed URL, or several of them as a list or a
+    string separated by whitespace or commas.
+- task_list_name (str): The name of the Google Tasks list to sync to, unless a routing rule
+    picks another one.
+- state_dir (str): The directory holding the feed cache, fingerprint index, task mirror,
+    task list cache and routing rules.
+- token_file (str): The file the user's OAuth token is stored in.
+- interactive (bool): Whether the user may be asked to sign in in the browser.
+- day_range (int): The number of days into the future to get assignments.
+- force (bool): Whether to sync even if the feed is unchanged since the last sync.
+- reuse_session (bool): Whether to keep the credentials, service and selected task list
+    of a previous run in this process, as the daemon does.
+- dry_run (bool): Whether to only print the planned changes and their API cost instead
+    of sending them. Nothing is written to Google Tasks or the fingerprint index.
+- quota (QuotaBudget, optional): The tenant's share of the project-wide API budget. The
+    calls the run made are charged to it when it ends.
+
+Returns:
+- dict: The number of assignments in the window ('assignments'), tasks created ('created'),
+    tasks updated ('updated'), tasks moved to another list ('moved'), tasks deleted
+    ('deleted'), changes that failed ('failed') and changes deferred for lack of quota
+    ('deferred'), and the earliest due date in the window ('next_due', None if there is none).
+    A dry run returns the number of planned API calls ('planned') and batch requests
+    ('http_requests') instead of the created, updated, moved and deleted counts.
+"""
+def sync(feed_url, task_list_name="School", state_dir=".", token_file="token.pickle", interactive=True, day_range=14, force=False, reuse_session=False, dry_run=False, quota=None):
+    os.makedirs(state_dir, exist_ok=True)
+    reset_metrics()
+    feed_urls = split_feed_urls(feed_url)
+    results = None
+    try:
+        assignments = _fetch_assignments(feed_urls, state_dir, day_range)
+        if not (force or dry_run) and all(map(is_feed_synced, feed_urls)):
+            print("Calendar unchanged since the last sync, nothing to do.")
+            results = {"assignments": len(assignments), "created": 0, "updated": 0, "moved": 0, "deleted": 0, "failed": 0,
+                       "deferred": 0, "next_due": _get_next_due(assignments)}
+            return results
+
+        set_task_list_cache(os.path.join(state_dir, TASKLIST_CACHE_FILE))
+        if not (reuse_session and is_task_list_ready(token_file, task_list_name)):
+            # Authenticate with Google Tasks
+            with span("sync.authenticate"):
+                initialize_task_list(token_file, interactive)
+            with span("sync.select_task_list"):
+                set_task_list(task_list_name)
+
+        mirror = _refresh_mirror(state_dir)
+        results = _apply_changes(assignments, mirror, state_dir, _get_feed_uids(feed_urls), dry_run, task_list_name, quota)
+        if not dry_run:
+            _mark_synced(feed_urls, state_dir, results, assignments)
+        return results
+    finally:
+        if quota is not None:
+            quota.settle(get_counter("tasks_api_quota_calls_total"))
+        _write_metrics(state_dir, results, feed_urls)
+
+"""
+Syncs the assignments of a Canvas calendar feed to a Google Tasks list, overlapping I/O.
 
-    # Authenticate with Google Tasks
-    initialize_task_list()
-    set_task_list("School")
+Does the same as 'sync()', but downloads the feed while the task list is being
+selected and pulled into the task mirror, since neither depends on the other.
+Because of that it always authenticates, even when the feed is unchanged.
+The changes are then sent as concurrent batches through the request executor,
+whose thread pool bounds the number of requests in flight.
 
-    # Get iCal file from URL in env
+Takes the same arguments and returns the same counts as 'sync()'.
+"""
+async def async_sync(feed_url, task_list_name="School", state_dir=".", token_file="token.pickle", interactive=True, day_range=14):
+    os.makedirs(state_dir, exist_ok=True)
+    reset_metrics()
+    feed_urls = split_feed_urls(feed_url)
+    results = None
+    try:
+        # Authenticate with Google Tasks
+        set_task_list_cache(os.path.join(state_dir, TASKLIST_CACHE_FILE))
+        with span("sync.authenticate"):
+            await asyncio.to_thread(initialize_task_list, token_file, interactive)
+
+        async def list_tasks():
+            with span("sync.select_task_list"):
+                await asyncio.to_thread(set_task_list, task_list_name)
+            return await asyncio.to_thread(_refresh_mirror, state_dir)
+
+        assignments, mirror = await asyncio.gather(
+            asyncio.to_thread(_fetch_assignments, feed_urls, state_dir, day_range),
+            list_tasks(),
+        )
+        results = await asyncio.to_thread(_apply_changes, assignments, mirror, state_dir, _get_feed_uids(feed_urls), False, task_list_name)
+        _mark_synced(feed_urls, state_dir, results, assignments)
+        return results
+    finally:
+        _write_metrics(state_dir, results, feed_urls)
+
+def _fetch_assignments(feed_urls, state_dir, day_range):
+    if not feed_urls:
+        # With no feed every synced assignment would look removed from Canvas
+        raise ValueError("No calendar feed URL given.")
+    # Get iCal file from the feed URL
     print("Retrieving calendar from Canvas...")
-    assignments = get_ical_content(os.getenv("CANVAS_ICAL_URL"), 14)
+    with span("sync.fetch_feed"):
+        assignments = get_ical_contents(feed_urls, day_range, cache_dir=os.path.join(state_dir, FEED_CACHE_DIR), streaming=True)
     print("Retrieved successfully")
-    # assignments[0]["date"] = assignments[5]["date"]   
-    
-    # current_tasks = get_current_tasks()
-    current_tasks = get_all_tasks()
+    if len(feed_urls) > 1:
+        for index, stats in enumerate(_get_feed_stats(feed_urls), 1):
+            print(f"  Feed {index}: {stats['assignments']} assignments, {stats['bytes'] / 1024:.1f} KB in {stats['seconds']:.2f}s")
+    # assignments[0].date = assignments[5].date
+    return assignments
 
-    # Find new and updated assignments
-    new_assignments, updated_assignments = find_new_and_updated_assignments(assignments, current_tasks)
+def _get_feed_uids(feed_urls):
+    # Deletions are only detected when the UIDs of every feed are known
+    uids = [get_feed_uids(url) for url in feed_urls]
+    return None if None in uids else set().union(*uids)
 
-    # Print new and updated assignments
-    print("New Assignments:")
-    for assignment in new_assignments:
-        print(assignment['name'])
-        # Create new task in Google Tasks
-        # create_task(assignment['name'], assignment.get('description', ''), assignment['date'])
-        create_task(assignment['name'], "", assignment['date'])
+def _get_feed_stats(feed_urls):
+    return [stats for stats in map(get_feed_stats, feed_urls) if stats is not None]
+
+def _mark_synced(feed_urls, state_dir, results, assignments):
+    # Only skip the next run, and compare the next feed with this one, if every change made it to Google Tasks
+    if results["failed"] == 0 and results.get("deferred", 0) == 0:
+        for feed_url in feed_urls:
+            mark_feed_synced(feed_url, os.path.join(state_dir, FEED_CACHE_DIR))
+        save_assignment_index(assignments, os.path.join(state_dir, ASSIGNMENT_CACHE_FILE))
+
+def _get_next_due(assignments):
+    # Compare DATE and DATE-TIME values by their calendar day
+    return min((assignment.date for assignment in assignments), key=format_due, default=None)
+
+def _refresh_mirror(state_dir):
+    # Pull the tasks that changed since the last run into the local mirror
+    with span("sync.refresh_mirror"):
+        mirror = open_task_mirror(os.path.join(state_dir, MIRROR_FILE))
+        sync_task_mirror(mirror)
+    return mirror
+
+def _write_metrics(state_dir, results, feed_urls):
+    try:
+        write_run_report(
+            os.path.join(state_dir, RUN_REPORT_FILE),
+            os.path.join(state_dir, PROMETHEUS_FILE),
+            # The feed URLs hold the user's calendar token, so feeds are listed by position
+            extra={"results": results, "ok": results is not None, "feeds": _get_feed_stats(feed_urls)},
+        )
+    except OSError as e:
+        print(f"Failed to write the run report: {e}")
 
+def _apply_changes(assignments, mirror, state_dir, feed_uids=None, dry_run=False, task_list_name="School", quota=None):
+    fingerprint_file = os.path.join(state_dir, FINGERPRINT_FILE)
+    fingerprint_index = load_fingerprint_index(fingerprint_file)
+    default_tasklist = resolve_task_list(task_list_name)
+    if fingerprint_index is None:
+        # First run with the fingerprint index, match the existing tasks by title
+        fingerprint_index = seed_fingerprint_index(assignments, get_mirrored_tasks(mirror, default_tasklist))
+
+    # Route every assignment to its task list and bring the mirrors of those lists up to date
+    tasklist_for = _get_router(load_routing_rules(os.path.join(state_dir, ROUTING_FILE)), task_list_name, dry_run)
+    tasklists = {tasklist_for(assignment) for assignment in assignments}
+    tasklists.update(entry.get('tasklist') or default_tasklist for entry in fingerprint_index.values())
+    tasklists.add(default_tasklist)
+    tasks_by_list = {}
+    for tasklist in tasklists:
+        if tasklist.startswith(NEW_TASK_LIST_PREFIX):
+            continue
+        if tasklist != default_tasklist:
+            # The mirror of the default list was refreshed before
+            with span("sync.refresh_mirror"):
+                sync_task_mirror(mirror, tasklist)
+        tasks_by_list[tasklist] = get_mirrored_tasks(mirror, tasklist)
+    tasks = [task for tasklist_tasks in tasks_by_list.values() for task in tasklist_tasks]
+
+    # Finish recording the changes of a run that stopped while sending them
+    journal_file = os.path.join(state_dir, JOURNAL_FILE)
+    recovered = recover_journal(journal_file, fingerprint_index, tasks_by_list)
+    if recovered is not None and not dry_run:
+        save_fingerprint_index(fingerprint_index, fingerprint_file)
+        remove_journal(journal_file)
+        print(f"Resumed an interrupted sync: {recovered['finished']} finished changes recorded, "
+              f"{recovered['matched']} unconfirmed changes found, {recovered['moved']} old tasks of moves left to delete.")
+
+    # Find new, changed and removed assignments
+    with span("sync.diff"):
+        changes = diff_tasks(assignments, fingerprint_index, tasks, feed_uids, tasklist_for, default_tasklist)
+
+    # Turn the changes into the fewest API calls
+    plan = plan_mutations(changes, tasks)
+    if dry_run:
+        print_plan(plan)
+        mirror.close()
+        cost = get_plan_cost(plan)
+        return {"assignments": len(assignments), "planned": cost["calls"], "http_requests": cost["http_requests"],
+                "failed": 0, "next_due": _get_next_due(assignments)}
+
+    # Send what the quota allows, urgent changes first. The diff of a later run plans the rest again.
+    deferred = []
+    if quota is not None and plan:
+        plan, urgent = order_by_urgency(plan)
+        plan, deferred = split_plan(plan, quota.reserve(len(plan), urgent))
+        if deferred:
+            print(f"Deferred {len(deferred)} of {len(plan) + len(deferred)} changes to a later run, the API quota is used up.")
+
+    print("New Assignments:")
+    for mutation in plan:
+        if mutation['operation'] == 'insert':
+            print(mutation['fields']['title'])
     print("\nUpdated Assignments:")
-    for task_id, new_due_date in updated_assignments:
-        print(f"Task ID: {task_id}, New Due Date: {new_due_date}")
-        # Update the due date of the existing task in Google Tasks
-        update_task_due_date(task_id, new_due_date)
+    for mutation in plan:
+        if mutation['operation'] == 'patch':
+            print(f"Task ID: {mutation['task_id']}, Changes: {mutation['fields']}")
+    print("\nMoved Assignments:")
+    for mutation in plan:
+        if mutation['operation'] == 'move':
+            print(f"Task ID: {mutation['task_id']}, To: {mutation['fields']['destination_tasklist']}")
+    print("\nRemoved Assignments:")
+    for mutation in plan:
+        if mutation['operation'] == 'delete':
+            print(f"Task ID: {mutation['task_id']}")
+    journal = SyncJournal(journal_file)
+    if plan:
+        journal.begin(plan, [get_request_id(mutation) for mutation in plan])
+
+    # Changes the task already has need no call, just remember them
+    planned = {mutation['key'] for mutation in plan + deferred}
+    for key, task_id, assignment, tasklist in changes["due_changed"] + changes["renamed"]:
+        if key not in planned:
+            record_fingerprint(fingerprint_index, key, task_id, assignment.date, assignment.name, tasklist)
 
+    # Send all changes to Google Tasks in batches, one task list per batch. Moves go
+    # first, so the patches of moved tasks find them in their new list.
+    mutations_by_request = {get_request_id(mutation): mutation for mutation in plan}
+    with span("sync.mutations"):
+        moves = [mutation for mutation in plan if mutation['operation'] == 'move']
+        queue_plan(moves)
+        results = execute_queued_mutations(on_success=journal.record_result)
+        moved_ids = {mutations_by_request[result['request_id']]['key']: result['response']['id'] for result in results if not result['error']}
+        not_moved = {mutation['key'] for mutation in moves} - moved_ids.keys()
+        rest = []
+        for mutation in plan:
+            # The patch of a task that did not move would not find it in the new list
+            if mutation['operation'] == 'move' or mutation['key'] in not_moved:
+                continue
+            mutation['task_id'] = moved_ids.get(mutation['key'], mutation['task_id'])
+            rest.append(mutation)
+        queue_plan(rest)
+        results += execute_queued_mutations(on_success=journal.record_result)
 
-    
\ No newline at end of file
+    # Record the synced tasks so the next run only touches what changed
+    failed = []
+    synced_tasks = {}
+    for result in results:
+        mutation = mutations_by_request[result['request_id']]
+        key = mutation['key']
+        if result['error']:
+            failed.append(result)
+        elif result['operation'] == 'delete':
+            if fingerprint_index.get(key, {}).get('task_id') == mutation['task_id']:
+                del fingerprint_index[key]
+            synced_tasks.setdefault(mutation['tasklist'], []).append({'id': mutation['task_id'], 'deleted': True})
+        elif result['operation'] == 'move':
+            # Keep the synced title and due date, the patch that may follow records the new ones
+            task = result['response']
+            entry = fingerprint_index[key]
+            destination_tasklist = mutation['fields']['destination_tasklist']
+            record_fingerprint(fingerprint_index, key, task['id'], entry['due'], entry['title'], destination_tasklist)
+            synced_tasks.setdefault(mutation['tasklist'], []).append({'id': mutation['task_id'], 'deleted': True})
+            synced_tasks.setdefault(destination_tasklist, []).append(task)
+        else:
+            task = result['response']
+            assignment = mutation['assignment']
+            record_fingerprint(fingerprint_index, key, task['id'], assignment.date, assignment.name, mutation['tasklist'])
+            synced_tasks.setdefault(mutation['tasklist'], []).append(task)
+    save_fingerprint_index(fingerprint_index, fingerprint_file)
+    journal.commit()
+    for tasklist, tasklist_tasks in synced_tasks.items():
+        upsert_mirrored_tasks(mirror, tasklist_tasks, tasklist)
+    mirror.close()
+
+    for result in failed:
+        print(f"Failed to {result['operation']} ({result['request_id']}): {result['error']}")
+    print(f"\nSynced {len(results) - len(failed)} of {len(results)} changes.")
+
+    return {
+        "assignments": len(assignments),
+        "created": sum(1 for result in results if result['operation'] == 'insert' and not result['error']),
+        "updated": sum(1 for result in results if result['operation'] == 'patch' and not result['error']),
+        "moved": sum(1 for result in results if result['operation'] == 'move' and not result['error']),
+        "deleted": sum(1 for result in results if result['operation'] == 'delete' and not result['error']),
+        "failed": len(failed),
+        "deferred": len(deferred),
+        "next_due": _get_next_due(assignments),
+    }
+
+def _get_router(routing, task_list_name, dry_run):
+    # Resolve each list name once, creating lists that do not exist yet unless this is a dry run
+    tasklists_by_name = {}
+    def tasklist_for(assignment):
+        name = route_assignment(assignment, routing, task_list_name)
+        if name not in tasklists_by_name:
+            try:
+                tasklists_by_name[name] = resolve_task_list(name, create=not dry_run)
+            except ValueError:
+                tasklists_by_name[name] = NEW_TASK_LIST_PREFIX + name
+        return tasklists_by_name[name]
+    return tasklist_for
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync Canvas assignments to Google Tasks.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="fetch the feed and list tasks concurrently")
+    parser.add_argument("--force", action="store_true", help="sync even if the calendar is unchanged since the last sync")
+    parser.add_argument("--dry-run", action="store_true", help="print the planned changes and their API cost without sending them")
+    parser.add_argument("--daemon", action="store_true", help="keep running and poll the calendar on an adaptive schedule")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="profile in config.txt to sync (default: default)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    profile = get_profile(args.profile) or Profile()
+    feed_url = profile.url or os.getenv("CANVAS_ICAL_URL")
+    if not split_feed_urls(feed_url):
+        parser.error("no calendar feed URL, set CANVAS_ICAL_URL or the url of the profile")
+    options = {key: value for key, value in profile._asdict().items() if value is not None and key != "url"}
+    options["task_list_name"] = options.pop("task_list", "School")
+    if args.daemon:
+        from daemon_handler import SyncDaemon
+        daemon = SyncDaemon(sync, feed_url, profile=args.profile, **options)
+        daemon.install_signal_handlers()
+        daemon.run()
+    elif args.use_async:
+        asyncio.run(async_sync(feed_url, **options))
+    else:
+        sync(feed_url, force=args.force, dry_run=args.dry_run, **options)
@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+METRIC_PREFIX = "canvas_sync"
+RUN_REPORT_FILE = "run_report.json"
+PROMETHEUS_FILE = "metrics.prom"
+
+# Define global variables
+SPANS = {}
+COUNTERS = {}
+RUN_STARTED = time.time()
+_LOCK = threading.Lock()
+
+"""
+Times a block of code and records it under 'name'.
+
+Spans with the same name are aggregated into a count, a total and a maximum, so a
+span around a function called many times shows both how often and how long it ran.
+
+Usage:
+    with span("fetch_feed"):
+        ...
+"""
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _LOCK:
+            stats = SPANS.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+"""
+Decorator that records every call of a function as a span named 'name'.
+"""
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+"""
+Adds 'value' to the counter 'name' with the given labels.
+
+Usage:
+    increment("tasks_api_requests_total", method="tasks.tasks.insert")
+"""
+def increment(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _LOCK:
+        COUNTERS[key] = COUNTERS.get(key, 0) + value
+
+"""
+Returns the total of the counter 'name' over all its labels.
+"""
+def get_counter(name):
+    with _LOCK:
+        return sum(value for (counter, labels), value in COUNTERS.items() if counter == name)
+
+"""
+Clears all spans and counters and starts a new run.
+"""
+def reset_metrics():
+    global RUN_STARTED
+    with _LOCK:
+        SPANS.clear()
+        COUNTERS.clear()
+        RUN_STARTED = time.time()
+
+"""
+Returns the spans and counters recorded since the last reset.
+
+Returns:
+- dict: 'started' and 'duration_seconds' of the run, 'spans' by name and 'counters'
+    as a list of {'name', 'labels', 'value'}.
+"""
+def get_run_report():
+    with _LOCK:
+        return {
+            "started": RUN_STARTED,
+            "duration_seconds": time.time() - RUN_STARTED,
+            "spans": {name: dict(stats) for name, stats in SPANS.items()},
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(COUNTERS.items())
+            ],
+        }
+
+"""
+Formats a run report in the Prometheus text exposition format.
+
+Spans become the summary 'canvas_sync_span_seconds' (sum and count per span) and the
+gauge 'canvas_sync_span_max_seconds'. Counters keep their names with the prefix added.
+
+Args:
+- report (dict): A report returned by 'get_run_report()'.
+
+Returns:
+- str: The metrics, ready for the node exporter's textfile collector.
+"""
+def format_prometheus(report):
+    lines = [
+        f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start of the last sync run.",
+        f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+        f"{METRIC_PREFIX}_last_run_timestamp_seconds {report['started']:.3f}",
+        f"# HELP {METRIC_PREFIX}_run_duration_seconds Duration of the last sync run.",
+        f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+        f"{METRIC_PREFIX}_run_duration_seconds {report['duration_seconds']:.6f}",
+        f"# HELP {METRIC_PREFIX}_span_seconds Time spent in each phase of the last run.",
+        f"# TYPE {METRIC_PREFIX}_span_seconds summary",
+    ]
+    for name, stats in sorted(report["spans"].items()):
+        labels = _format_labels({"span": name})
+        lines.append(f"{METRIC_PREFIX}_span_seconds_sum{labels} {stats['seconds']:.6f}")
+        lines.append(f"{METRIC_PREFIX}_span_seconds_count{labels} {stats['count']}")
+    lines.append(f"# TYPE {METRIC_PREFIX}_span_max_seconds gauge")
+    for name, stats in sorted(report["spans"].items()):
+        lines.append(f"{METRIC_PREFIX}_span_max_seconds{_format_labels({'span': name})} {stats['max_seconds']:.6f}")
+
+    typed = set()
+    for counter in report["counters"]:
+        metric = f"{METRIC_PREFIX}_{counter['name']}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_format_labels(counter['labels'])} {counter['value']}")
+    return "\n".join(lines) + "\n"
+
+"""
+Writes the metrics of the current run as a JSON run report and a Prometheus text file.
+
+Both files are written to a temporary file and renamed, so a collector never reads a
+partial file.
+
+Args:
+- json_file (str): Where to write the JSON run report.
+- prometheus_file (str): Where to write the Prometheus metrics.
+- extra (dict, optional): Additional fields for the JSON report, such as the sync results.
+"""
+def write_run_report(json_file=RUN_REPORT_FILE, prometheus_file=PROMETHEUS_FILE, extra=None):
+    report = get_run_report()
+    if extra:
+        report.update(extra)
+    _write_atomic(json_file, json.dumps(report, indent=2, default=str))
+    _write_atomic(prometheus_file, format_prometheus(report))
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items())) + "}"
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _write_atomic(filename, content):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.remove(temp_path)
+        raise
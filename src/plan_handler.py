@@ -0,0 +1,178 @@
+import datetime
+import math
+from fingerprint_handler import format_due
+from tasks_api_handler import queue_create_task, queue_update_task_details, queue_delete_task, queue_move_task, BATCH_LIMIT
+
+# Inserts, moves and patches of assignments due within this many hours are sent first when the quota runs short
+URGENT_HOURS = 48
+
+"""
+Turns the change set of 'diff_tasks()' into the smallest list of Tasks API mutations.
+
+- Each new assignment becomes one insert.
+- Each task routed to another task list becomes one move, ahead of its patch.
+- All changes to an existing task become one patch carrying only the changed fields,
+    so the task is never retrieved first and its notes and other fields are kept.
+- Fields whose new value equals the value of the mirrored task are dropped, and a
+    patch with no fields left is dropped entirely.
+- Each removed assignment becomes one delete.
+
+Args:
+- changes (dict): The change set returned by 'diff_tasks()'.
+- tasks (list): The tasks of the task lists, as returned by 'get_mirrored_tasks()'.
+
+Returns:
+- list: The planned mutations, as dicts with the keys 'operation' ('insert', 'patch',
+    'move' or 'delete'), 'key' (the assignment key), 'tasklist' (the ID of the task list to
+    change, None for the selected one), 'task_id' (None for inserts), 'fields' (the
+    title and due date to set, as {'title', 'due_date'}, or the list to move the task to,
+    as {'destination_tasklist'}) and 'assignment' (None for deletes).
+"""
+def plan_mutations(changes, tasks):
+    tasks_by_id = {task['id']: task for task in tasks}
+    plan = []
+
+    for key, assignment, tasklist in changes["created"]:
+        plan.append(_new_mutation('insert', key, tasklist, None, assignment, title=assignment.name, due_date=assignment.date))
+
+    for key, task_id, assignment, tasklist, destination_tasklist in changes["moved"]:
+        plan.append(_new_mutation('move', key, tasklist, task_id, assignment, destination_tasklist=destination_tasklist))
+
+    patches = {}
+    for key, task_id, assignment, tasklist in changes["due_changed"]:
+        patches.setdefault(key, _new_mutation('patch', key, tasklist, task_id, assignment))['fields']['due_date'] = assignment.date
+    for key, task_id, assignment, tasklist in changes["renamed"]:
+        patches.setdefault(key, _new_mutation('patch', key, tasklist, task_id, assignment))['fields']['title'] = assignment.name
+    for patch in patches.values():
+        task = tasks_by_id.get(patch['task_id'])
+        if task is not None:
+            _drop_unchanged_fields(patch['fields'], task)
+        if patch['fields']:
+            plan.append(patch)
+
+    for key, task_id, tasklist in changes["deleted"]:
+        plan.append(_new_mutation('delete', key, tasklist, task_id, None))
+
+    return plan
+
+"""
+Returns the API cost of a plan.
+
+Args:
+- plan (list): The mutations returned by 'plan_mutations()'.
+- batch_size (int, optional): The maximum number of requests per batch (default is BATCH_LIMIT).
+
+Returns:
+- dict: The number of API calls counted against the quota ('calls') and of batch HTTP
+    requests needed to send them ('http_requests'), and the calls per operation ('operations').
+    Batches are sent per task list, as 'execute_queued_mutations()' does.
+"""
+def get_plan_cost(plan, batch_size=BATCH_LIMIT):
+    operations = {}
+    per_tasklist = {}
+    for mutation in plan:
+        operations[mutation['operation']] = operations.get(mutation['operation'], 0) + 1
+        per_tasklist[mutation['tasklist']] = per_tasklist.get(mutation['tasklist'], 0) + 1
+    return {
+        "calls": len(plan),
+        "http_requests": sum(math.ceil(count / batch_size) for count in per_tasklist.values()),
+        "operations": operations,
+    }
+
+"""
+Orders a plan so the mutations of assignments due soon come first.
+
+A mutation is urgent if it inserts, moves or patches an assignment due within
+URGENT_HOURS. Deletes are never urgent, a stale task does less harm than a missing
+one. The mutations of one assignment, the move and patch of a task routed to another
+list, are kept next to each other and are urgent together. The order is otherwise kept.
+
+Args:
+- plan (list): The mutations returned by 'plan_mutations()'.
+- now (datetime.datetime, optional): The current time. Defaults to now.
+
+Returns:
+- tuple: The reordered plan and the number of urgent mutations at its start.
+"""
+def order_by_urgency(plan, now=None):
+    now = now or datetime.datetime.now()
+    cutoff = format_due(now + datetime.timedelta(hours=URGENT_HOURS))
+    groups = {}
+    for mutation in plan:
+        groups.setdefault(mutation['key'], []).append(mutation)
+    urgent = [group for group in groups.values() if any(_is_urgent(mutation, cutoff) for mutation in group)]
+    other = [group for group in groups.values() if not any(_is_urgent(mutation, cutoff) for mutation in group)]
+    return [mutation for group in urgent + other for mutation in group], sum(map(len, urgent))
+
+"""
+Splits an ordered plan into the first 'count' mutations to send and the rest to defer,
+moving the cut back so the mutations of one assignment are sent or deferred together.
+The patch of a moved task is sent to its new list, where it fails without the move.
+
+Args:
+- plan (list): A plan ordered by 'order_by_urgency()'.
+- count (int): The number of mutations that may be sent.
+
+Returns:
+- tuple: The mutations to send and the mutations to defer.
+"""
+def split_plan(plan, count):
+    count = max(0, min(count, len(plan)))
+    while 0 < count < len(plan) and plan[count]['key'] == plan[count - 1]['key']:
+        count -= 1
+    return plan[:count], plan[count:]
+
+"""
+Prints a plan and its API cost, for dry runs.
+"""
+def print_plan(plan, batch_size=BATCH_LIMIT):
+    for mutation in plan:
+        fields = ", ".join(f"{name}={value}" for name, value in mutation['fields'].items())
+        target = mutation['task_id'] or mutation['key']
+        tasklist = f" in {mutation['tasklist']}" if mutation['tasklist'] else ""
+        print(f"{mutation['operation']:<6} {target}{tasklist}  {fields}")
+    cost = get_plan_cost(plan, batch_size)
+    per_operation = ", ".join(f"{count} {operation}" for operation, count in sorted(cost['operations'].items()))
+    print(f"\n{cost['calls']} API calls ({per_operation or 'nothing to do'}) in {cost['http_requests']} batch requests.")
+
+"""
+Queues the mutations of a plan to be sent with 'execute_queued_mutations()'. The
+request ID of each mutation is its operation and assignment key, since a task that
+moves to another list is both moved and patched.
+
+Args:
+- plan (list): The mutations returned by 'plan_mutations()'.
+- tasklist (str, optional): The task list of mutations that have none. Defaults to the selected task list.
+"""
+def queue_plan(plan, tasklist=None):
+    for mutation in plan:
+        fields = mutation['fields']
+        destination = mutation['tasklist'] or tasklist
+        if mutation['operation'] == 'insert':
+            queue_create_task(fields['title'], "", fields['due_date'], destination, request_id=get_request_id(mutation))
+        elif mutation['operation'] == 'patch':
+            queue_update_task_details(mutation['task_id'], fields.get('title'), fields.get('due_date'), destination, request_id=get_request_id(mutation))
+        elif mutation['operation'] == 'move':
+            queue_move_task(mutation['task_id'], fields['destination_tasklist'], destination, request_id=get_request_id(mutation))
+        else:
+            queue_delete_task(mutation['task_id'], destination, request_id=get_request_id(mutation))
+
+"""
+Returns the request ID a mutation of a plan is queued under.
+"""
+def get_request_id(mutation):
+    return f"{mutation['operation']}:{mutation['key']}"
+
+def _new_mutation(operation, key, tasklist, task_id, assignment, **fields):
+    return {"operation": operation, "key": key, "tasklist": tasklist, "task_id": task_id, "fields": fields, "assignment": assignment}
+
+def _is_urgent(mutation, cutoff):
+    # Compared by calendar day, like the due dates Google Tasks stores
+    assignment = mutation['assignment']
+    return mutation['operation'] != 'delete' and assignment is not None and format_due(assignment.date) <= cutoff
+
+def _drop_unchanged_fields(fields, task):
+    if 'title' in fields and fields['title'] == task['title']:
+        del fields['title']
+    if 'due_date' in fields and format_due(fields['due_date']) == format_due(task['due']):
+        del fields['due_date']
@@ -0,0 +1,151 @@
+import sqlite3
+import time
+
+QUOTA_FILE = "quota.db"
+# The project-wide number of Tasks API calls per window. Set it to the quota of the
+# Google Cloud project the OAuth client belongs to.
+DEFAULT_LIMIT = 600
+DEFAULT_WINDOW = 60
+# Share of each window that only urgent changes may use, so a tenant with a backlog
+# of far-off assignments can't leave nothing for another tenant's deadline
+URGENT_RESERVE = 0.2
+
+"""
+Tasks API budget shared by every tenant syncing under one Google Cloud project.
+
+The calls of all tenants are recorded in a SQLite ledger per fixed time window, so
+worker processes (and separate runs of the tenant runner) sharing the database file
+stay under the project limit together. Reservations are made in an immediate
+transaction, which serializes them across processes.
+
+Each window is shared fairly: a tenant may use 'limit' divided by the number of
+tenants sharing the budget, which is the number given by the runner or, if more, the
+number of tenants active in this or the previous window, so the first tenant of a
+window can't take the shares of the ones after it. Urgent calls are granted first, and
+only they may use the last URGENT_RESERVE of the window.
+
+Args:
+- filename (str): The SQLite ledger, shared by all tenants.
+- tenant (str): The name of the tenant whose calls are reserved and charged.
+- limit (int): The project-wide number of calls per window.
+- window (float): The length of a window in seconds.
+- tenants (int): The number of tenants known to share the budget, e.g. the users in
+    the manifest of the tenant runner.
+"""
+class QuotaBudget:
+    def __init__(self, filename=QUOTA_FILE, tenant="default", limit=DEFAULT_LIMIT, window=DEFAULT_WINDOW, tenants=1):
+        self.filename = filename
+        self.tenant = tenant
+        self.limit = limit
+        self.window = window
+        self.tenants = tenants
+        self._reserved = 0
+
+    """
+    Reserves up to 'calls' API calls for the tenant in the current window.
+
+    Args:
+    - calls (int): The number of calls wanted.
+    - urgent (int, optional): How many of them are urgent.
+
+    Returns:
+    - int: The number of calls granted, urgent calls first. The rest should be deferred.
+    """
+    def reserve(self, calls, urgent=0):
+        urgent = min(urgent, calls)
+        with self._transaction() as connection:
+            window = self._register(connection)
+            total, used, tenants = self._get_usage(connection, window)
+
+            share = self.limit / max(tenants, self.tenants, 1)
+            granted_urgent = max(0, min(urgent, int(share - used), self.limit - total))
+            room = min(share - used, self.limit * (1 - URGENT_RESERVE) - total) - granted_urgent
+            granted = granted_urgent + max(0, min(calls - urgent, int(room)))
+            self._add(connection, window, granted)
+        self._reserved += granted
+        return granted
+
+    """
+    Records calls the tenant made without a reservation, such as reads and retries.
+    They count against the project limit even if it has been reached.
+    """
+    def charge(self, calls):
+        if calls <= 0:
+            return
+        with self._transaction() as connection:
+            self._add(connection, self._register(connection), calls)
+
+    """
+    Records the calls a run made once it is done. The calls reserved since the last
+    settlement are already counted, so only the ones beyond them are charged, and
+    reserved calls that were not made (deferred with their pair, or never sent) are
+    given back.
+
+    Args:
+    - calls (int): The number of calls the run made, including reads and retries.
+    """
+    def settle(self, calls):
+        reserved, self._reserved = self._reserved, 0
+        if calls != reserved:
+            with self._transaction() as connection:
+                self._add(connection, self._register(connection), calls - reserved)
+
+    """
+    Returns the usage of the current window.
+
+    Returns:
+    - dict: The calls used by all tenants ('used') and by this tenant ('tenant_used'),
+        the number of active tenants ('tenants') and the project limit ('limit').
+    """
+    def get_usage(self):
+        with self._transaction() as connection:
+            total, used, tenants = self._get_usage(connection, self._get_window())
+        return {"used": total, "tenant_used": used, "tenants": tenants, "limit": self.limit}
+
+    def _transaction(self):
+        return _Transaction(self.filename)
+
+    def _get_window(self):
+        return int(time.time() // self.window)
+
+    def _register(self, connection):
+        # Count the tenant as active even if it gets nothing, so the next shares make room for it
+        window = self._get_window()
+        connection.execute("INSERT OR IGNORE INTO usage (period, tenant, calls) VALUES (?, ?, 0)", (window, self.tenant))
+        connection.execute("DELETE FROM usage WHERE period < ?", (window - 1,))
+        return window
+
+    def _get_usage(self, connection, window):
+        total, used = connection.execute(
+            "SELECT COALESCE(SUM(calls), 0), COALESCE(SUM(CASE WHEN tenant = ? THEN calls END), 0) FROM usage WHERE period = ?",
+            (self.tenant, window),
+        ).fetchone()
+        tenants = connection.execute("SELECT COUNT(DISTINCT tenant) FROM usage WHERE period >= ?", (window - 1,)).fetchone()[0]
+        return total, used, tenants
+
+    def _add(self, connection, window, calls):
+        # A refund may land in a later window than its reservation, never go below zero there
+        connection.execute("UPDATE usage SET calls = MAX(0, calls + ?) WHERE period = ? AND tenant = ?", (calls, window, self.tenant))
+
+class _Transaction:
+    def __init__(self, filename):
+        self._connection = sqlite3.connect(filename, timeout=30, isolation_level=None)
+
+    def __enter__(self):
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                period INTEGER NOT NULL,
+                tenant TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                PRIMARY KEY (period, tenant)
+            )
+        """)
+        # Take the write lock up front so no other process reads the same usage in between
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._connection.close()
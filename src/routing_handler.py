@@ -0,0 +1,77 @@
+import fnmatch
+import json
+import re
+
+ROUTING_FILE = "routing.json"
+# Canvas event UIDs of course items carry the numeric course ID, e.g. "event-assignment-course_1234-5678"
+COURSE_UID_PATTERN = re.compile(r"course_(\d+)")
+
+"""
+Loads the task list routing rules.
+
+The file holds a JSON object such as:
+
+    {
+        "default": "School",
+        "rules": [
+            {"course": "COP3502", "task_list": "Programming"},
+            {"course": "*", "task_list": "{course}"}
+        ]
+    }
+
+Each rule matches the course of an assignment with a shell-style pattern, and the first
+matching rule decides the task list. '{course}' in a task list name is replaced with the
+course, so the last rule above gives every other course its own list. Assignments
+without a course, or matching no rule, go to the default list.
+
+Args:
+- filename (str): The file holding the rules.
+
+Returns:
+- dict: The rules, or None if the file does not exist.
+
+Raises:
+- ValueError: If the file is not valid JSON or a rule misses 'course' or 'task_list'.
+"""
+def load_routing_rules(filename=ROUTING_FILE):
+    try:
+        with open(filename, "r") as file:
+            routing = json.load(file)
+    except FileNotFoundError:
+        return None
+    for rule in routing.get("rules", []):
+        if "course" not in rule or "task_list" not in rule:
+            raise ValueError(f"Routing rule {rule} in '{filename}' needs a 'course' and a 'task_list'.")
+    return routing
+
+"""
+Returns the course of an assignment: the course code from the summary, or else the
+course ID from the event UID, or None.
+"""
+def get_assignment_course(assignment):
+    if assignment.course:
+        return assignment.course
+    match = COURSE_UID_PATTERN.search(assignment.uid or "")
+    return match.group(1) if match else None
+
+"""
+Returns the name of the task list an assignment belongs in.
+
+Args:
+- assignment (Assignment): An assignment as returned by 'get_ical_content()'.
+- routing (dict): The rules returned by 'load_routing_rules()', or None.
+- default (str): The task list used when there are no rules or none match, unless the
+    rules name their own default.
+
+Returns:
+- str: The name of the task list.
+"""
+def route_assignment(assignment, routing, default):
+    if not routing:
+        return default
+    course = get_assignment_course(assignment)
+    if course is not None:
+        for rule in routing.get("rules", []):
+            if fnmatch.fnmatchcase(course, rule["course"]):
+                return rule["task_list"].replace("{course}", course)
+    return routing.get("default", default)
@@ -0,0 +1,141 @@
+import datetime
+import sqlite3
+import tasks_api_handler
+
+MIRROR_FILE = "tasks_mirror.db"
+# Tasks updated while a sync was running may carry an earlier timestamp than the
+# watermark, so each incremental sync looks back a little further
+WATERMARK_MARGIN = datetime.timedelta(minutes=5)
+
+"""
+Opens the local SQLite mirror of the Google task lists, creating it if needed.
+
+The connection may be used from another thread than the one that opened it (as the
+asyncio pipeline does), but not from two threads at once.
+
+Args:
+- filename (str): The SQLite database file.
+
+Returns:
+- sqlite3.Connection: The connection to the mirror.
+"""
+def open_task_mirror(filename=MIRROR_FILE):
+    connection = sqlite3.connect(filename, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            tasklist TEXT NOT NULL,
+            id TEXT NOT NULL,
+            title TEXT,
+            due TEXT,
+            status TEXT,
+            updated TEXT,
+            PRIMARY KEY (tasklist, id)
+        );
+        CREATE TABLE IF NOT EXISTS sync_state (
+            tasklist TEXT PRIMARY KEY,
+            watermark TEXT NOT NULL
+        );
+    """)
+    return connection
+
+"""
+Brings the mirror of a task list up to date with Google Tasks.
+
+The first sync of a list loads every task. After that, only the tasks updated since
+the watermark of the previous sync are retrieved (with the Tasks API 'updatedMin'
+parameter), so a run where nothing changed costs a single list request.
+Deleted tasks are removed from the mirror.
+
+Args:
+- connection (sqlite3.Connection): The connection returned by 'open_task_mirror()'.
+- tasklist (str, optional): The task list to sync. Defaults to the selected task list.
+
+Returns:
+- int: The number of tasks retrieved from Google Tasks.
+"""
+def sync_task_mirror(connection, tasklist=None):
+    tasklist = tasklist or tasks_api_handler.TASKLISTID
+    started = datetime.datetime.now(datetime.timezone.utc)
+
+    row = connection.execute("SELECT watermark FROM sync_state WHERE tasklist = ?", (tasklist,)).fetchone()
+    watermark = row['watermark'] if row else None
+    tasks = tasks_api_handler.get_tasks_updated_since(watermark, tasklist)
+
+    with connection:
+        if watermark is None:
+            # Full load, so anything left over from an earlier mirror is stale
+            connection.execute("DELETE FROM tasks WHERE tasklist = ?", (tasklist,))
+        upsert_mirrored_tasks(connection, tasks, tasklist)
+        connection.execute(
+            "INSERT OR REPLACE INTO sync_state (tasklist, watermark) VALUES (?, ?)",
+            (tasklist, _format_watermark(started - WATERMARK_MARGIN)),
+        )
+    return len(tasks)
+
+"""
+Writes tasks returned by the Google Tasks API into the mirror.
+
+Tasks marked as deleted are removed. Use this after inserting or updating tasks to
+keep the mirror current without listing the task list again.
+
+Args:
+- connection (sqlite3.Connection): The connection returned by 'open_task_mirror()'.
+- tasks (list): Task resources from the Google Tasks API.
+- tasklist (str, optional): The task list the tasks belong to. Defaults to the selected task list.
+"""
+def upsert_mirrored_tasks(connection, tasks, tasklist=None):
+    tasklist = tasklist or tasks_api_handler.TASKLISTID
+    with connection:
+        connection.executemany(
+            "DELETE FROM tasks WHERE tasklist = ? AND id = ?",
+            [(tasklist, task['id']) for task in tasks if task.get('deleted')],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO tasks (tasklist, id, title, due, status, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (tasklist, task['id'], task.get('title'), task.get('due'), task.get('status'), task.get('updated'))
+                for task in tasks if not task.get('deleted')
+            ],
+        )
+
+"""
+Returns a mirrored task by ID.
+
+Args:
+- connection (sqlite3.Connection): The connection returned by 'open_task_mirror()'.
+- task_id (str): The ID of the task.
+- tasklist (str, optional): The task list containing the task. Defaults to the selected task list.
+
+Returns:
+- dict: The task with the keys 'id', 'title', 'due', 'status' and 'updated', or None if
+    the task does not exist.
+"""
+def get_mirrored_task(connection, task_id, tasklist=None):
+    tasklist = tasklist or tasks_api_handler.TASKLISTID
+    row = connection.execute(
+        "SELECT id, title, due, status, updated FROM tasks WHERE tasklist = ? AND id = ?",
+        (tasklist, task_id),
+    ).fetchone()
+    return dict(row) if row else None
+
+"""
+Returns all mirrored tasks of a task list.
+
+Args:
+- connection (sqlite3.Connection): The connection returned by 'open_task_mirror()'.
+- tasklist (str, optional): The task list to read. Defaults to the selected task list.
+
+Returns:
+- list: The tasks, as dicts with the keys 'id', 'title', 'due', 'status' and 'updated'.
+"""
+def get_mirrored_tasks(connection, tasklist=None):
+    tasklist = tasklist or tasks_api_handler.TASKLISTID
+    rows = connection.execute(
+        "SELECT id, title, due, status, updated FROM tasks WHERE tasklist = ?",
+        (tasklist,),
+    )
+    return [dict(row) for row in rows]
+
+def _format_watermark(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
@@ -1,20 +1,44 @@
 # Import necessary modules and libraries
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
+# googleapiclient.discovery, google-auth, oauthlib and httplib2 are imported where they are
+# used, so a run that exits early never pays for loading them
 from googleapiclient.errors import HttpError
-from google.auth.transport.requests import Request
+from credential_handler import get_credential_manager
+from executor_handler import execute, submit, set_http_factory, is_retryable, backoff_delay, MAX_RETRIES
+from metrics_handler import span, timed, increment
 from threading import Lock
-import pickle
+import json
 import os
+import tempfile
+import time
+import uuid
 
 # Define global constants
 SCOPES = ['https://www.googleapis.com/auth/tasks']
 CHAR_LIMIT = 8000
+BATCH_LIMIT = 50
+# Pinned copy of the Tasks v1 discovery document, so building the service needs no
+# discovery lookup. Refresh it from https://tasks.googleapis.com/$discovery/rest?version=v1
+DISCOVERY_DOCUMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'discovery', 'tasks.v1.json')
+
+# Task list IDs by name, saved between runs so lists are not looked up every time
+TASKLIST_CACHE_FILE = "tasklists.json"
+# Environment variable that points the client at another Tasks API endpoint, such as
+# the local stand-in server in benchmarks/tasks_api_server.py
+API_ENDPOINT_VARIABLE = "TASKS_API_ENDPOINT"
 
 # Define global variables
 CREDS = None
 SERVICE = None
 TASKLISTID = None
+TOKEN_FILE = None
+TASKLIST_NAME = None
+PENDING_MUTATIONS = []
+TASKLIST_CACHE = TASKLIST_CACHE_FILE
+TASKLIST_IDS = None
+TASKLIST_IDS_REFRESHED = False
+# The Tasks API endpoint requests are sent to, None for Google's
+API_ENDPOINT = None
+_SERVICE_LOCK = Lock()
 
 """
 Initializes the Google Tasks API by obtaining credentials and creating a service instance.
@@ -23,38 +47,101 @@ This function aims to set up the Google Tasks API service by fetching necessary
 and constructing a service object to interact with the Tasks API. It involves the following steps:
 
 - Obtains credentials using the '_get_credentials()' function.
-- Builds the service using the obtained credentials with the 'build()' method.
-- If successful, assigns the obtained credentials and service instance to global variables
-    'CREDS' and 'SERVICE', respectively.
+- Resets the service, which '_get_service()' builds from the pinned discovery document
+    with the obtained credentials the first time it is needed.
+- Gives the request executor a factory for per-thread authorized transports, since
+    httplib2 is not thread-safe.
+- If successful, assigns the obtained credentials to the global variable 'CREDS' and
+    clears 'SERVICE' so it is rebuilt with them.
 - Prints a success message indicating successful initialization of the Google Tasks API.
 
 Expected Conditions:
 - The '_get_credentials()' function should return valid credentials.
-- The 'build()' method should successfully create a service instance for the Tasks API.
 
 Outputs:
 - If successful, assigns the obtained credentials to the global variable 'CREDS'.
-- If successful, assigns the created service instance to the global variable 'SERVICE'.
 - Prints a success message upon successful initialization.
 
+Args:
+- token_file (str, optional): The file the user's OAuth token is stored in (default is 'token.pickle').
+- interactive (bool, optional): Whether the user may be asked to sign in again in the browser.
+    Unattended runs, such as the multi-tenant runner, pass False.
+- api_endpoint (str, optional): The base URL to send Tasks API requests to instead of
+    Google's, e.g. 'http://127.0.0.1:8080/' for the local stand-in server. Defaults to the
+    TASKS_API_ENDPOINT environment variable. The stand-in needs no sign in, so no
+    credentials are loaded and the token file is not used.
+
 Raises:
 - Any exceptions raised during the initialization process are caught and re-raised to 
-    provide information on the encountered error.
+    provide information on the encountered error. If 'interactive' is True and the refresh
+    token was revoked or has expired, the user is asked to sign in again instead.
 """
-def initialize_task_list():
-    global CREDS, SERVICE
+def initialize_task_list(token_file='token.pickle', interactive=True, api_endpoint=None):
+    global CREDS, SERVICE, TOKEN_FILE, TASKLIST_NAME, TASKLIST_IDS, TASKLIST_IDS_REFRESHED, API_ENDPOINT
+    TOKEN_FILE = TASKLIST_NAME = None
+    # Another token may belong to another account with other task lists
+    TASKLIST_IDS = None
+    TASKLIST_IDS_REFRESHED = False
+    API_ENDPOINT = api_endpoint or os.getenv(API_ENDPOINT_VARIABLE) or None
     try:
-        CREDS = _get_credentials()
-        SERVICE = build('tasks', 'v1', credentials=CREDS)
+        with span("tasks_api.get_credentials"):
+            if API_ENDPOINT is None:
+                CREDS = _get_credentials(token_file, interactive)
+            else:
+                from google.auth.credentials import AnonymousCredentials
+                CREDS = AnonymousCredentials()
+        SERVICE = None
+        set_http_factory(_new_authorized_http)
+        TOKEN_FILE = token_file
         print("Google Tasks API initialized successfully.")
     except Exception as e:
-        # Clear the user token and make them reauthenticate
         print(f"An error occurred while initializing Google Tasks API: {e}")
-        if os.path.exists('token.pickle'):
-            os.remove('token.pickle')
-        CREDS = _get_credentials()
-        SERVICE = build('tasks', 'v1', credentials=CREDS)
-        raise
+        from google.auth.exceptions import RefreshError
+        if not interactive or not isinstance(e, RefreshError):
+            raise
+        # The refresh token was revoked or has expired, make the user reauthenticate.
+        # The old token file is replaced once the new credentials are saved
+        CREDS = get_credential_manager(token_file, SCOPES).sign_in()
+        SERVICE = None
+        set_http_factory(_new_authorized_http)
+        TOKEN_FILE = token_file
+        print("Google Tasks API initialized successfully.")
+
+"""
+Returns the Google Tasks service, building it on first use.
+
+The service is built from the pinned discovery document in DISCOVERY_DOCUMENT with
+'build_from_document()', or with 'build()' if the document is missing. Requests go to
+API_ENDPOINT if one is set.
+
+Returns:
+- Resource: The Google Tasks v1 service.
+"""
+def _get_service():
+    global SERVICE
+    with _SERVICE_LOCK:
+        if SERVICE is None:
+            with span("tasks_api.build_service"):
+                from googleapiclient.discovery import build, build_from_document
+                client_options = {'api_endpoint': API_ENDPOINT} if API_ENDPOINT else None
+                if os.path.exists(DISCOVERY_DOCUMENT):
+                    with open(DISCOVERY_DOCUMENT, 'r') as document:
+                        SERVICE = build_from_document(document.read(), credentials=CREDS, client_options=client_options)
+                else:
+                    SERVICE = build('tasks', 'v1', credentials=CREDS, client_options=client_options)
+        return SERVICE
+
+"""
+Creates a batch request for the Tasks service.
+
+'new_batch_http_request()' always sends batches to the root URL of the discovery
+document, so with API_ENDPOINT set the batch is built with that endpoint instead.
+"""
+def _new_batch_http_request(callback=None):
+    if API_ENDPOINT is None:
+        return _get_service().new_batch_http_request(callback=callback)
+    from googleapiclient.http import BatchHttpRequest
+    return BatchHttpRequest(callback=callback, batch_uri=API_ENDPOINT.rstrip('/') + '/batch')
 
 """
 Sets the global variable TASKLISTID to the ID of the specified task list.
@@ -78,12 +165,22 @@ Raises:
 - Raises a ValueError if the specified task list name is not found or does not exist.
 """
 def set_task_list(taskListName):
-    global TASKLISTID
+    global TASKLISTID, TASKLIST_NAME
     try:
         TASKLISTID = _get_task_list_id(taskListName)
+        TASKLIST_NAME = taskListName
     except ValueError as e:
         raise
 
+"""
+Returns True if the API is already initialized with 'token_file' and the task list
+'taskListName' is selected, so a long-running process can skip both steps.
+
+The credentials are refreshed by the authorized transports when they expire.
+"""
+def is_task_list_ready(token_file, taskListName):
+    return CREDS is not None and TOKEN_FILE == token_file and TASKLIST_NAME == taskListName and TASKLISTID is not None
+
 """
 Creates a task in the Google Tasks service with the provided information.
 
@@ -112,22 +209,17 @@ Raises:
 - Raises an Exception if an unexpected error occurs while creating the task.
 """
 # Create a task in the specified task list
+@timed("tasks_api.create_task")
 def create_task(title, notes, due_date):
     if TASKLISTID is None:
         raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
     
     # Prepare task data
-    task = {
-        'title': title,
-        'notes':    None if notes is None 
-                    else _truncateString(notes) if len(notes) > CHAR_LIMIT
-                    else notes,
-        'due': _formatDateString(due_date) if due_date else None,
-    }
+    task = _build_task_body(title, notes, due_date)
     
     # Attempt to create the task
     try:
-        return SERVICE.tasks().insert(tasklist=TASKLISTID, body=task).execute()
+        return execute(_get_service().tasks().insert(tasklist=TASKLISTID, body=task))
     except HttpError as e:
         print(f"HTTP error occurred: {e}")
         raise
@@ -142,31 +234,74 @@ This function is designed to clear all tasks from the specified task list using
 TASKLISTID as the target task list. The function involves the following steps:
 
 - Validates if the TASKLISTID has been set. Raises a RuntimeError if TASKLISTID is None.
-- Initializes a lock and a set to track ongoing deletions for synchronization among deletion threads.
-- Retrieves the tasks in the specified task list using the Google Tasks API 'list' method.
-- Processes tasks by deleting them iteratively using the 'delete' method for each task.
-- Uses a lock to prevent concurrent deletion of the same task ID, allowing only one thread to delete a task ID at a time.
-- Asserts that all tasks have been cleared from the task list. Raises AssertionError if some tasks remain.
+- Pages through the task list once using the Google Tasks API 'list' method.
+- Clears the completed tasks with a single call to the 'clear' method, which hides them.
+- Deletes the remaining tasks with 'delete' requests sent in concurrent batches through
+    'execute_queued_mutations()', which sends the requests that fail with a 429 or 5xx
+    status again and leaves the successful ones alone. Tasks that are already gone count
+    as deleted.
+- Prints how many open tasks were deleted and how many completed tasks were hidden, and how fast.
 
 Expected Conditions:
 - TASKLISTID should be set to the desired task list before executing this operation.
 
+Returns:
+- dict: The number of completed tasks cleared ('cleared'), open tasks deleted ('deleted'),
+    deletes that failed ('failed') and the time taken in seconds ('seconds').
+
 Raises:
 - Raises a RuntimeError if the TASKLISTID is not set before performing this operation.
 - Handles HTTP errors (HttpError) if encountered during task list retrieval.
-- Raises AssertionError if some tasks remain after attempted deletion.
 """
+@timed("tasks_api.clear_task_list")
 def clear_task_list():
     if TASKLISTID is None:
         raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
-    
-    # Initialize a lock and a set to track ongoing deletions
-    deletion_lock = Lock()
-    ongoing_deletions = set()
-    
-    # Retrieve tasks in the task list
+    started = time.monotonic()
+
+    # Retrieve every task of the list in one pass
+    tasks = _list_tasks_for_clear()
+    completed = [task for task in tasks if task.get('status') == 'completed']
+    remaining = [task for task in tasks if task.get('status') != 'completed']
+
+    # One call hides all completed tasks
+    if completed:
+        execute(_get_service().tasks().clear(tasklist=TASKLISTID))
+
+    # Send the deletes on their own, without mutations queued by someone else
+    queued = PENDING_MUTATIONS[:]
+    PENDING_MUTATIONS.clear()
     try:
-        tasks = SERVICE.tasks().list(tasklist=TASKLISTID).execute()
+        for task in remaining:
+            queue_delete_task(task['id'], request_id=task['id'])
+        results = execute_queued_mutations()
+    finally:
+        PENDING_MUTATIONS[:0] = queued
+
+    failed = []
+    for result in results:
+        # A task that is already gone needs no delete
+        if result['error'] and not (isinstance(result['error'], HttpError) and result['error'].resp.status == 404):
+            print(f"HTTP error occurred while deleting task {result['request_id']}: {result['error']}")
+            failed.append(result)
+
+    elapsed = time.monotonic() - started
+    deleted = len(remaining) - len(failed)
+    # Completed tasks are only hidden by 'clear', they are not deleted
+    print(f"Deleted {deleted} of {len(remaining)} open tasks and hid {len(completed)} completed tasks in {elapsed:.1f}s "
+          f"({(deleted + len(completed)) / elapsed if elapsed else 0:.0f} tasks/s).")
+    return {"cleared": len(completed), "deleted": deleted, "failed": len(failed), "seconds": elapsed}
+
+def _list_tasks_for_clear():
+    try:
+        tasks = []
+        page_token = None
+        while True:
+            response = execute(_get_service().tasks().list(tasklist=TASKLISTID, maxResults=100, pageToken=page_token))
+            tasks.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return tasks
     except HttpError as e:
         if e.resp.status == 404:
             print("Task list not found.")
@@ -175,97 +310,48 @@ def clear_task_list():
             # Handle other HTTP errors if necessary
             print(f"An HTTP error occurred: {e}")
             raise
-    
-    # Process tasks if the task list is found
-    while tasks.get('items'):
-        for task in tasks.get('items', []):
-            task_id = task['id']
-
-            # Acquire the lock before processing the task
-            deletion_lock.acquire()
-
-            # Check if the task ID is already in ongoing deletions
-            if task_id not in ongoing_deletions:
-                # Add the task ID to ongoing deletions to lock it
-                ongoing_deletions.add(task_id)
-                
-                # Release the lock before making the delete request
-                deletion_lock.release()
-                
-                # Make the delete request
-                try:
-                    SERVICE.tasks().delete(tasklist=TASKLISTID, task=task_id).execute()
-                except HttpError as e:
-                    print(f"HTTP error occurred while deleting task {task_id}: {e}")      
-
-                # Remove the task ID from ongoing deletions after deletion is complete
-                deletion_lock.acquire()
-                ongoing_deletions.remove(task_id)
-                deletion_lock.release()
-
-        try:
-            tasks = SERVICE.tasks().list(tasklist=TASKLISTID).execute()
-        except HttpError as e:
-            if e.resp.status == 404:
-                print("Task list not found.")
-                raise
-            else:
-                # Handle other HTTP errors if necessary
-                print(f"An HTTP error occurred: {e}")
-                raise
-
-    # Ensure all tasks are cleared
-    assert not tasks.get('items'), f"Failed to clear all tasks in the list (ID: {TASKLISTID}). Some tasks remain."
 
 """
-Retrieves and manages Google API credentials.
+Retrieves the Google API credentials of a token file.
+
+The credentials are kept in memory by a CredentialManager shared by all threads of the
+process, which refreshes them in the background shortly before they expire and writes
+the token file atomically. The following steps are done by the manager:
 
-This function is responsible for managing Google API credentials for the application.
-It involves the following steps:
+- Loads the credentials from 'token_file' the first time, or when the file changed on disk.
+- Refreshes them if they have expired, or requests fresh credentials from the user
+    using OAuth if there are none.
+- Saves the obtained credentials to 'token_file' for subsequent use.
 
-- Checks if a credentials file named 'token.pickle' exists.
-- Loads the credentials from the file if it exists.
-- If no valid credentials are available or the existing credentials are not valid,
-    it requests fresh credentials from the user using OAuth.
-- Saves the obtained credentials to the 'token.pickle' file for subsequent use.
-- Returns the obtained or newly refreshed credentials.
+Args:
+- token_file (str, optional): The file the OAuth token is stored in (default is 'token.pickle').
+- interactive (bool, optional): Whether to ask the user to sign in when there are no valid credentials.
 
 Returns:
 - Credentials: Google API credentials necessary for making API calls.
 
 Raises:
-- Error handling for potential exceptions such as FileNotFoundError when the credentials file is not found,
-    and other exceptions that might occur during the credential retrieval process.
+- Raises a RuntimeError if sign-in is needed and 'interactive' is False.
+- Raises a RefreshError if the refresh token was revoked or has expired.
 """
-def _get_credentials():
-    credentials = None
-
-    # Check if credentials file exists
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            credentials = pickle.load(token)
-
-    # If no valid credentials are available, request them from the user
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            credentials = flow.run_local_server(port=0, access_type='offline')
+def _get_credentials(token_file='token.pickle', interactive=True):
+    return get_credential_manager(token_file, SCOPES).get(interactive)
 
-        # Save the credentials for the next run
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(credentials, token)
+"""
+Creates a new authorized HTTP transport for the current credentials.
 
-    return credentials
+Used by the request executor to give each of its threads its own transport.
+"""
+def _new_authorized_http():
+    from google_auth_httplib2 import AuthorizedHttp
+    import httplib2
+    return AuthorizedHttp(CREDS, http=httplib2.Http())
 
 """
 Retrieves the ID of a task list given its name.
 
-This function calls the Google Tasks API to obtain a list of task lists.
-It then searches for a task list with the specified name.
-If the task list is found, it returns its unique ID; otherwise, it raises a ValueError.
+The ID is looked up in the task list cache (see 'resolve_task_list()'), so the Tasks API
+is only called when the list is not cached yet.
 
 Args:
 - taskListName (str): The name of the task list to search for.
@@ -276,41 +362,109 @@ Returns:
 Raises:
 - ValueError: If the task list with the provided name is not found.
 """
+@timed("tasks_api.get_task_list_id")
 def _get_task_list_id(taskListName):
-    # Call the Google Tasks API to get the task lists
-    results = SERVICE.tasklists().list().execute()
-
-    # Search for the task list with the specified name
-    for tl in results.get('items', []):
-        # print(f"Task list found: {tl['title']}")
-        if tl['title'] == taskListName:
-            task_list = tl
+    task_list_id = resolve_task_list(taskListName)
+    print("Selected list: " + taskListName)
+    return task_list_id
+
+"""
+Returns the ID of a task list given its name, optionally creating the list.
+
+IDs are cached in memory and in the file set with 'set_task_list_cache()' (TASKLIST_CACHE_FILE
+by default). A name that is not cached makes
+the cache reload every task list, page by page, at most once per initialization, so
+resolving many lists in a run costs a single listing. Lists that do not exist yet are
+created with the Tasks API 'tasklists.insert' method when 'create' is True.
+
+Args:
+- taskListName (str): The name of the task list.
+- create (bool, optional): Whether to create the list if it does not exist (default is False).
+
+Returns:
+- str: The ID of the task list.
+
+Raises:
+- ValueError: If the list does not exist and 'create' is False.
+"""
+def resolve_task_list(taskListName, create=False):
+    task_list_ids = _get_task_list_ids()
+    if taskListName not in task_list_ids and not TASKLIST_IDS_REFRESHED:
+        task_list_ids = _refresh_task_list_ids()
+    if taskListName not in task_list_ids:
+        if not create:
+            raise ValueError(f"Task list with the name '{taskListName}' not found.")
+        task_list = execute(_get_service().tasklists().insert(body={'title': taskListName}))
+        print("Created list: " + taskListName)
+        task_list_ids[taskListName] = task_list['id']
+        _save_task_list_ids(task_list_ids)
+    return task_list_ids[taskListName]
+
+"""
+Sets the file the task list cache is saved to, e.g. one per user's state directory.
+"""
+def set_task_list_cache(filename):
+    global TASKLIST_CACHE, TASKLIST_IDS
+    if filename != TASKLIST_CACHE:
+        TASKLIST_CACHE = filename
+        TASKLIST_IDS = None
+
+"""
+Drops a task list from the cache, e.g. after it was deleted in Google Tasks.
+"""
+def forget_task_list(task_list_id):
+    task_list_ids = _get_task_list_ids()
+    for name, cached_id in list(task_list_ids.items()):
+        if cached_id == task_list_id:
+            del task_list_ids[name]
+    _save_task_list_ids(task_list_ids)
+
+def _get_task_list_ids():
+    global TASKLIST_IDS
+    if TASKLIST_IDS is None:
+        try:
+            with open(TASKLIST_CACHE, 'r') as file:
+                TASKLIST_IDS = json.load(file)
+        except (FileNotFoundError, ValueError):
+            TASKLIST_IDS = {}
+    return TASKLIST_IDS
+
+@timed("tasks_api.list_task_lists")
+def _refresh_task_list_ids():
+    global TASKLIST_IDS, TASKLIST_IDS_REFRESHED
+    task_list_ids = {}
+    page_token = None
+    while True:
+        results = execute(_get_service().tasklists().list(maxResults=100, pageToken=page_token))
+        for tl in results.get('items', []):
+            # Keep the first list if several have the same name
+            task_list_ids.setdefault(tl['title'], tl['id'])
+        page_token = results.get('nextPageToken')
+        if not page_token:
             break
-    else:
-        task_list = None
-
-    # If the task list is not found, raise a ValueError
-    if not task_list:
-        raise ValueError(f"Task list with the name '{taskListName}' not found.")
-    else:
-        # Return the ID of the task list if found
-        print("Selected list: " + task_list['title'])
-        return task_list['id']
-    
+    TASKLIST_IDS = task_list_ids
+    TASKLIST_IDS_REFRESHED = True
+    _save_task_list_ids(task_list_ids)
+    return task_list_ids
+
+def _save_task_list_ids(task_list_ids):
+    directory = os.path.dirname(os.path.abspath(TASKLIST_CACHE))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(task_list_ids, file)
+        os.replace(temp_path, TASKLIST_CACHE)
+    except BaseException:
+        os.remove(temp_path)
+        raise
 
 """
 Returns an array containing the names of the task lists
 """
+@timed("tasks_api.get_task_lists")
 def get_task_lists():
-    # Call the Google Tasks API to get the task lists
-    results = SERVICE.tasklists().list().execute()
-    task_lists = []
-
-    # Search for the task list with the specified name
-    for tl in results.get('items', []):
-        task_lists.append(tl['title'])
-
-    return task_lists
+    # Page through all task lists and update the cache on the way
+    return list(_refresh_task_list_ids())
 
 """
 Formats a date string to RFC3339 format.
@@ -327,6 +481,26 @@ Returns:
 def _formatDateString(d):
     return d.strftime('%Y-%m-%dT%H:%M:%S.000Z')
 
+"""
+Builds the request body for a new task.
+
+Args:
+- title (str): The title or name of the task.
+- notes (str): Additional notes or description for the task. Truncated to CHAR_LIMIT.
+- due_date (datetime): The due date for the task.
+
+Returns:
+- dict: The task resource to send to the Google Tasks API.
+"""
+def _build_task_body(title, notes, due_date):
+    return {
+        'title': title,
+        'notes':    None if notes is None 
+                    else _truncateString(notes) if len(notes) > CHAR_LIMIT
+                    else notes,
+        'due': _formatDateString(due_date) if due_date else None,
+    }
+
 """
 Truncates a string to a specified limit.
 
@@ -365,7 +539,7 @@ def get_current_tasks():
         raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
     
     try:
-        tasks = SERVICE.tasks().list(tasklist=TASKLISTID).execute()
+        tasks = execute(_get_service().tasks().list(tasklist=TASKLISTID))
         uncompleted_tasks = [task for task in tasks.get('items', []) if not task.get('status') == 'completed']
         return uncompleted_tasks
     except HttpError as e:
@@ -373,14 +547,41 @@ def get_current_tasks():
         raise
 
 def get_all_tasks():
-    if TASKLISTID is None:
+    return get_tasks_updated_since(None)
+
+"""
+Retrieves the tasks of a task list that changed since a given time.
+
+All pages of the listing are retrieved, including completed and hidden tasks. When
+'updated_min' is given, only tasks updated at or after that time are returned, and
+deleted tasks are included (with 'deleted' set) so a local copy can drop them.
+
+Args:
+- updated_min (str): An RFC3339 timestamp, or None to retrieve every task.
+- tasklist (str, optional): The task list to read. Defaults to TASKLISTID.
+
+Returns:
+- list: The tasks as returned by the Google Tasks API.
+
+Raises:
+- Raises a RuntimeError if no task list is given and TASKLISTID is not set.
+- Handles HTTP errors (HttpError) if encountered during task retrieval.
+"""
+@timed("tasks_api.list_tasks")
+def get_tasks_updated_since(updated_min, tasklist=None):
+    tasklist = tasklist or TASKLISTID
+    if tasklist is None:
         raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
-    
+
+    params = dict(tasklist=tasklist, showCompleted=True, showHidden=True, maxResults=100)
+    if updated_min:
+        params.update(updatedMin=updated_min, showDeleted=True)
+
     try:
         tasks = []
         page_token = None
         while True:
-            response = SERVICE.tasks().list(tasklist=TASKLISTID, showCompleted=True, showHidden=True, pageToken=page_token).execute()
+            response = execute(_get_service().tasks().list(pageToken=page_token, **params))
             tasks.extend(response.get('items', []))
             page_token = response.get('nextPageToken')
             if not page_token:
@@ -388,9 +589,11 @@ def get_all_tasks():
         return tasks
     except HttpError as e:
         print(f"HTTP error occurred: {e}")
+        if e.resp.status == 404:
+            # The list was deleted, look it up again next time
+            forget_task_list(tasklist)
         raise
 
-
 """
 Updates the due date of a specified task in the Google Tasks service.
 
@@ -399,9 +602,9 @@ in the task list specified by the global variable TASKLISTID. The function invol
 the following steps:
 
 - Validates if the TASKLISTID has been set. Raises a RuntimeError if TASKLISTID is None.
-- Retrieves the task using the Google Tasks API 'get' method.
-- Updates the task's due date with the provided new date.
-- Sends an update request to the Google Tasks API to apply the changes.
+- Sends a patch request with only the new due date to the Google Tasks API, so the
+    task does not have to be retrieved first and its other fields, such as the notes,
+    are left untouched.
 
 Args:
 - task_id (str): The ID of the task to be updated.
@@ -415,24 +618,241 @@ Raises:
 - Handles HTTP errors (HttpError) if encountered during task retrieval or update.
 - Raises an Exception if an unexpected error occurs while updating the task.
 """
+@timed("tasks_api.update_task_due_date")
 def update_task_due_date(task_id, new_due_date):
     if TASKLISTID is None:
         raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
     
     try:
-        # Retrieve the task
-        task = SERVICE.tasks().get(tasklist=TASKLISTID, task=task_id).execute()
-        
-        # Update the due date
-        task['due'] = _formatDateString(new_due_date)
-        task['notes'] = "due date changed"
-        
-        # Send the update request
-        updated_task = SERVICE.tasks().update(tasklist=TASKLISTID, task=task_id, body=task).execute()
+        # Send only the changed field
+        body = {'due': _formatDateString(new_due_date)}
+        updated_task = execute(_get_service().tasks().patch(tasklist=TASKLISTID, task=task_id, body=body))
         return updated_task
     except HttpError as e:
         print(f"HTTP error occurred: {e}")
         raise
     except Exception as error:
         print(f"An unexpected error occurred while updating the task: {error}")
-        raise
\ No newline at end of file
+        raise
+
+
+"""
+Queues a task insert to be sent with the next call to 'execute_queued_mutations()'.
+
+Args:
+- title (str): The title or name of the task.
+- notes (str): Additional notes or description for the task.
+- due_date (datetime): The due date for the task.
+- tasklist (str, optional): The task list to insert into. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued insert.
+
+Raises:
+- Raises a RuntimeError if no task list is given and TASKLISTID is not set.
+"""
+def queue_create_task(title, notes, due_date, tasklist=None, request_id=None):
+    body = _build_task_body(title, notes, due_date)
+    return _queue_mutation('insert', tasklist, request_id, body=body)
+
+"""
+Queues a partial update of a task to be sent with the next call to 'execute_queued_mutations()'.
+
+Only the fields given are sent (a 'patch' request), so the task does not have to be
+retrieved first and fields that are not given are left untouched.
+
+Args:
+- task_id (str): The ID of the task to be updated.
+- fields (dict): The task fields to change, e.g. {'due': _formatDateString(new_due_date)}.
+- tasklist (str, optional): The task list containing the task. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued update.
+"""
+def queue_update_task(task_id, fields, tasklist=None, request_id=None):
+    return _queue_mutation('patch', tasklist, request_id, task=task_id, body=dict(fields))
+
+"""
+Queues a due date change of a task to be sent with the next call to 'execute_queued_mutations()'.
+
+Args:
+- task_id (str): The ID of the task to be updated.
+- new_due_date (datetime): The new due date for the task.
+- tasklist (str, optional): The task list containing the task. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued update.
+"""
+def queue_update_task_due_date(task_id, new_due_date, tasklist=None, request_id=None):
+    return queue_update_task(task_id, {'due': _formatDateString(new_due_date)}, tasklist, request_id)
+
+"""
+Queues a title and/or due date change of a task to be sent with the next call to
+'execute_queued_mutations()', as a single patch.
+
+Args:
+- task_id (str): The ID of the task to be updated.
+- title (str, optional): The new title of the task.
+- due_date (datetime, optional): The new due date for the task.
+- tasklist (str, optional): The task list containing the task. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued update.
+"""
+def queue_update_task_details(task_id, title=None, due_date=None, tasklist=None, request_id=None):
+    fields = {}
+    if title is not None:
+        fields['title'] = title
+    if due_date is not None:
+        fields['due'] = _formatDateString(due_date)
+    return queue_update_task(task_id, fields, tasklist, request_id)
+
+"""
+Queues a task delete to be sent with the next call to 'execute_queued_mutations()'.
+
+Args:
+- task_id (str): The ID of the task to be deleted.
+- tasklist (str, optional): The task list containing the task. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued delete.
+"""
+def queue_delete_task(task_id, tasklist=None, request_id=None):
+    return _queue_mutation('delete', tasklist, request_id, task=task_id)
+
+"""
+Queues a move of a task to another task list to be sent with the next call to
+'execute_queued_mutations()'. The task keeps its status, notes and other fields.
+
+Args:
+- task_id (str): The ID of the task to be moved.
+- destination_tasklist (str): The task list to move the task to.
+- tasklist (str, optional): The task list containing the task. Defaults to TASKLISTID.
+- request_id (str, optional): Identifier reported back with the result. Generated if omitted.
+
+Returns:
+- str: The request ID of the queued move.
+"""
+def queue_move_task(task_id, destination_tasklist, tasklist=None, request_id=None):
+    return _queue_mutation('move', tasklist, request_id, task=task_id, destinationTasklist=destination_tasklist)
+
+def _queue_mutation(operation, tasklist, request_id, **kwargs):
+    tasklist = tasklist or TASKLISTID
+    if tasklist is None:
+        raise RuntimeError("Task list ID is not set. Please set the task list ID before performing this operation.")
+    if request_id is None:
+        # Unique, so it can't collide with an ID a caller passed for another mutation
+        request_id = f"{operation}-{uuid.uuid4().hex}"
+
+    PENDING_MUTATIONS.append({
+        'request_id': request_id,
+        'operation': operation,
+        'params': dict(tasklist=tasklist, **kwargs),
+    })
+    return request_id
+
+"""
+Sends all queued mutations to the Google Tasks API using batch requests.
+
+Queued inserts, updates and deletes are grouped by task list and split into chunks of
+at most 'batch_size' requests, and each chunk is sent as a single batch HTTP request through the request
+executor, so the chunks are sent concurrently and count against the rate limit.
+A failure of one request does not stop the others; requests that fail with a 429 or
+5xx status are sent again in a new batch after a backoff delay. If a whole batch
+fails, every request in it is reported with that error. The queue is emptied once
+all chunks have been sent.
+
+Args:
+- batch_size (int, optional): The maximum number of requests per batch (default is BATCH_LIMIT).
+- on_success (callable, optional): Called with the request ID and the response of each
+    request as soon as it succeeds, on an executor thread, e.g. to journal the result.
+
+Returns:
+- list: One dict per queued mutation, in the order they were queued, with the keys
+    'request_id', 'operation', 'response' (the API response or None) and
+    'error' (the exception raised for that request or None).
+
+Raises:
+- ValueError: If two queued mutations have the same request ID, since one result would
+    overwrite the other. Nothing is sent and the queue is left as it is.
+"""
+@timed("tasks_api.execute_queued_mutations")
+def execute_queued_mutations(batch_size=BATCH_LIMIT, on_success=None):
+    request_ids = {mutation['request_id'] for mutation in PENDING_MUTATIONS}
+    if len(request_ids) != len(PENDING_MUTATIONS):
+        raise ValueError("Queued mutations must have distinct request IDs.")
+    mutations = PENDING_MUTATIONS[:]
+    PENDING_MUTATIONS.clear()
+
+    results = {
+        mutation['request_id']: {
+            'request_id': mutation['request_id'],
+            'operation': mutation['operation'],
+            'response': None,
+            'error': None,
+        }
+        for mutation in mutations
+    }
+    def callback(request_id, response, exception):
+        results[request_id]['response'] = response
+        results[request_id]['error'] = exception
+        if exception is None and on_success:
+            on_success(request_id, response)
+
+    def build_batch(chunk):
+        batch = _new_batch_http_request(callback=callback)
+        for mutation in chunk:
+            method = getattr(_get_service().tasks(), mutation['operation'])
+            batch.add(method(**mutation['params']), request_id=mutation['request_id'])
+        return batch
+
+    pending = mutations
+    failed_batches = set()
+    attempt = 0
+    while pending:
+        chunks = _chunk_by_task_list(pending, batch_size)
+        batches = [(chunk, submit(lambda chunk=chunk: build_batch(chunk), cost=len(chunk))) for chunk in chunks]
+        for chunk, batch in batches:
+            try:
+                batch.result()
+            except Exception as e:
+                print(f"An error occurred while sending a batch of {len(chunk)} requests: {e}")
+                for mutation in chunk:
+                    results[mutation['request_id']]['error'] = e
+                    failed_batches.add(mutation['request_id'])
+
+        # Retry the requests that were throttled or failed on the server. Whole batches that
+        # failed have already been retried by the executor.
+        pending = [
+            mutation for mutation in pending
+            if mutation['request_id'] not in failed_batches and is_retryable(results[mutation['request_id']]['error'])
+        ]
+        if pending and attempt < MAX_RETRIES:
+            delay = backoff_delay(attempt)
+            print(f"Retrying {len(pending)} requests in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+        else:
+            break
+
+    for result in results.values():
+        increment("tasks_api_batched_calls_total", method=f"tasks.tasks.{result['operation']}")
+        if result['error']:
+            increment("tasks_api_batched_errors_total", method=f"tasks.tasks.{result['operation']}")
+    return [results[mutation['request_id']] for mutation in mutations]
+
+def _chunk_by_task_list(mutations, batch_size):
+    # Each batch only changes one task list
+    by_task_list = {}
+    for mutation in mutations:
+        by_task_list.setdefault(mutation['params']['tasklist'], []).append(mutation)
+    return [
+        group[start:start + batch_size]
+        for group in by_task_list.values()
+        for start in range(0, len(group), batch_size)
+    ]
@@ -0,0 +1,140 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import time
+from quota_handler import QuotaBudget, DEFAULT_LIMIT, DEFAULT_WINDOW
+
+DEFAULT_STATE_DIR = "tenants"
+
+"""
+Loads the manifest of users to sync.
+
+The manifest is a JSON list with one object per user:
+
+    [
+        {
+            "name": "alice",
+            "feed_url": "https://canvas.example.edu/feeds/calendars/user_abc.ics",
+            "token_file": "tokens/alice.pickle",
+            "task_list": "School",
+            "state_dir": "tenants/alice"
+        }
+    ]
+
+'task_list' defaults to "School" and 'state_dir' to a directory named after the user.
+
+Args:
+- filename (str): The manifest file.
+
+Returns:
+- list: The users, as dicts with every key filled in.
+
+Raises:
+- ValueError: If a user is missing 'name', 'feed_url' or 'token_file', or two users share a name.
+"""
+def load_manifest(filename):
+    with open(filename, "r") as file:
+        tenants = json.load(file)
+
+    names = set()
+    for tenant in tenants:
+        missing = [key for key in ("name", "feed_url", "token_file") if not tenant.get(key)]
+        if missing:
+            raise ValueError(f"Manifest entry {tenant} is missing {', '.join(missing)}.")
+        if tenant["name"] in names:
+            raise ValueError(f"Manifest contains the user '{tenant['name']}' more than once.")
+        names.add(tenant["name"])
+        tenant.setdefault("task_list", "School")
+        tenant.setdefault("state_dir", os.path.join(DEFAULT_STATE_DIR, tenant["name"]))
+    return tenants
+
+"""
+Syncs every user in the manifest across a pool of worker processes.
+
+Each worker process has its own Google Tasks service, credentials and request executor
+(the module globals in 'tasks_api_handler' are per process), and syncs one user at a
+time. A failure for one user is recorded and does not stop the others.
+
+With a quota file, the users share a budget of API calls kept in that SQLite file, which
+the workers (and other runners pointed at it) draw from together. Each user gets an
+equal share of every window, sized by the number of users in 'tenants'. Changes due
+within 48 hours are sent first, and the rest are deferred to the next run.
+
+Args:
+- tenants (list): The users returned by 'load_manifest()'.
+- processes (int): The number of worker processes (default is the number of CPUs).
+- quota_file (str, optional): The shared quota ledger. Without it the users are not budgeted.
+- quota_limit (int): The project-wide number of API calls per window.
+- quota_window (float): The length of a quota window in seconds.
+
+Returns:
+- list: One result per user with the keys 'name', 'ok', 'error', 'duration' and the
+    counts returned by 'main.sync()'.
+"""
+def run_tenants(tenants, processes=None, quota_file=None, quota_limit=DEFAULT_LIMIT, quota_window=DEFAULT_WINDOW):
+    processes = min(processes or os.cpu_count() or 1, max(len(tenants), 1))
+    started = time.monotonic()
+    results = []
+
+    with multiprocessing.Pool(processes) as pool:
+        # Every user of the manifest gets a share, also before it first syncs in a window
+        quota = (quota_file, quota_limit, quota_window, len(tenants)) if quota_file else None
+        run = functools.partial(_run_tenant, quota=quota)
+        for result in pool.imap_unordered(run, tenants):
+            status = "ok" if result["ok"] else f"FAILED: {result['error']}"
+            print(f"[{result['name']}] {result['duration']:.1f}s, {result.get('created', 0)} created, "
+                  f"{result.get('updated', 0)} updated, {result.get('deleted', 0)} deleted, {result.get('failed', 0)} failed, "
+                  f"{result.get('deferred', 0)} deferred changes - {status}")
+            results.append(result)
+
+    elapsed = time.monotonic() - started
+    failed = [result for result in results if not result["ok"]]
+    print(f"\nSynced {len(results) - len(failed)} of {len(results)} users in {elapsed:.1f}s "
+          f"({len(results) / elapsed * 60 if elapsed else 0:.0f} users/min) with {processes} processes.")
+    for result in failed:
+        print(f"Failed user: {result['name']} ({result['error']})")
+    return results
+
+def _run_tenant(tenant, quota=None):
+    # Imported in the worker so each process builds its own service
+    from main import sync
+    from credential_handler import close_credential_manager
+    import tasks_api_handler
+
+    started = time.monotonic()
+    result = {"name": tenant["name"], "ok": False, "error": None}
+    try:
+        result.update(sync(
+            tenant["feed_url"],
+            tenant["task_list"],
+            state_dir=tenant["state_dir"],
+            token_file=tenant["token_file"],
+            interactive=False,
+            quota=QuotaBudget(quota[0], tenant["name"], *quota[1:]) if quota else None,
+        ))
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        # Don't let changes queued for a failed user leak into the next one
+        tasks_api_handler.PENDING_MUTATIONS.clear()
+        # Stop refreshing the token of a user this worker is done with
+        close_credential_manager(tenant["token_file"])
+    result["duration"] = time.monotonic() - started
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync Canvas assignments to Google Tasks for many users.")
+    parser.add_argument("manifest", help="JSON file listing the users to sync")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--quota-file", help="SQLite file holding the API budget shared by all users (default: no budget)")
+    parser.add_argument("--quota-limit", type=int, default=DEFAULT_LIMIT,
+                        help=f"project-wide API calls per quota window (default: {DEFAULT_LIMIT})")
+    parser.add_argument("--quota-window", type=float, default=DEFAULT_WINDOW,
+                        help=f"length of a quota window in seconds (default: {DEFAULT_WINDOW})")
+    args = parser.parse_args()
+
+    results = run_tenants(load_manifest(args.manifest), args.processes, args.quota_file, args.quota_limit, args.quota_window)
+    raise SystemExit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from config_handler import Profile, get_profile, get_profiles, save_profile
+
+def _write(path, text):
+    path.write_text(text)
+    return str(path)
+
+def test_legacy_sections_are_the_default_profile(tmp_path):
+    filename = _write(tmp_path / "config.txt", "# Configuration File\n\n[URL]\nurl = https://canvas.example.edu/feed.ics\n\n[TASK_LIST]\nname = Homework\n")
+    assert get_profile(filename=filename) == Profile(url="https://canvas.example.edu/feed.ics", task_list="Homework")
+
+def test_legacy_lines_without_their_section_are_read(tmp_path):
+    # Updating the URL in earlier versions replaced the [URL] line with the new value
+    filename = _write(tmp_path / "config.txt", "# Configuration File\n\nurl = https://new.example.edu/feed.ics\nurl = https://old.example.edu/feed.ics\n\n[TASK_LIST]\nname = School\n")
+    assert get_profile(filename=filename) == Profile(url="https://new.example.edu/feed.ics", task_list="School")
+
+def test_profiles_are_parsed_with_their_types(tmp_path):
+    filename = _write(tmp_path / "config.txt", "[profile default]\nurl = https://a\n\n[profile summer]\nurl = https://b\nday_range = 30\nunknown = x\n")
+    assert get_profiles(filename) == {"default": Profile(url="https://a"), "summer": Profile(url="https://b", day_range=30)}
+
+def test_invalid_value_is_reported(tmp_path):
+    filename = _write(tmp_path / "config.txt", "[profile default]\nday_range = soon\n")
+    with pytest.raises(ValueError):
+        get_profiles(filename)
+
+def test_saving_a_legacy_file_rewrites_it_as_profiles(tmp_path):
+    filename = _write(tmp_path / "config.txt", "[URL]\nurl = https://a\n")
+    save_profile("summer", filename, task_list="Summer")
+    assert "[profile default]" in open(filename).read()
+    assert get_profiles(filename) == {"default": Profile(url="https://a"), "summer": Profile(task_list="Summer")}
+
+def test_missing_file_has_no_profiles(tmp_path):
+    assert get_profiles(str(tmp_path / "config.txt")) == {}
@@ -0,0 +1,97 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from assignment_handler import Assignment
+from diff_handler import diff_tasks
+from fingerprint_handler import get_fingerprint, record_fingerprint
+
+DUE = datetime.date(2026, 3, 2)
+
+def _assignment(uid, name="Homework 1 [COP3502]", date=DUE):
+    return Assignment(uid, name, "COP3502", date)
+
+def _task(task_id, title="Homework 1 [COP3502]", due=DUE):
+    return {"id": task_id, "title": title, "due": f"{due.isoformat()}T00:00:00.000Z"}
+
+"""
+Returns a fingerprint index and the tasks of assignments synced as they are.
+"""
+def _synced(*assignments, tasklist=None):
+    index = {}
+    tasks = []
+    for number, assignment in enumerate(assignments):
+        task = _task(f"task{number}", assignment.name, assignment.date)
+        record_fingerprint(index, assignment.uid, task["id"], task["due"], task["title"], tasklist)
+        tasks.append(task)
+    return index, tasks
+
+def test_unchanged_assignment_has_no_changes():
+    assignment = _assignment("a")
+    index, tasks = _synced(assignment)
+    changes = diff_tasks([assignment], index, tasks, {"a"})
+    assert all(not found for found in changes.values())
+
+def test_new_assignment_and_deleted_task_are_created():
+    synced = _assignment("a")
+    index, tasks = _synced(synced)
+    new = _assignment("b", "Quiz 1 [COP3502]")
+    changes = diff_tasks([synced, new], index, [], {"a", "b"})
+    assert [key for key, _, _ in changes["created"]] == ["a", "b"]
+
+def test_rename_and_date_change_keep_the_task():
+    index, tasks = _synced(_assignment("a"))
+    changed = _assignment("a", "Homework 1 (revised) [COP3502]", DUE + datetime.timedelta(days=2))
+    changes = diff_tasks([changed], index, tasks, {"a"})
+    assert [(key, task_id) for key, task_id, _, _ in changes["due_changed"]] == [("a", "task0")]
+    assert [(key, task_id) for key, task_id, _, _ in changes["renamed"]] == [("a", "task0")]
+    assert not changes["created"] and not changes["deleted"]
+
+def test_title_edited_in_google_tasks_is_left_alone():
+    assignment = _assignment("a")
+    index, tasks = _synced(assignment)
+    tasks[0]["title"] = "My own title"
+    assert not diff_tasks([assignment], index, tasks, {"a"})["renamed"]
+
+def test_removed_assignment_is_deleted_but_one_outside_the_window_is_not():
+    removed, later = _assignment("a"), _assignment("b", "Quiz 1 [COP3502]")
+    index, tasks = _synced(removed, later)
+    # Neither is in the window any more, but 'b' is still in the feed
+    changes = diff_tasks([], index, tasks, {"b"})
+    assert changes["deleted"] == [("a", "task0", None)]
+
+def test_removals_need_the_feed_uids():
+    index, tasks = _synced(_assignment("a"))
+    assert not diff_tasks([], index, tasks)["deleted"]
+
+def test_removed_assignment_without_task_is_forgotten():
+    index, _ = _synced(_assignment("a"))
+    changes = diff_tasks([], index, [], set())
+    assert not changes["deleted"] and index == {}
+
+def test_occurrence_of_a_recurring_event_in_the_feed_is_kept():
+    occurrence = _assignment("series#20260302")
+    index, tasks = _synced(occurrence)
+    assert not diff_tasks([], index, tasks, {"series"})["deleted"]
+
+def test_legacy_entry_is_moved_to_the_uid():
+    assignment = _assignment("a")
+    index = {get_fingerprint(assignment): {"task_id": "task0", "due": DUE.isoformat(), "tasklist": None}}
+    changes = diff_tasks([assignment], index, [_task("task0")], {"a"})
+    assert all(not found for found in changes.values())
+    assert index["a"]["task_id"] == "task0" and index["a"]["title"] == assignment.name
+
+def test_rerouted_assignment_is_moved_with_its_changes():
+    index, tasks = _synced(_assignment("a"), tasklist="school")
+    changed = _assignment("a", date=DUE + datetime.timedelta(days=1))
+    changes = diff_tasks([changed], index, tasks, {"a"}, tasklist_for=lambda assignment: "math", default_tasklist="school")
+    assert [(key, task_id, source, destination) for key, task_id, _, source, destination in changes["moved"]] == [("a", "task0", "school", "math")]
+    assert [(key, tasklist) for key, _, _, tasklist in changes["due_changed"]] == [("a", "math")]
+    assert not changes["created"] and not changes["deleted"]
+
+def test_duplicate_events_are_diffed_once():
+    assignment = _assignment("a")
+    changes = diff_tasks([assignment, assignment], {}, [], {"a"})
+    assert len(changes["created"]) == 1
@@ -0,0 +1,119 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from assignment_handler import Assignment
+from diff_handler import diff_tasks
+from fingerprint_handler import record_fingerprint, MOVED_PREFIX
+from journal_handler import SyncJournal, recover_journal
+from plan_handler import plan_mutations, get_request_id
+
+DUE = datetime.date(2026, 3, 2)
+
+def _assignment(uid, name=None, date=DUE):
+    return Assignment(uid, name or f"Homework {uid} [COP3502]", "COP3502", date)
+
+def _task(task_id, assignment):
+    return {"id": task_id, "title": assignment.name, "due": f"{assignment.date.isoformat()}T00:00:00.000Z"}
+
+"""
+Plans the changes of 'assignments', writes the plan to a journal and records the
+mutations in 'done' (request IDs with the task each produced) as finished, like a run
+that stopped while sending them.
+"""
+def _interrupted_run(filename, assignments, index, tasks, done, **diff_args):
+    plan = plan_mutations(diff_tasks(assignments, index, tasks, **diff_args), tasks)
+    journal = SyncJournal(filename)
+    journal.begin(plan, [get_request_id(mutation) for mutation in plan])
+    for request_id, task_id in done.items():
+        journal.record_result(request_id, {"id": task_id} if task_id else "")
+    journal.close()
+    return plan
+
+def test_partial_batch_resumes_without_duplicates(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    assignments = [_assignment(uid) for uid in "abc"]
+    index = {}
+    _interrupted_run(filename, assignments, index, [], {"insert:a": "task-a", "insert:b": "task-b"})
+
+    # The insert of 'c' reached Google Tasks before the run stopped, its response didn't
+    tasks = [_task("task-a", assignments[0]), _task("task-b", assignments[1]), _task("task-c", assignments[2])]
+    recovered = recover_journal(filename, index, {None: tasks})
+    assert recovered == {"finished": 2, "matched": 1, "moved": 0}
+    assert {key: entry["task_id"] for key, entry in index.items()} == {"a": "task-a", "b": "task-b", "c": "task-c"}
+    assert all(not found for found in diff_tasks(assignments, index, tasks, set("abc")).values())
+
+def test_unsent_insert_is_planned_again(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    assignments = [_assignment("a"), _assignment("b")]
+    index = {}
+    _interrupted_run(filename, assignments, index, [], {"insert:a": "task-a"})
+
+    tasks = [_task("task-a", assignments[0])]
+    assert recover_journal(filename, index, {None: tasks}) == {"finished": 1, "matched": 0, "moved": 0}
+    assert [key for key, _, _ in diff_tasks(assignments, index, tasks, {"a", "b"})["created"]] == ["b"]
+
+def test_finished_patch_and_delete_are_recorded(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    kept, removed = _assignment("a"), _assignment("b")
+    index = {}
+    tasks = [_task("task-a", kept), _task("task-b", removed)]
+    for task, assignment in zip(tasks, (kept, removed)):
+        record_fingerprint(index, assignment.uid, task["id"], task["due"], task["title"])
+    renamed = _assignment("a", "Homework a (revised) [COP3502]")
+    _interrupted_run(filename, [renamed], index, tasks, {"patch:a": "task-a", "delete:b": None}, feed_uids={"a"})
+
+    assert recover_journal(filename, index, {None: tasks}) == {"finished": 2, "matched": 0, "moved": 0}
+    assert list(index) == ["a"] and index["a"]["title"] == renamed.name
+
+def test_move_is_recorded_once_its_task_is_in_the_new_list(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    assignment = _assignment("a")
+    task = _task("task-a", assignment)
+    index = {}
+    record_fingerprint(index, "a", "task-a", task["due"], task["title"], "school")
+    _interrupted_run(filename, [assignment], index, [task], {}, feed_uids={"a"},
+                     tasklist_for=lambda assignment: "math", default_tasklist="school")
+
+    # Not moved yet: nothing to record, the next diff plans the move again
+    assert recover_journal(filename, index, {"school": [task], "math": []})["matched"] == 0
+    assert index["a"]["tasklist"] == "school"
+    assert recover_journal(filename, index, {"school": [], "math": [task]})["matched"] == 1
+    assert index["a"]["tasklist"] == "math" and index["a"]["task_id"] == "task-a"
+
+def test_unfinished_delete_of_a_replaced_task_is_kept_for_cleanup(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    assignment = _assignment("a")
+    old, new = _task("task-old", assignment), _task("task-new", assignment)
+    journal = SyncJournal(filename)
+    delete = {"operation": "delete", "key": "a", "tasklist": "school", "task_id": "task-old", "fields": {}, "assignment": None}
+    journal.begin([delete], [get_request_id(delete)])
+    journal.close()
+    index = {}
+    record_fingerprint(index, "a", "task-new", new["due"], new["title"], "math")
+
+    assert recover_journal(filename, index, {"school": [old], "math": [new]})["moved"] == 1
+    assert index[MOVED_PREFIX + "a"]["task_id"] == "task-old"
+    changes = diff_tasks([assignment], index, [old, new], {"a"}, lambda assignment: "math", "school")
+    assert changes["deleted"] == [(MOVED_PREFIX + "a", "task-old", "school")]
+    assert not changes["created"] and not changes["moved"]
+
+def test_cut_off_last_line_is_ignored(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    index = {}
+    _interrupted_run(filename, [_assignment("a")], index, [], {"insert:a": "task-a"})
+    with open(filename, "a") as file:
+        file.write('{"type": "done", "request_id": "ins')
+    assert recover_journal(filename, index, {})["finished"] == 1
+
+def test_no_journal_recovers_nothing(tmp_path):
+    assert recover_journal(str(tmp_path / "journal.jsonl"), {}, {}) is None
+
+def test_commit_removes_the_journal(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    journal = SyncJournal(filename)
+    journal.begin([], [])
+    journal.commit()
+    assert not os.path.exists(filename)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from quota_handler import QuotaBudget
+
+def _budget(tmp_path, tenant, limit=100, tenants=2):
+    return QuotaBudget(str(tmp_path / "quota.db"), tenant, limit=limit, window=3600, tenants=tenants)
+
+def test_first_tenant_gets_only_its_share(tmp_path):
+    first, second = _budget(tmp_path, "a"), _budget(tmp_path, "b")
+    assert first.reserve(80) == 50
+    # Non-urgent calls of all tenants stay below the urgent reserve
+    assert second.reserve(80) == 30
+    assert second.reserve(80, urgent=80) == 20
+    assert first.get_usage()["used"] == 100
+
+def test_share_grows_with_active_tenants(tmp_path):
+    budgets = [_budget(tmp_path, name, tenants=1) for name in "abcd"]
+    for budget in budgets:
+        budget.reserve(1)
+    assert budgets[0].reserve(100) == 24
+
+def test_only_urgent_calls_use_the_reserve(tmp_path):
+    budget = _budget(tmp_path, "a", tenants=1)
+    assert budget.reserve(100) == 80
+    assert budget.reserve(100) == 0
+    assert budget.reserve(100, urgent=30) == 20
+
+def test_urgent_calls_are_capped_at_the_share(tmp_path):
+    assert _budget(tmp_path, "a").reserve(100, urgent=100) == 50
+
+def test_settle_charges_extra_calls_and_refunds_unused_ones(tmp_path):
+    budget = _budget(tmp_path, "a")
+    budget.reserve(30)
+    budget.settle(35)
+    assert budget.get_usage()["tenant_used"] == 35
+
+    budget.reserve(10)
+    budget.settle(2)
+    assert budget.get_usage()["tenant_used"] == 37
+
+def test_charge_counts_past_the_limit(tmp_path):
+    budget = _budget(tmp_path, "a", limit=10, tenants=1)
+    budget.reserve(10, urgent=10)
+    budget.charge(5)
+    assert budget.get_usage()["used"] == 15
+    assert budget.reserve(1, urgent=1) == 0
@@ -0,0 +1,82 @@
+import datetime
+import os
+import sys
+
+import pytest
+from dateutil import rrule as dateutil_rrule
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from icalendar_handler import iter_occurrences
+
+DTSTART = datetime.datetime(2024, 1, 15, 23, 59)
+START = datetime.date(2024, 1, 1)
+END = datetime.date(2027, 12, 31)
+
+"""
+Expected occurrences of a rule inside the window, as expanded by dateutil. DTSTART is
+always the first occurrence in iCalendar, even if the rule doesn't match it, while
+dateutil leaves it out then.
+"""
+def _expected(rule, dtstart=DTSTART, start=START, end=END):
+    expanded = set(dateutil_rrule.rrulestr(rule, dtstart=dtstart).between(
+        datetime.datetime.combine(start, datetime.time.min),
+        datetime.datetime.combine(end, datetime.time.max),
+        inc=True,
+    ))
+    if start <= dtstart.date() <= end:
+        expanded.add(dtstart)
+    return sorted(expanded)
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=DAILY;COUNT=10",
+    "FREQ=DAILY;INTERVAL=3;UNTIL=20240401T000000",
+    "FREQ=DAILY;BYDAY=MO,WE,FR;COUNT=30",
+    "FREQ=DAILY;BYMONTHDAY=1,-1;COUNT=12",
+    "FREQ=WEEKLY;COUNT=20",
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;UNTIL=20250101T000000",
+    "FREQ=WEEKLY;BYDAY=SU,MO;WKST=SU;INTERVAL=2;COUNT=15",
+    "FREQ=WEEKLY;BYMONTH=3,9;BYDAY=FR",
+    "FREQ=MONTHLY;COUNT=24",
+    "FREQ=MONTHLY;BYMONTHDAY=31",
+    "FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=18",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+    "FREQ=MONTHLY;BYDAY=2TU,4TU;INTERVAL=2",
+    "FREQ=MONTHLY;BYDAY=MO;BYMONTHDAY=1,2,3,4,5,6,7",
+    "FREQ=YEARLY;COUNT=4",
+    "FREQ=YEARLY;BYMONTH=3,1,11",
+    "FREQ=YEARLY;BYMONTH=11,2;BYDAY=1MO",
+    "FREQ=YEARLY;BYMONTH=12,6;BYMONTHDAY=-1;COUNT=5",
+])
+def test_matches_dateutil(rule):
+    assert list(iter_occurrences(DTSTART, START, END, rule)) == _expected(rule)
+
+def test_window_after_start_matches_dateutil():
+    rule = "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=300"
+    start, end = datetime.date(2026, 3, 1), datetime.date(2026, 4, 30)
+    assert list(iter_occurrences(DTSTART, start, end, rule)) == _expected(rule, start=start, end=end)
+
+def test_all_day_event():
+    dtstart = datetime.date(2024, 1, 31)
+    occurrences = list(iter_occurrences(dtstart, START, datetime.date(2024, 6, 30), "FREQ=MONTHLY"))
+    assert occurrences == [datetime.date(2024, 1, 31), datetime.date(2024, 3, 31), datetime.date(2024, 5, 31)]
+
+def test_unsorted_bymonth_is_in_order():
+    occurrences = list(iter_occurrences(DTSTART, START, datetime.date(2024, 12, 31), "FREQ=YEARLY;BYMONTH=9,2"))
+    assert occurrences == [DTSTART, datetime.datetime(2024, 2, 15, 23, 59), datetime.datetime(2024, 9, 15, 23, 59)]
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=YEARLY;BYMONTHDAY=1",
+    "FREQ=YEARLY;BYDAY=20MO",
+    "FREQ=YEARLY;BYDAY=MO",
+    "FREQ=HOURLY",
+    "FREQ=MONTHLY;BYSETPOS=-1;BYDAY=MO,TU,WE,TH,FR",
+])
+def test_unsupported_rule_yields_dtstart(rule):
+    assert list(iter_occurrences(DTSTART, START, END, rule)) == [DTSTART]
+
+def test_exdate_and_rdate():
+    rdate = datetime.datetime(2024, 1, 20, 23, 59)
+    exdate = datetime.datetime(2024, 1, 22, 23, 59)
+    occurrences = list(iter_occurrences(DTSTART, START, datetime.date(2024, 1, 31), "FREQ=WEEKLY", [rdate], [exdate]))
+    assert occurrences == [DTSTART, rdate, datetime.datetime(2024, 1, 29, 23, 59)]
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import executor_handler
+from executor_handler import TokenBucket
+
+"""
+Stands in for the time module, so waiting advances a fake clock instead of sleeping.
+"""
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def _bucket(monkeypatch, rate=8, capacity=16):
+    clock = FakeClock()
+    monkeypatch.setattr(executor_handler, "time", clock)
+    return TokenBucket(rate, capacity), clock
+
+def test_burst_is_free_then_calls_are_paced(monkeypatch):
+    bucket, clock = _bucket(monkeypatch)
+    for _ in range(16):
+        bucket.acquire()
+    assert clock.now == 0
+    bucket.acquire()
+    assert clock.now == 1 / 8
+
+def test_batch_larger_than_the_capacity_pays_its_full_cost(monkeypatch):
+    bucket, clock = _bucket(monkeypatch)
+    for _ in range(6):
+        bucket.acquire(50)
+    # The first batch starts with a full bucket, every later one waits for its whole cost
+    assert clock.now == 5 * 50 / 8
+
+def test_debt_delays_the_next_call(monkeypatch):
+    bucket, clock = _bucket(monkeypatch)
+    bucket.acquire(50)
+    assert clock.now == 0
+    bucket.acquire()
+    assert clock.now == 35 / 8